@@ -0,0 +1,10 @@
+@echo off
+cd "C:\Users\goatm\Desktop\Stock Price Predictor\StockPricePredictorGit"
+
+REM Activate the virtual environment
+call "C:\Users\goatm\Desktop\Stock Price Predictor\StockPricePredictorGit\venv\Scripts\activate.bat"
+
+REM Start the follow-the-sun scheduler (stays running; replaces the scheduled daily task)
+python manage.py run_ingestion_daemon --batched
+
+deactivate
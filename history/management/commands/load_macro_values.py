@@ -0,0 +1,167 @@
+import io
+import os
+import time
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+# Raw macro exports loaded by default (wide CSVs: one date column, one column per indicator code)
+DEFAULT_FILES = [
+    r"C:\Users\bouzi\Documents\finance_database\raw\rates\raw_money_market_rates.csv",
+    r"C:\Users\bouzi\Documents\finance_database\raw\rates\raw_policy_rates.csv",
+]
+
+TABLE = 'macro_indicators_values'
+METADATA_TABLE = 'macro_indicators_metadata'
+STAGING_TABLE = 'macro_indicators_values_staging'
+
+class Command(BaseCommand):
+    help = ('Load the wide macro CSVs into macro_indicators_values of the warehouse database: chunks are melted, '
+            'COPYed into a staging table and merged with ON CONFLICT (indicator_code, date), without emptying the table')
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', default=DEFAULT_FILES,
+                            help='Wide CSV files to load (default: the raw rates exports)')
+        parser.add_argument('--database', default='warehouse',
+                            help='Database alias holding macro_indicators_values')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='CSV rows (dates) read and melted at a time')
+        parser.add_argument('--prune', action='store_true',
+                            help='Also delete stored observations of the loaded indicators that are no longer in the files')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        started = time.perf_counter()
+
+        with connection.cursor() as cursor:
+            self.prepare(cursor)
+
+            staged = 0
+            for file_path in options['files']:
+                if not os.path.exists(file_path):
+                    self.stdout.write(f"File {file_path} not found.")
+                    continue
+                rows = self.stage_file(cursor, file_path, options['chunk_size'])
+                staged += rows
+                self.stdout.write(f"Staged {rows} observations from {os.path.basename(file_path)}")
+
+            if not staged:
+                cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+                self.stdout.write("Nothing to load.")
+                return
+
+            self.skip_unknown_indicators(cursor)
+            inserted, updated, pruned = self.merge(cursor, connection, options['prune'])
+            cursor.execute(f"SELECT COUNT(*) FROM (SELECT DISTINCT indicator_code, date FROM {STAGING_TABLE}) s")
+            distinct = cursor.fetchone()[0]
+            cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{inserted} observations inserted, {updated} updated, {distinct - inserted - updated} unchanged"
+            + (f", {pruned} pruned" if options['prune'] else "")
+            + f" in {time.perf_counter() - started:.1f}s"
+        ))
+
+    def prepare(self, cursor):
+        # Target table (same definition as before) and the key ON CONFLICT needs
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {TABLE} (
+                indicator_code VARCHAR(50) REFERENCES {METADATA_TABLE}(indicator_code) ON DELETE CASCADE,
+                date DATE NOT NULL,
+                value NUMERIC,
+                UNIQUE (indicator_code, date)
+            )
+        """)
+        constraints = cursor.db.introspection.get_constraints(cursor, TABLE)
+        if not any(c['unique'] and c['columns'] == ['indicator_code', 'date'] for c in constraints.values()):
+            cursor.execute(f"CREATE UNIQUE INDEX {TABLE}_code_date_uniq ON {TABLE} (indicator_code, date)")
+
+        # seq keeps the load order: the last file wins when two files hold the same observation
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+        cursor.execute(
+            f"CREATE TEMP TABLE {STAGING_TABLE} "
+            f"(seq BIGSERIAL, indicator_code VARCHAR(50), date DATE, value NUMERIC)"
+        )
+
+    def stage_file(self, cursor, file_path, chunk_size):
+        """Stream one wide CSV into the staging table, melting one chunk at a time."""
+        staged = 0
+        date_col = None
+        for chunk in pd.read_csv(file_path, encoding="utf-8-sig", chunksize=chunk_size):
+            chunk.columns = chunk.columns.str.strip()
+
+            # Locate the 'date' column (in case of case/space differences)
+            if date_col is None:
+                date_col = next((c for c in chunk.columns if c.lower() == "date"), None)
+                if not date_col:
+                    raise CommandError(f"'date' column not found in {file_path}. Columns are: {chunk.columns.tolist()}")
+
+            # Melt to long format and clean
+            long = chunk.melt(id_vars=date_col, var_name="indicator_code", value_name="value")
+            long = long.rename(columns={date_col: "date"})
+            long["date"] = pd.to_datetime(long["date"], errors="coerce").dt.date
+            long["value"] = pd.to_numeric(long["value"], errors="coerce")
+            long = long.dropna(subset=["date", "indicator_code", "value"])
+            if long.empty:
+                continue
+
+            buffer = io.StringIO()
+            long[["indicator_code", "date", "value"]].to_csv(buffer, index=False, header=False)
+            self.copy(cursor, buffer.getvalue())
+            staged += len(long)
+        return staged
+
+    def copy(self, cursor, csv_text):
+        sql = f"COPY {STAGING_TABLE} (indicator_code, date, value) FROM STDIN WITH (FORMAT csv)"
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, 'copy'):
+            # psycopg 3
+            with raw_cursor.copy(sql) as copy:
+                copy.write(csv_text)
+        else:
+            # psycopg2
+            raw_cursor.copy_expert(sql, io.StringIO(csv_text))
+
+    def skip_unknown_indicators(self, cursor):
+        """Drop staged codes without metadata: the foreign key would reject the whole merge."""
+        cursor.execute("SELECT to_regclass(%s)", [METADATA_TABLE])
+        if cursor.fetchone()[0] is None:
+            return
+        cursor.execute(
+            f"SELECT DISTINCT s.indicator_code FROM {STAGING_TABLE} s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {METADATA_TABLE} m WHERE m.indicator_code = s.indicator_code) "
+            f"ORDER BY 1"
+        )
+        unknown = [row[0] for row in cursor.fetchall()]
+        if unknown:
+            self.stdout.write(f"Skipping indicators missing from {METADATA_TABLE}: {', '.join(unknown)}")
+            cursor.execute(f"DELETE FROM {STAGING_TABLE} WHERE indicator_code = ANY(%s)", [unknown])
+
+    def merge(self, cursor, connection, prune):
+        """
+        Merge the staged observations in one transaction: readers keep seeing the previous
+        values until it commits. Only new or changed values are written.
+        """
+        pruned = 0
+        with transaction.atomic(using=connection.alias):
+            cursor.execute(
+                f"WITH written AS ("
+                f"INSERT INTO {TABLE} AS t (indicator_code, date, value) "
+                f"SELECT DISTINCT ON (indicator_code, date) indicator_code, date, value FROM {STAGING_TABLE} "
+                f"ORDER BY indicator_code, date, seq DESC "
+                f"ON CONFLICT (indicator_code, date) DO UPDATE SET value = EXCLUDED.value "
+                f"WHERE t.value IS DISTINCT FROM EXCLUDED.value "
+                f"RETURNING (xmax = 0) AS inserted) "
+                f"SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM written"
+            )
+            inserted, updated = cursor.fetchone()
+
+            if prune:
+                cursor.execute(
+                    f"DELETE FROM {TABLE} t "
+                    f"WHERE t.indicator_code IN (SELECT DISTINCT indicator_code FROM {STAGING_TABLE}) "
+                    f"AND NOT EXISTS (SELECT 1 FROM {STAGING_TABLE} s "
+                    f"WHERE s.indicator_code = t.indicator_code AND s.date = t.date)"
+                )
+                pruned = cursor.rowcount
+        return inserted, updated, pruned
@@ -1,3 +1,45 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+
+class LoadMacroValuesTests(TestCase):
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TABLE macro_indicators_metadata (indicator_code VARCHAR(50) PRIMARY KEY)")
+            cursor.execute("INSERT INTO macro_indicators_metadata VALUES ('RATE_A'), ('RATE_B')")
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def load(self, csv_text):
+        path = os.path.join(self.directory, 'rates.csv')
+        with open(path, 'w') as f:
+            f.write(csv_text)
+        out = StringIO()
+        call_command('load_macro_values', path, database='default', chunk_size=2, stdout=out)
+        return out.getvalue()
+
+    def values(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indicator_code, date::text, value::float FROM macro_indicators_values ORDER BY 1, 2")
+            return cursor.fetchall()
+
+    def test_only_new_or_changed_observations_are_written(self):
+        out = self.load("Date,RATE_A,RATE_B,RATE_Z\n2024-01-01,1.5,2.0,9\n2024-01-02,1.5,,9\n2024-01-03,1.75,2.1,9\n")
+        self.assertIn('Skipping indicators missing from macro_indicators_metadata: RATE_Z', out)
+        self.assertIn('5 observations inserted, 0 updated, 0 unchanged', out)
+
+        # One restated value and one new date; the other observations stay in place
+        out = self.load("date,RATE_A,RATE_B\n2024-01-01,1.5,2.0\n2024-01-02,1.5,\n2024-01-03,1.8,2.1\n2024-01-04,1.8,2.1\n")
+        self.assertIn('2 observations inserted, 1 updated, 4 unchanged', out)
+        self.assertEqual(self.values(), [
+            ('RATE_A', '2024-01-01', 1.5), ('RATE_A', '2024-01-02', 1.5), ('RATE_A', '2024-01-03', 1.8),
+            ('RATE_A', '2024-01-04', 1.8), ('RATE_B', '2024-01-01', 2.0), ('RATE_B', '2024-01-03', 2.1),
+            ('RATE_B', '2024-01-04', 2.1),
+        ])
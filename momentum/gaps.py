@@ -0,0 +1,87 @@
+"""Find the trading days missing from stored DailyPrice histories."""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from momentum.models import DailyPrice
+from momentum.scheduler import ALWAYS_TRADING, EXCHANGE_LISTED, load_calendars, load_ticker_countries
+
+# One run of missing trading days of a ticker (start and end are inclusive dates)
+GapRange = namedtuple('GapRange', ['ticker', 'asset_class', 'start', 'end', 'missing_days'])
+
+
+def load_stored_dates(asset_classes=None, tickers=None):
+    """Frame of (ticker, asset_class, date) for every stored bar, streamed from the database."""
+    bars = DailyPrice.objects.all()
+    if asset_classes:
+        bars = bars.filter(instrument__asset_class__in=asset_classes)
+    if tickers:
+        bars = bars.filter(instrument__ticker__in=tickers)
+    rows = bars.values_list('instrument__ticker', 'instrument__asset_class', 'date').iterator(chunk_size=50000)
+    return pd.DataFrame.from_records(rows, columns=['ticker', 'asset_class', 'date'])
+
+
+def trading_days(first, last, holidays=None, every_day=False):
+    """
+    Expected trading days from first to last (inclusive) as datetime64[D]:
+    weekdays minus `holidays`, or every calendar day when `every_day` is set.
+    """
+    days = np.arange(np.datetime64(first, 'D'), np.datetime64(last, 'D') + 1)
+    if every_day:
+        return days
+    holidays = np.array(sorted(holidays or ()), dtype='datetime64[D]')
+    return days[np.is_busday(days, holidays=holidays)]
+
+
+def missing_ranges(stored, expected, merge_within=0):
+    """
+    [(start, end, missing_days)] runs of `expected` days absent from `stored`, found in one
+    vectorized pass. Runs separated by at most `merge_within` stored trading days become one
+    range, so a single request covers them.
+    """
+    positions = np.flatnonzero(~np.isin(expected, stored))
+    if not len(positions):
+        return []
+
+    # A new range starts wherever the next missing day is further than merge_within days away
+    breaks = np.flatnonzero(np.diff(positions) > merge_within + 1)
+    first = np.r_[0, breaks + 1]
+    last = np.r_[breaks, len(positions) - 1]
+    return [
+        (expected[positions[i]].astype(object), expected[positions[j]].astype(object), int(j - i + 1))
+        for i, j in zip(first, last)
+    ]
+
+
+def find_gaps(stored, since=None, merge_within=0):
+    """
+    GapRange list for the bars in `stored` (a frame from load_stored_dates). Each ticker is
+    checked between its first (or `since`) and its last stored date against its calendar:
+    the exchange holidays of its country for equities and bonds, every day for crypto and
+    weekdays for the rest. Days after the last stored bar are left to the incremental update.
+    """
+    if stored.empty:
+        return []
+
+    calendars = load_calendars()
+    countries = load_ticker_countries()
+    since = np.datetime64(since, 'D') if since else None
+
+    gaps = []
+    dates = stored.assign(date=stored['date'].to_numpy(dtype='datetime64[D]'))
+    for (ticker, asset_class), group in dates.groupby(['ticker', 'asset_class'])['date']:
+        days = np.sort(group.to_numpy(dtype='datetime64[D]'))
+        first = max(days[0], since) if since is not None else days[0]
+        if first > days[-1]:
+            continue
+
+        holidays = set()
+        if asset_class in EXCHANGE_LISTED:
+            calendar = calendars.get(countries.get((asset_class, ticker)))
+            holidays = calendar[1] if calendar else set()
+
+        expected = trading_days(first, days[-1], holidays, every_day=asset_class in ALWAYS_TRADING)
+        gaps.extend(GapRange(ticker, asset_class, *gap) for gap in missing_ranges(days, expected, merge_within))
+    return gaps
@@ -0,0 +1,230 @@
+"""Shared helpers for the DailyPrice ingestion commands."""
+
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.db.models import Max
+from django.utils import timezone
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, stop_after_delay, wait_random_exponential
+
+from momentum.instruments import instrument_keys
+from momentum.models import DailyPrice, IngestionTickerRun, Equity_Tickers, Bond_Tickers, Forex_Tickers, Cryptocurrency_Tickers, Commodity_Tickers
+
+# Asset classes and their corresponding ticker models
+ASSET_CLASS_MODELS = {
+    'equity': Equity_Tickers,
+    'bond': Bond_Tickers,
+    'forex': Forex_Tickers,
+    'cryptocurrency': Cryptocurrency_Tickers,
+    'commodity': Commodity_Tickers,
+}
+
+# Incremental runs re-fetch a few days before the last stored bar; new tickers start here
+OVERLAP_DAYS = 3
+DEFAULT_START_DATE = "2000-01-01"
+
+# How far back the run ledger is searched for the last fetch of a ticker (older fetches are in fetch_date)
+LEDGER_LOOKBACK = timedelta(days=7)
+
+# Ledger commands that fetch every ticker through today (a gap repair only fetches old ranges)
+LATEST_FETCH_COMMANDS = ['frequent_update_dailyprice_db', 'initial_update_dailyprice_db']
+
+# One ticker to fetch, with the date to resume from (and its watermark, when known)
+WorkItem = namedtuple('WorkItem', ['ticker', 'name', 'asset_class', 'start_date', 'last_date', 'last_fetch'],
+                      defaults=[None, None])
+
+
+def load_watermarks():
+    """(last stored date, last fetch time) of every (ticker, asset_class), in one grouped query each."""
+    rows = (
+        DailyPrice.objects
+        .values('instrument_id')
+        .annotate(last_date=Max('date'), last_fetch=Max('fetch_date'))
+        .order_by()
+    )
+    keys = instrument_keys()
+    watermarks = {keys[row['instrument_id']]: (row['last_date'], row['last_fetch']) for row in rows}
+
+    # Unchanged bars keep their fetch_date (change detection), so a re-fetch that found nothing new
+    # only shows in the run ledger: the start of the last run that fetched the ticker without error
+    for key, fetched in load_ledger_fetches().items():
+        if key in watermarks:
+            last_date, last_fetch = watermarks[key]
+            watermarks[key] = (last_date, max(last_fetch, fetched) if last_fetch else fetched)
+    return watermarks
+
+
+def load_ledger_fetches(since=None):
+    """Start of the last run of LATEST_FETCH_COMMANDS that fetched each (ticker, asset_class) without error."""
+    since = since or timezone.now() - LEDGER_LOOKBACK
+    rows = (
+        IngestionTickerRun.objects
+        .filter(error_class__isnull=True, run__command__in=LATEST_FETCH_COMMANDS, run__started_at__gte=since)
+        .values('ticker', 'asset_class')
+        .annotate(last_fetch=Max('run__started_at'))
+        .order_by()
+    )
+    return {(row['ticker'], row['asset_class']): row['last_fetch'] for row in rows}
+
+
+def load_universe():
+    """(ticker, name, asset_class) of every ticker of the five ticker models."""
+    return [
+        (ticker, name, asset_class)
+        for asset_class, model in ASSET_CLASS_MODELS.items()
+        for ticker, name in model.objects.values_list('ticker', 'name')
+        if ticker
+    ]
+
+
+def build_incremental_work_items(universe=None, overlap_days=OVERLAP_DAYS, default_start=DEFAULT_START_DATE):
+    """
+    One WorkItem per ticker of the universe, resuming `overlap_days` before its watermark.
+    Everything is resolved from the DB up front, before any network I/O starts.
+    """
+    if universe is None:
+        universe = load_universe()
+    watermarks = load_watermarks()
+    work_items = []
+    for ticker, name, asset_class in universe:
+        last_date, last_fetch = watermarks.get((ticker, asset_class), (None, None))
+        start_date = (last_date - timedelta(days=overlap_days)) if last_date else default_start
+        work_items.append(WorkItem(ticker, name, asset_class, start_date, last_date, last_fetch))
+    return work_items
+
+
+def group_work_items(work_items, batch_size):
+    """Group work items by (asset_class, start_date) and cut each group into batches."""
+    groups = defaultdict(list)
+    for item in work_items:
+        groups[(item.asset_class, str(item.start_date))].append(item)
+
+    batches = []
+    for items in groups.values():
+        for i in range(0, len(items), batch_size):
+            batches.append(items[i:i + batch_size])
+    return batches
+
+
+#################################
+# WORKER POOL
+
+class TokenBucket:
+    """Thread-safe token bucket: at most `rate` provider calls per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class FetchPool:
+    """
+    Runs provider fetches on a thread pool behind a shared TokenBucket.
+    Transient errors are retried with exponential backoff and full jitter, and a job
+    gives up once `timeout` seconds have passed. Results are yielded on the calling
+    thread, so DB writes stay on the main Django connection.
+    """
+
+    def __init__(self, workers=4, rate=2.0, attempts=4, timeout=60.0, backoff=1.0, max_backoff=30.0,
+                 permanent_errors=()):
+        self.workers = max(1, workers)
+        self.limiter = TokenBucket(rate)
+        self.attempts = max(1, attempts)
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # Errors that will not go away by asking again (unknown ticker, no prices, ...)
+        self.permanent_errors = tuple(permanent_errors)
+        self.retries = Counter()
+        self._retries_lock = threading.Lock()
+
+    @classmethod
+    def from_options(cls, options, provider=None):
+        return cls(
+            workers=options['concurrency'],
+            rate=options['rate_limit'],
+            attempts=options['max_attempts'],
+            timeout=options['ticker_timeout'],
+            permanent_errors=provider.permanent_errors if provider else (),
+        )
+
+    def is_transient_error(self, exc):
+        """Network hiccups, throttling and timeouts are worth retrying; missing data is not."""
+        return not isinstance(exc, self.permanent_errors)
+
+    def _record_retry(self, keys):
+        with self._retries_lock:
+            for key in keys:
+                self.retries[key] += 1
+
+    def call(self, keys, fn, *args, **kwargs):
+        """
+        Call fn with retries, taking a rate-limit token before every attempt (fn does not);
+        `keys` are the tickers the retries are booked against.
+        """
+        retrying = Retrying(
+            stop=stop_after_attempt(self.attempts) | stop_after_delay(self.timeout),
+            wait=wait_random_exponential(multiplier=self.backoff, max=self.max_backoff),
+            retry=retry_if_exception(self.is_transient_error),
+            before_sleep=lambda retry_state: self._record_retry(keys),
+            reraise=True,
+        )
+        for attempt in retrying:
+            with attempt:
+                self.limiter.acquire()
+                return fn(*args, **kwargs)
+
+    def run(self, jobs, workers=None):
+        """
+        Run (job_id, keys, fn, args) jobs concurrently, `workers` (default: the pool's) at a time.
+        Yields (job_id, result, error) as jobs finish.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, workers or self.workers)) as executor:
+            futures = {
+                executor.submit(self.call, keys, fn, *args): job_id
+                for job_id, keys, fn, args in jobs
+            }
+            for future in as_completed(futures):
+                job_id = futures[future]
+                try:
+                    yield job_id, future.result(), None
+                except Exception as e:
+                    yield job_id, None, e
+
+    def retry_summary(self):
+        """Tickers that needed retries, most retried first."""
+        return self.retries.most_common()
+
+
+def add_pool_arguments(parser):
+    """Command-line options shared by the price commands that fetch through a FetchPool."""
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Number of fetch jobs (tickers or batches) running at the same time. yfinance '
+                             'multi-symbol downloads run one batch at a time, with this many download threads each')
+    parser.add_argument('--rate-limit', type=float, default=2.0,
+                        help='Maximum provider calls per second across all workers (0 disables the limit)')
+    parser.add_argument('--max-attempts', type=int, default=4,
+                        help='Attempts per job before a transient error is reported as a failure')
+    parser.add_argument('--ticker-timeout', type=float, default=60.0,
+                        help='Seconds a job may spend fetching, retries included')
@@ -0,0 +1,28 @@
+"""Instrument dimension: the (ticker, asset_class, name) of every DailyPrice bar, stored once."""
+
+from momentum.models import Instrument
+
+
+def sync_instruments(universe):
+    """
+    Insert the instruments of `universe` [(ticker, name, asset_class)] and refresh their names.
+    Instruments are never deleted here: stored bars keep referring to them.
+    """
+    instruments = {
+        (ticker, asset_class): Instrument(asset_class=asset_class, ticker=ticker, name=name)
+        for ticker, name, asset_class in universe
+        if ticker
+    }
+    Instrument.objects.bulk_create(list(instruments.values()), batch_size=1000, update_conflicts=True,
+                                   unique_fields=['ticker', 'asset_class'], update_fields=['name'])
+    return len(instruments)
+
+
+def instrument_keys():
+    """{instrument id: (ticker, asset_class)} of every instrument."""
+    return {pk: (ticker, asset_class) for pk, ticker, asset_class in Instrument.objects.values_list('id', 'ticker', 'asset_class')}
+
+
+def instrument_ids(asset_class):
+    """{ticker: instrument id} for one asset class, so bars can be read by key without a join."""
+    return dict(Instrument.objects.filter(asset_class=asset_class).values_list('ticker', 'id'))
@@ -0,0 +1,41 @@
+"""
+Latest bar of every instrument, with its adj_close at the lookback anchors of the performance
+commands, kept in the momentum_latest_price materialized view (LatestPrice, migration 0011).
+
+An anchor is the last bar on or before the latest date minus the lookback, as the commands
+computed it with one query per ticker and period. Ingestion commands refresh the view
+concurrently at the end of their run, so readers are never blocked by the refresh.
+"""
+
+import time
+
+from django.db import connection
+
+from momentum.models import LatestPrice
+
+# Lookback anchors in days, by prefix of the performance fields (d_performance, w_performance, ...)
+LOOKBACK_DAYS = {'d': 1, 'w': 7, 'm': 30, 'y': 365, 'decade': 3650}
+
+
+def refresh_latest_prices():
+    """Recompute the view without locking out readers; returns the seconds it took."""
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {LatestPrice._meta.db_table}")
+    return time.perf_counter() - started
+
+
+def latest_prices(asset_class):
+    """{ticker: LatestPrice} for one asset class, in a single indexed read of the view."""
+    rows = LatestPrice.objects.filter(instrument__asset_class=asset_class).select_related('instrument')
+    return {row.instrument.ticker: row for row in rows}
+
+
+def performance(latest, period):
+    """Change in percent from the anchor of `period` ('d', 'w', ...) to the latest adj_close."""
+    if latest is None or latest.adj_close is None:
+        return None
+    anchor_price = getattr(latest, f'{period}_adj_close')
+    if anchor_price:
+        return ((latest.adj_close - anchor_price) / anchor_price) * 100
+    return None
@@ -0,0 +1,58 @@
+"""Run ledger: records what every ingestion run, and every ticker in it, cost."""
+
+import time
+from collections import Counter
+
+from django.utils import timezone
+
+from momentum.models import IngestionRun, IngestionTickerRun
+
+
+class RunLedger:
+    """
+    Opens an IngestionRun row when created, collects per-ticker metrics in memory while
+    the run progresses, and writes them with one bulk insert in finish().
+    """
+
+    def __init__(self, command, provider):
+        self.run = IngestionRun.objects.create(command=command, provider=provider)
+        self.entries = {}
+        self.bars = Counter()  # inserted / updated / unchanged bars of the whole run
+        self.started = time.perf_counter()
+
+    def record(self, ticker, asset_class, **metrics):
+        """Set metrics (any IngestionTickerRun field) for a ticker; several calls fill in the same entry."""
+        entry = self.entries.get((ticker, asset_class))
+        if entry is None:
+            entry = IngestionTickerRun(run=self.run, ticker=ticker, asset_class=asset_class)
+            self.entries[(ticker, asset_class)] = entry
+        for field, value in metrics.items():
+            setattr(entry, field, value)
+
+    def record_error(self, ticker, asset_class, error):
+        self.record(ticker, asset_class, error_class=error if isinstance(error, str) else type(error).__name__)
+
+    def count_bars(self, counts):
+        """Add the {'inserted', 'updated', 'unchanged'} counts of one write."""
+        self.bars.update(counts)
+
+    def finish(self, retries=None, rows_changed=None):
+        """Persist the ticker rows and the run totals. `rows_changed` overrides the per-ticker sum."""
+        retries = retries or {}
+        entries = list(self.entries.values())
+        for entry in entries:
+            entry.retries = retries.get(entry.ticker, 0)
+        IngestionTickerRun.objects.bulk_create(entries, batch_size=1000)
+
+        run = self.run
+        run.finished_at = timezone.now()
+        run.wall_seconds = time.perf_counter() - self.started
+        run.tickers_total = len(entries)
+        run.tickers_failed = sum(1 for entry in entries if entry.error_class)
+        run.rows_fetched = sum(entry.rows_fetched for entry in entries)
+        run.rows_changed = rows_changed if rows_changed is not None else sum(entry.rows_changed or 0 for entry in entries)
+        run.rows_inserted = self.bars['inserted']
+        run.rows_updated = self.bars['updated']
+        run.rows_unchanged = self.bars['unchanged']
+        run.save()
+        return run
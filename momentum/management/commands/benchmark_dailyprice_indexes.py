@@ -0,0 +1,164 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+# Scratch table with the DailyPrice columns; dropped at the end unless --keep
+TABLE = 'momentum_dailyprice_index_benchmark'
+
+# Index sets applied one after the other (each phase adds to the previous one)
+PHASES = [
+    ('date only', 'btree (date), as in 0001', [
+        "CREATE INDEX {table}_date ON {table} (date)",
+    ]),
+    ('before', '+ unique (ticker, asset_class, date), as in 0002', [
+        "CREATE UNIQUE INDEX {table}_key ON {table} (ticker, asset_class, date)",
+    ]),
+    ('after', '+ (ticker, date DESC) and BRIN (date) next to btree (date), as in 0006', [
+        "CREATE INDEX {table}_ticker_date_desc ON {table} (ticker, date DESC)",
+        "CREATE INDEX {table}_date_brin ON {table} USING brin (date)",
+    ]),
+    ('BRIN only', '- btree (date): BRIN alone for date range scans', [
+        "DROP INDEX {table}_date",
+    ]),
+]
+
+# Physical order of the synthetic bars: how the backfill merge and the history repairs write them
+# (instrument by instrument), or day after day for every ticker (a table only fed by incremental runs)
+ROW_ORDERS = {
+    'backfill': 'n, d',
+    'append': 'd, n',
+}
+
+# The hot access paths: performance commands (latest bar, lookback), ingestion (overlap window), range scans
+QUERIES = {
+    'latest bar': "SELECT adj_close, fetch_date FROM {table} WHERE ticker = %s ORDER BY date DESC LIMIT 1",
+    'lookback': "SELECT adj_close FROM {table} WHERE ticker = %s AND date <= %s ORDER BY date DESC LIMIT 1",
+    'overlap window': ("SELECT date, open, high, low, adj_close, volume FROM {table} "
+                       "WHERE ticker = %s AND asset_class = %s AND date >= %s"),
+    'week, all tickers': "SELECT COUNT(*), AVG(adj_close) FROM {table} WHERE date BETWEEN %s AND %s",
+}
+
+class Command(BaseCommand):
+    help = ('Benchmark the DailyPrice indexes on a synthetic table built with generate_series: '
+            'latency and query plans of the hot queries before and after the 0006 indexes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickers', type=int, default=2000, help='Synthetic tickers')
+        parser.add_argument('--years', type=int, default=10, help='Years of weekday bars per ticker')
+        parser.add_argument('--repeat', type=int, default=200, help='Executions of each query per phase')
+        parser.add_argument('--explain', action='store_true', help='Print EXPLAIN (ANALYZE, BUFFERS) of each query')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed of the data and the query parameters')
+        parser.add_argument('--order', choices=sorted(ROW_ORDERS), default='backfill',
+                            help='Physical row order: per ticker as the backfill writes (default), or per day')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch table afterwards')
+
+    def handle(self, *args, **options):
+        self.last_day = date.today()
+        self.first_day = self.last_day - timedelta(days=365 * options['years'])
+
+        with connection.cursor() as cursor:
+            self.build_table(cursor, options)
+            results = {}
+            try:
+                for phase, description, statements in PHASES:
+                    started = time.perf_counter()
+                    for statement in statements:
+                        cursor.execute(statement.format(table=TABLE))
+                    cursor.execute(f"ANALYZE {TABLE}")
+                    self.stdout.write(f"\n== {phase}: {description} (built in {time.perf_counter() - started:.1f}s)")
+                    self.print_index_sizes(cursor)
+                    results[phase] = self.run_queries(cursor, options)
+            finally:
+                if not options['keep']:
+                    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+        self.stdout.write("\nMedian / p95 latency in ms")
+        phases = [phase for phase, _, _ in PHASES]
+        self.stdout.write(f"{'query':<20}" + ''.join(f"{phase:>20}" for phase in phases))
+        for query in QUERIES:
+            self.stdout.write(f"{query:<20}" + ''.join(
+                f"{results[phase][query][0]:>11.3f} / {results[phase][query][1]:<6.3f}" for phase in phases
+            ))
+
+    def build_table(self, cursor, options):
+        started = time.perf_counter()
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        # Unlogged: the benchmark reads, it does not need crash safety for its scratch data
+        cursor.execute(
+            f"CREATE UNLOGGED TABLE {TABLE} ("
+            f"id bigserial PRIMARY KEY, date date NOT NULL, asset_class varchar(50) NOT NULL, "
+            f"ticker varchar(20) NOT NULL, name varchar(100) NOT NULL, "
+            f"open numeric(12, 4), high numeric(12, 4), low numeric(12, 4), adj_close numeric(12, 4), "
+            f"volume bigint, fetch_date timestamptz NOT NULL, is_live boolean NOT NULL, time_utc time)"
+        )
+        cursor.execute("SELECT setseed(%s)", [(options['seed'] % 1000) / 1000])
+        # Rows in the order of --order (the date correlation decides how selective BRIN (date) is)
+        cursor.execute(
+            f"INSERT INTO {TABLE} (date, asset_class, ticker, name, open, high, low, adj_close, volume, "
+            f"fetch_date, is_live) "
+            f"SELECT d::date, 'equity', 'T' || lpad(n::text, 5, '0'), 'Ticker ' || n, "
+            f"p * 0.995, p * 1.01, p * 0.99, p, (random() * 1e6)::bigint, d + interval '18 hours', false "
+            f"FROM generate_series(%s::date, %s::date, interval '1 day') d "
+            f"CROSS JOIN generate_series(1, %s) n "
+            f"CROSS JOIN LATERAL (SELECT (10 + n %% 200 + random())::numeric(12, 4) AS p) price "
+            f"WHERE extract(isodow FROM d) < 6 "
+            f"ORDER BY {ROW_ORDERS[options['order']]}",
+            [self.first_day, self.last_day, options['tickers']],
+        )
+        rows = cursor.rowcount
+        # Sets the visibility map as well, so index-only scans are possible as on a vacuumed live table
+        cursor.execute(f"VACUUM ANALYZE {TABLE}")
+        cursor.execute("SELECT pg_size_pretty(pg_total_relation_size(%s))", [TABLE])
+        size = cursor.fetchone()[0]
+        cursor.execute("SELECT correlation FROM pg_stats WHERE tablename = %s AND attname = 'date'", [TABLE])
+        correlation = cursor.fetchone()[0]
+        self.stdout.write(f"Built {TABLE}: {rows:,} rows, {size}, date correlation {correlation:.3f} "
+                          f"in {time.perf_counter() - started:.1f}s")
+
+    def print_index_sizes(self, cursor):
+        cursor.execute(
+            "SELECT indexrelname, pg_size_pretty(pg_relation_size(indexrelid)) FROM pg_stat_user_indexes "
+            "WHERE relname = %s ORDER BY pg_relation_size(indexrelid) DESC",
+            [TABLE],
+        )
+        for name, size in cursor.fetchall():
+            self.stdout.write(f"  {name:<60} {size:>10}")
+
+    def query_params(self, query, rng, options):
+        ticker = f"T{rng.randint(1, options['tickers']):05d}"
+        day = self.first_day + timedelta(days=rng.randint(0, (self.last_day - self.first_day).days))
+        if query == 'latest bar':
+            return [ticker]
+        if query == 'lookback':
+            return [ticker, day]
+        if query == 'overlap window':
+            return [ticker, 'equity', self.last_day - timedelta(days=5)]
+        return [day, day + timedelta(days=6)]
+
+    def run_queries(self, cursor, options):
+        rng = random.Random(options['seed'])
+        timings = {}
+        for query, sql in QUERIES.items():
+            sql = sql.format(table=TABLE)
+            if options['explain']:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) {sql}", self.query_params(query, rng, options))
+                self.stdout.write(f"  -- {query}")
+                for (line,) in cursor.fetchall():
+                    self.stdout.write(f"     {line}")
+
+            cursor.execute(sql, self.query_params(query, rng, options))  # Warm-up
+            cursor.fetchall()
+            samples = []
+            for _ in range(options['repeat']):
+                params = self.query_params(query, rng, options)
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                samples.append((time.perf_counter() - started) * 1000)
+            samples.sort()
+            timings[query] = (statistics.median(samples), samples[int(0.95 * (len(samples) - 1))])
+            self.stdout.write(f"  {query:<20} median {timings[query][0]:.3f}ms  p95 {timings[query][1]:.3f}ms")
+        return timings
@@ -0,0 +1,188 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+# Scratch tables (dropped at the end unless --keep)
+INSTRUMENT_TABLE = 'momentum_layout_benchmark_instrument'
+LAYOUTS = {
+    # Bars repeating ticker, asset_class and name, with the 0006 indexes
+    'strings (0006)': {
+        'table': 'momentum_layout_benchmark_strings',
+        'key': "ticker = %s",
+        'columns': "ticker varchar(20) NOT NULL, asset_class varchar(50) NOT NULL, name varchar(100) NOT NULL",
+        'insert': "ticker, asset_class, name",
+        'select': "i.ticker, i.asset_class, i.name",
+        'indexes': [
+            "CREATE UNIQUE INDEX {table}_key ON {table} (ticker, asset_class, date)",
+            "CREATE INDEX {table}_ticker_date_desc ON {table} (ticker, date DESC)",
+            "CREATE INDEX {table}_date_brin ON {table} USING brin (date)",
+        ],
+    },
+    # Bars keyed by a 4-byte instrument id, with the 0009 indexes
+    'instrument (0009)': {
+        'table': 'momentum_layout_benchmark_bar',
+        'key': "instrument_id = %s",
+        'columns': "instrument_id integer NOT NULL",
+        'insert': "instrument_id",
+        'select': "i.id",
+        'indexes': [
+            "CREATE UNIQUE INDEX {table}_key ON {table} (instrument_id, date)",
+            "CREATE INDEX {table}_instrument_date_desc ON {table} (instrument_id, date DESC)",
+            "CREATE INDEX {table}_date_brin ON {table} USING brin (date)",
+        ],
+    },
+}
+
+# The reads of the performance commands and of the ingestion, plus a whole-table pass
+QUERIES = {
+    'latest bar': "SELECT adj_close, fetch_date FROM {table} WHERE {key} ORDER BY date DESC LIMIT 1",
+    'lookback': "SELECT adj_close FROM {table} WHERE {key} AND date <= %s ORDER BY date DESC LIMIT 1",
+    'ticker history': "SELECT date, open, high, low, adj_close, volume FROM {table} WHERE {key} ORDER BY date",
+}
+
+# Lookbacks of one ticker in the performance commands (days)
+PERFORMANCE_DAYS = (1, 7, 30, 365, 3650)
+
+class Command(BaseCommand):
+    help = ('Compare the string-keyed and the instrument-keyed DailyPrice layouts on synthetic tables built '
+            'with generate_series: table and index sizes, query latency and a performance-command pass')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickers', type=int, default=2000, help='Synthetic tickers')
+        parser.add_argument('--years', type=int, default=10, help='Years of weekday bars per ticker')
+        parser.add_argument('--repeat', type=int, default=200, help='Executions of each query')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed of the query parameters')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch tables afterwards')
+
+    def handle(self, *args, **options):
+        self.last_day = date.today()
+        self.first_day = self.last_day - timedelta(days=365 * options['years'])
+
+        with connection.cursor() as cursor:
+            try:
+                self.build_instruments(cursor, options['tickers'])
+                results = {}
+                for layout, spec in LAYOUTS.items():
+                    self.build_layout(cursor, layout, spec)
+                    results[layout] = self.run_queries(cursor, spec, options)
+                    results[layout]['full scan'] = self.time_full_scan(cursor, spec)
+                    results[layout]['performance pass'] = self.time_performance_pass(cursor, spec, options)
+            finally:
+                if not options['keep']:
+                    for spec in LAYOUTS.values():
+                        cursor.execute(f"DROP TABLE IF EXISTS {spec['table']}")
+                    cursor.execute(f"DROP TABLE IF EXISTS {INSTRUMENT_TABLE}")
+
+        self.stdout.write("\nMedian latency in ms (performance pass: total for all tickers)")
+        self.stdout.write(f"{'':<20}" + ''.join(f"{layout:>20}" for layout in LAYOUTS))
+        for name in list(QUERIES) + ['full scan', 'performance pass']:
+            self.stdout.write(f"{name:<20}" + ''.join(f"{results[layout][name]:>20.3f}" for layout in LAYOUTS))
+
+    def build_instruments(self, cursor, tickers):
+        cursor.execute(f"DROP TABLE IF EXISTS {INSTRUMENT_TABLE}")
+        cursor.execute(
+            f"CREATE UNLOGGED TABLE {INSTRUMENT_TABLE} (id serial PRIMARY KEY, asset_class varchar(50) NOT NULL, "
+            f"ticker varchar(20) NOT NULL, name varchar(100) NOT NULL, UNIQUE (ticker, asset_class))"
+        )
+        # Names as long as the exported ones (e.g. 'iShares MSCI Emerging Markets ETF')
+        cursor.execute(
+            f"INSERT INTO {INSTRUMENT_TABLE} (asset_class, ticker, name) "
+            f"SELECT 'equity', 'T' || lpad(n::text, 5, '0') || '.EX', 'Synthetic Equity Index Tracker Fund ' || n "
+            f"FROM generate_series(1, %s) n ORDER BY n",
+            [tickers],
+        )
+
+    def build_layout(self, cursor, layout, spec):
+        table = spec['table']
+        started = time.perf_counter()
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(
+            f"CREATE UNLOGGED TABLE {table} (id bigserial PRIMARY KEY, {spec['columns']}, date date NOT NULL, "
+            f"open numeric(12, 4), high numeric(12, 4), low numeric(12, 4), adj_close numeric(12, 4), "
+            f"volume bigint, fetch_date timestamptz NOT NULL, is_live boolean NOT NULL, time_utc time)"
+        )
+        # Same bars for both layouts (prices derived from the ticker and the day), appended in date order
+        cursor.execute(
+            f"INSERT INTO {table} ({spec['insert']}, date, open, high, low, "
+            f"adj_close, volume, fetch_date, is_live) "
+            f"SELECT {spec['select']}, d::date, p * 0.995, p * 1.01, p * 0.99, p, "
+            f"(i.id * 7919 + extract(doy FROM d)::int * 104729) %% 1000000, d + interval '18 hours', false "
+            f"FROM generate_series(%s::date, %s::date, interval '1 day') d "
+            f"CROSS JOIN {INSTRUMENT_TABLE} i "
+            f"CROSS JOIN LATERAL (SELECT (10 + i.id %% 200 + extract(doy FROM d) / 100)::numeric(12, 4) AS p) price "
+            f"WHERE extract(isodow FROM d) < 6 "
+            f"ORDER BY d, i.id",
+            [self.first_day, self.last_day],
+        )
+        rows = cursor.rowcount
+        for statement in spec['indexes']:
+            cursor.execute(statement.format(table=table))
+        cursor.execute(f"VACUUM ANALYZE {table}")
+
+        cursor.execute(
+            "SELECT pg_size_pretty(pg_table_size(%s)), pg_size_pretty(pg_indexes_size(%s)), "
+            "pg_size_pretty(pg_total_relation_size(%s))",
+            [table, table, table],
+        )
+        table_size, index_size, total_size = cursor.fetchone()
+        cursor.execute(f"SELECT AVG(pg_column_size(t.*))::int FROM (SELECT * FROM {table} LIMIT 100000) t")
+        row_size = cursor.fetchone()[0]
+        self.stdout.write(f"\n== {layout}: {rows:,} rows of ~{row_size} bytes, table {table_size}, "
+                          f"indexes {index_size}, total {total_size} (built in {time.perf_counter() - started:.1f}s)")
+        cursor.execute(
+            "SELECT indexrelname, pg_size_pretty(pg_relation_size(indexrelid)) FROM pg_stat_user_indexes "
+            "WHERE relname = %s ORDER BY pg_relation_size(indexrelid) DESC",
+            [table],
+        )
+        for name, size in cursor.fetchall():
+            self.stdout.write(f"  {name:<60} {size:>10}")
+
+    def key_param(self, spec, number):
+        """The ticker string or the instrument id, resolved up front as the commands do."""
+        return f"T{number:05d}.EX" if 'ticker' in spec['key'] else number
+
+    def run_queries(self, cursor, spec, options):
+        rng = random.Random(options['seed'])
+        timings = {}
+        for query, sql in QUERIES.items():
+            sql = sql.format(table=spec['table'], key=spec['key'])
+            samples = []
+            for _ in range(options['repeat'] + 1):
+                params = [self.key_param(spec, rng.randint(1, options['tickers']))]
+                if query == 'lookback':
+                    params.append(self.first_day + timedelta(days=rng.randint(0, (self.last_day - self.first_day).days)))
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                samples.append((time.perf_counter() - started) * 1000)
+            timings[query] = statistics.median(samples[1:])  # The first one warms up
+            self.stdout.write(f"  {query:<20} median {timings[query]:.3f}ms")
+        return timings
+
+    def time_full_scan(self, cursor, spec):
+        cursor.execute(f"SELECT COUNT(*), AVG(adj_close) FROM {spec['table']}")  # Warm-up
+        started = time.perf_counter()
+        cursor.execute(f"SELECT COUNT(*), AVG(adj_close) FROM {spec['table']}")
+        cursor.fetchall()
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(f"  {'full scan':<20} {elapsed:.1f}ms")
+        return elapsed
+
+    def time_performance_pass(self, cursor, spec, options):
+        """Latest bar plus one lookback per period for every ticker, as update_all*stockperformance_db does."""
+        latest_sql = QUERIES['latest bar'].format(table=spec['table'], key=spec['key'])
+        lookback_sql = QUERIES['lookback'].format(table=spec['table'], key=spec['key'])
+        started = time.perf_counter()
+        for number in range(1, options['tickers'] + 1):
+            key = self.key_param(spec, number)
+            cursor.execute(latest_sql, [key])
+            cursor.fetchall()
+            for days in PERFORMANCE_DAYS:
+                cursor.execute(lookback_sql, [key, self.last_day - timedelta(days=days)])
+                cursor.fetchall()
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(f"  {'performance pass':<20} {elapsed:.0f}ms for {options['tickers']} tickers")
+        return elapsed
@@ -0,0 +1,99 @@
+import statistics
+import time
+import tracemalloc
+import warnings
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import connection
+from momentum.models import DailyPrice
+from momentum.price_reader import PRICE_FIELDS, read_price_arrays
+
+class Command(BaseCommand):
+    help = ('Compare the Decimal read paths (ORM, pd.read_sql) with the float read API (SQL casts, binary arrays) '
+            'on the DailyPrice table: wall time and peak Python memory for the same bars')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fields', nargs='+', default=PRICE_FIELDS, choices=PRICE_FIELDS,
+                            help='Price fields to read')
+        parser.add_argument('--asset-class', default=None, help='Only read the bars of one asset class')
+        parser.add_argument('--start', default=None, help='First date (YYYY-MM-DD)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs of each path (the median is reported)')
+
+    def handle(self, *args, **options):
+        fields = options['fields']
+        bars = DailyPrice.objects.all()
+        where, params = [], []
+        if options['asset_class']:
+            bars = bars.filter(instrument__asset_class=options['asset_class'])
+            where.append("instrument_id IN (SELECT id FROM momentum_instrument WHERE asset_class = %s)")
+            params.append(options['asset_class'])
+        if options['start']:
+            bars = bars.filter(date__gte=options['start'])
+            where.append("date >= %s")
+            params.append(options['start'])
+        bars = bars.order_by('instrument_id', 'date')
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+        table = DailyPrice._meta.db_table
+
+        def orm_decimal():
+            # What the performance code does today: Decimal objects, converted when numbers are needed
+            rows = list(bars.values_list('instrument_id', 'date', *fields))
+            return {field: np.array([float(row[i + 2]) if row[i + 2] is not None else np.nan for row in rows])
+                    for i, field in enumerate(fields)}
+
+        def read_sql_decimal():
+            sql = (f"SELECT instrument_id, date, {', '.join(fields)} FROM {table}{where_sql} "
+                   f"ORDER BY instrument_id, date")
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)  # pandas prefers SQLAlchemy connectables
+                frame = pd.read_sql(sql, connection.connection, params=params or None)
+            return frame[fields].astype(float)
+
+        def cursor_float8():
+            # Casts in SQL, but still one Python float per value
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT instrument_id, date, {', '.join(f'{field}::float8' for field in fields)} "
+                    f"FROM {table}{where_sql} ORDER BY instrument_id, date", params)
+                rows = cursor.fetchall()
+            return np.array([row[2:] for row in rows], dtype=np.float64)
+
+        read_options = {'asset_class': options['asset_class'], 'start': options['start'], 'fields': fields}
+        paths = {
+            'ORM (Decimal)': orm_decimal,
+            'pd.read_sql (Decimal)': read_sql_decimal,
+            'cursor ::float8': cursor_float8,
+            'float API float64': lambda: read_price_arrays(**read_options),
+            'float API float32': lambda: read_price_arrays(**read_options, dtype=np.float32),
+        }
+
+        rows = read_price_arrays(**read_options)['date'].size
+        self.stdout.write(f"Reading {rows:,} bars x {len(fields)} fields ({', '.join(fields)}), "
+                          f"median of {options['repeat']} runs\n")
+        self.stdout.write(f"{'Path':<24} {'Seconds':>10} {'Bars/s':>14} {'Peak MB':>10} {'Result MB':>10}")
+
+        baseline = None
+        for name, read in paths.items():
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                read()
+                timings.append(time.perf_counter() - started)
+            # Memory in a separate run: tracing slows the paths that allocate many objects
+            tracemalloc.start()
+            result = read()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            elapsed = statistics.median(timings)
+            baseline = baseline or elapsed
+            self.stdout.write(f"{name:<24} {elapsed:>10.3f} {rows / elapsed:>14,.0f} {peak / 1024 ** 2:>10.1f} "
+                              f"{self.result_size(result, fields) / 1024 ** 2:>10.1f}   x{baseline / elapsed:.1f}")
+
+    def result_size(self, result, fields):
+        """Bytes of the price values only (the float API also returns ids and dates)."""
+        if isinstance(result, dict):
+            return sum(result[field].nbytes for field in fields)
+        if isinstance(result, pd.DataFrame):
+            return int(result.memory_usage(index=False).sum())
+        return result.nbytes
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.utils import timezone
+from momentum.partitions import YEARS_AHEAD, create_year_partitions, list_partitions
+
+class Command(BaseCommand):
+    help = ('Create the yearly DailyPrice partitions ahead of time (a bar dated in a year without '
+            'a partition is rejected) and list the partitions with their size')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years-ahead', type=int, default=YEARS_AHEAD,
+                            help='Years after the current one that must have a partition')
+        parser.add_argument('--lock-timeout', type=int, default=5000,
+                            help='Milliseconds to wait for the table lock before giving up')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only show the partitions that would be created')
+
+    def handle(self, *args, **options):
+        through_year = timezone.now().year + options['years_ahead']
+        try:
+            created = create_year_partitions(through_year, lock_timeout_ms=options['lock_timeout'],
+                                             dry_run=options['dry_run'])
+        except OperationalError as e:
+            # Usually the lock timeout: a long query on the table, try again later
+            self.stdout.write(self.style.ERROR(f"Could not create the partitions: {e}"))
+            return
+
+        verb = 'Would create' if options['dry_run'] else 'Created'
+        for name in created:
+            self.stdout.write(f"{verb} {name}")
+        if not created:
+            self.stdout.write(f"Partitions already exist through {through_year}")
+
+        with connection.cursor() as cursor:
+            partitions = list_partitions(cursor)
+        self.stdout.write(f"\n{'Partition':<36} {'Bounds':<60} {'Rows (est.)':>12} {'Size':>10}")
+        for name, bound, rows, size in partitions:
+            self.stdout.write(f"{name:<36} {bound:<60} {max(rows, 0):>12,} {size / 1024 ** 2:>8.1f}MB")
@@ -1,32 +1,86 @@
-import yfinance as yf
-import pandas as pd
-from datetime import timedelta
+import time
+from collections import Counter
 from django.core.management.base import BaseCommand
-from momentum.models import DailyPrice, Equity_Tickers, Bond_Tickers, Forex_Tickers, Cryptocurrency_Tickers, Commodity_Tickers
+from django.db import transaction
+from momentum.ingestion import DEFAULT_START_DATE, FetchPool, add_pool_arguments, build_incremental_work_items, group_work_items
+from momentum.latest_prices import refresh_latest_prices
+from momentum.ledger import RunLedger
+from momentum.panel import format_panel_stats, refresh_price_panel
+from momentum.partitions import ensure_partitions
+from momentum.providers import add_provider_arguments, get_provider_from_options
+from momentum.price_writer import CopyBackfill, frame_to_records, write_changed_prices
+from momentum.restatements import ADJUSTED_ASSET_CLASSES, ANCHOR_OFFSETS_DAYS, find_restated_tickers, first_stored_dates
+from momentum.scheduler import select_due_work_items, session_close_times
 from django.utils import timezone
 
 class Command(BaseCommand):
-    help = 'Populate the DailyPrice table with historical price data from yfinance'
+    help = 'Populate the DailyPrice table with historical price data from the price provider (yfinance by default)'
 
-    def handle(self, *args, **kwargs):
-        asset_class_models = {
-            'equity': Equity_Tickers,
-            'bond': Bond_Tickers,
-            'forex': Forex_Tickers,
-            'cryptocurrency': Cryptocurrency_Tickers,
-            'commodity': Commodity_Tickers,
-        }
+    def add_arguments(self, parser):
+        parser.add_argument('--batched', action='store_true',
+                            help='Fetch tickers with multi-symbol downloads grouped by asset class and start date')
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Maximum number of tickers per multi-symbol download (batched mode and intraday snapshots)')
+        parser.add_argument('--all-tickers', action='store_true',
+                            help='Fetch every ticker, even when its market has not traded since the last fetch')
+        parser.add_argument('--skip-adjustment-check', action='store_true',
+                            help='Do not compare stored adjusted closes with the provider at the anchor dates')
+        parser.add_argument('--skip-panel', action='store_true',
+                            help='Do not refresh the memory-mapped price panel after the run')
+        add_pool_arguments(parser)
+        add_provider_arguments(parser)
 
-        not_found_tickers = []
+    def handle(self, *args, **options):
+        # Resume dates for the whole universe come from one grouped query on DailyPrice
+        started = time.perf_counter()
+        work_items = build_incremental_work_items()
+        self.stdout.write(f"Resolved start dates for {len(work_items)} tickers in {time.perf_counter() - started:.2f}s")
+
+        self.update(work_items, options)
+
+    def update(self, work_items, options):
+        """Fetch and write the given work items (also called by run_ingestion_daemon)."""
+        self.provider = get_provider_from_options(options)
+        pool = FetchPool.from_options(options, self.provider)
+        # A bar dated in a year without a partition would be rejected
+        ensure_partitions(self.stdout)
 
-        for asset_class, model in asset_class_models.items():
-            self.stdout.write(f"Processing {asset_class} tickers")
-            tickers = model.objects.values_list('ticker', 'name')
+        # Only fetch tickers whose market is open or completed a session since their last fetch
+        if not options['all_tickers']:
+            work_items, skipped = select_due_work_items(work_items)
+            reasons = Counter(reason for _, reason in skipped)
+            self.stdout.write(f"Scheduler: {len(work_items)} tickers due, {len(skipped)} skipped"
+                              + (f" ({', '.join(f'{count} {reason}' for reason, count in reasons.items())})" if reasons else ""))
 
-            for ticker, name in tickers:
-                if ticker:
-                    if not self.fetch_and_save_daily_price_data(ticker, name, asset_class):
-                        not_found_tickers.append({'ticker': ticker, 'name': name, 'asset_class': asset_class})
+        # Every ticker's provider latency, rows and write time end up in the run ledger
+        self.ledger = RunLedger('frequent_update_dailyprice_db', self.provider.name)
+        # Tickers whose stored history was replaced (their panel columns are reloaded)
+        self.replaced_histories = set()
+
+        # Market time of the latest bar: session close for closed markets, one snapshot per batch otherwise
+        last_times = self.resolve_last_times(pool, work_items, options['batch_size'])
+
+        if options['batched']:
+            not_found_tickers = self.run_batched(pool, work_items, options['batch_size'], last_times)
+        else:
+            not_found_tickers = self.run_per_ticker(pool, work_items, last_times)
+
+        # Splits and dividends restate the whole adj_close history, beyond the overlap days
+        if not options.get('skip_adjustment_check'):
+            failed = {(info['ticker'], info['asset_class']) for info in not_found_tickers}
+            self.repair_restatements(pool, [item for item in work_items if (item.ticker, item.asset_class) not in failed],
+                                     options['batch_size'])
+
+        run = self.ledger.finish(retries=pool.retries)
+        self.stdout.write(f"Run #{run.pk}: {run.rows_fetched} rows fetched, {run.rows_changed} written in {run.wall_seconds:.1f}s "
+                          f"({run.rows_fetched / max(run.wall_seconds, 1e-9):,.0f} rows/s)")
+        self.stdout.write(f"Bars: {run.rows_inserted} inserted, {run.rows_updated} updated, {run.rows_unchanged} unchanged")
+
+        retried = pool.retry_summary()
+        if retried:
+            self.stdout.write("Tickers retried after transient errors:")
+            for ticker, count in retried:
+                self.stdout.write(f"{ticker} - {count} retr{'y' if count == 1 else 'ies'}")
 
         if not_found_tickers:
             self.stdout.write("Tickers not found or encountered errors:")
@@ -35,61 +89,191 @@ class Command(BaseCommand):
         else:
             self.stdout.write("All tickers processed successfully without errors.")
 
-    def fetch_and_save_daily_price_data(self, ticker, name, asset_class):
+        self.refresh_latest_prices()
+        if not options.get('skip_panel'):
+            self.refresh_panel()
+
+    def refresh_latest_prices(self):
+        """Refresh the latest-price view read by the performance commands; a failure does not fail the run."""
         try:
-            # Find the latest date available for this ticker in the database
-            last_entry = DailyPrice.objects.filter(ticker=ticker, asset_class=asset_class).order_by('-date').first()
-            
-            # If data exists, set start date as three days before the last entry
-            # If no data exists, set a default start date
-            start_date = (last_entry.date - timedelta(days=3)) if last_entry else "2000-01-01"
+            self.stdout.write(f"Latest prices refreshed in {refresh_latest_prices():.2f}s")
+        except Exception as e:
+            self.stdout.write(f"Latest prices refresh failed: {e}")
+
+    def refresh_panel(self):
+        """Write the bars of this run into the price panel; a failure here does not fail the run."""
+        try:
+            self.stdout.write(format_panel_stats(refresh_price_panel(reload=self.replaced_histories)))
+        except Exception as e:
+            self.stdout.write(f"Price panel refresh failed: {e}")
+
+    def resolve_last_times(self, pool, work_items, batch_size):
+        """{ticker: time_utc} without a 1-minute history call per ticker."""
+        last_times = session_close_times(work_items)
+        live = sorted({item.ticker for item in work_items if item.ticker not in last_times})
+        chunks = [live[i:i + max(1, batch_size)] for i in range(0, len(live), max(1, batch_size))]
+
+        workers, threads = self.provider.batch_concurrency(pool.workers)
+
+        def fetch(chunk):
+            return self.provider.last_trade_times(chunk, timeout=pool.timeout, threads=threads)
+
+        jobs = [(number, chunk, fetch, (chunk,)) for number, chunk in enumerate(chunks, start=1)]
+        for number, times, error in pool.run(jobs, workers):
+            if error is not None:
+                self.stdout.write(f"Intraday snapshot {number}/{len(chunks)} failed: {error}")
+                continue
+            last_times.update(times)
+
+        saved = len(work_items) - len(chunks)
+        self.stdout.write(
+            f"time_utc: {len(work_items) - len(live)} tickers from session close, {len(live)} from "
+            f"{len(chunks)} intraday snapshot call(s) - {saved} provider calls saved vs one per ticker"
+        )
+        return last_times
+
+    def run_per_ticker(self, pool, work_items, last_times):
+        """Fetch every ticker on its own, `--concurrency` at a time."""
+        self.stdout.write(f"Fetching {len(work_items)} tickers from {self.provider.name} ({pool.workers} workers, {pool.limiter.rate:g} calls/s)")
+
+        def fetch(item):
+            started = time.perf_counter()
+            data = self.provider.history(item.ticker, item.start_date, timeout=pool.timeout)
+            return data, time.perf_counter() - started
 
-            # Fetch new data from start_date to today
-            data = yf.download(ticker, start=start_date, progress=False, auto_adjust=False)
+        jobs = [(item, [item.ticker], fetch, (item,)) for item in work_items]
+        not_found_tickers = []
+
+        for item, result, error in pool.run(jobs):
+            if error is not None:
+                self.stdout.write(f"Error fetching data for ticker {item.ticker} ({item.asset_class}): {error}")
+                self.ledger.record_error(item.ticker, item.asset_class, error)
+                not_found_tickers.append({'ticker': item.ticker, 'name': item.name, 'asset_class': item.asset_class})
+                continue
+
+            data, latency = result
+            self.ledger.record(item.ticker, item.asset_class, provider_latency=latency)
 
             # Check if data is empty, meaning no data was found for the ticker
-            if data.empty:
-                return False  # No data found for this ticker
-
-            # Get real last market time in UTC using a tiny 1-minute fetch (ONCE per ticker)
-            #    Put this *before* the loop and reuse inside defaults
-            try:
-                t = yf.Ticker(ticker)
-                intraday = t.history(period="1d", interval="1m")
-                if not intraday.empty and getattr(intraday.index, "tz", None) is not None:
-                    last_time_utc = intraday.index[-1].tz_convert("UTC").time()
-                else:
-                    last_time_utc = None
-            except Exception:
-                last_time_utc = None
+            if not self.save_daily_price_data(data, item.ticker, item.name, item.asset_class, last_times.get(item.ticker)):
+                not_found_tickers.append({'ticker': item.ticker, 'name': item.name, 'asset_class': item.asset_class})
+
+        return not_found_tickers
+
+    def run_batched(self, pool, work_items, batch_size, last_times):
+        """Fetch all tickers with multi-symbol downloads, then write them ticker by ticker."""
+        batches = group_work_items(work_items, max(1, batch_size))
+        # The provider decides how --concurrency is spent: batches side by side, or threads inside each download
+        workers, threads = self.provider.batch_concurrency(pool.workers)
+        self.stdout.write(f"Fetching {len(work_items)} tickers from {self.provider.name} in {len(batches)} batches "
+                          f"(batch size {batch_size}, {workers} batch(es) at a time x {threads} download thread(s), "
+                          f"{pool.limiter.rate:g} calls/s)")
+
+        def fetch(batch):
+            started = time.perf_counter()
+            frames = self.provider.history_batch([item.ticker for item in batch], batch[0].start_date,
+                                                 timeout=pool.timeout, threads=threads)
+            return frames, time.perf_counter() - started
+
+        jobs = [
+            ((number, batch), [item.ticker for item in batch], fetch, (batch,))
+            for number, batch in enumerate(batches, start=1)
+        ]
+        not_found_tickers = []
+        run_started = time.perf_counter()
+
+        # Downloads run in worker threads; DB writes stay on the main thread
+        for (number, batch), result, error in pool.run(jobs, workers):
+            first = batch[0]
+            if error is not None:
+                self.stdout.write(f"Batch {number}/{len(batches)} ({first.asset_class}, from {first.start_date}) failed: {error}")
+                for item in batch:
+                    self.ledger.record_error(item.ticker, item.asset_class, error)
+                not_found_tickers.extend({'ticker': item.ticker, 'name': item.name, 'asset_class': item.asset_class} for item in batch)
+                continue
+
+            frames, fetch_seconds = result
+            write_started = time.perf_counter()
+            for item in batch:
+                # A multi-symbol download has no per-ticker latency: share the call among the batch
+                self.ledger.record(item.ticker, item.asset_class, provider_latency=fetch_seconds / len(batch))
+                data = frames.get(item.ticker)
+                if not self.save_daily_price_data(data, item.ticker, item.name, item.asset_class, last_times.get(item.ticker)):
+                    not_found_tickers.append({'ticker': item.ticker, 'name': item.name, 'asset_class': item.asset_class})
+            write_seconds = time.perf_counter() - write_started
+
+            self.stdout.write(
+                f"Batch {number}/{len(batches)} ({first.asset_class}, from {first.start_date}, {len(batch)} tickers): "
+                f"fetched {len(frames)} in {fetch_seconds:.1f}s, written in {write_seconds:.1f}s"
+            )
 
+        self.stdout.write(f"Batched run finished in {time.perf_counter() - run_started:.1f}s")
+        return not_found_tickers
+
+    def repair_restatements(self, pool, work_items, batch_size):
+        """Check adjusted closes at the anchor dates; re-fetch and replace the full history of tickers that fail."""
+        started = time.perf_counter()
+        restated, calls = find_restated_tickers(self.provider, pool, work_items, batch_size)
+        checked = sum(1 for item in work_items if item.asset_class in ADJUSTED_ASSET_CLASSES)
+        self.stdout.write(f"Adjustment check: {checked} tickers at {len(ANCHOR_OFFSETS_DAYS)} anchors in {calls} provider calls "
+                          f"({time.perf_counter() - started:.1f}s), {len(restated)} restated")
+        if not restated:
+            return
+
+        for (ticker, asset_class), (day, stored, provided) in sorted(restated.items()):
+            self.stdout.write(f"{ticker} ({asset_class}): adj_close on {day} stored {stored:.4f}, provider {provided:.4f}")
+
+        names = {(item.ticker, item.asset_class): item.name for item in work_items}
+        first_dates = first_stored_dates(set(restated))
+
+        def fetch(key):
+            return self.provider.history(key[0], first_dates.get(key, DEFAULT_START_DATE), timeout=pool.timeout)
+
+        jobs = [(key, [key[0]], fetch, (key,)) for key in restated]
+
+        # The new histories replace the stored ones in a single COPY + merge
+        replaced = set()
+        with CopyBackfill() as backfill:
+            for (ticker, asset_class), data, error in pool.run(jobs):
+                if error is not None:
+                    self.stdout.write(f"Error re-fetching history for ticker {ticker} ({asset_class}): {error}")
+                    self.ledger.record_error(ticker, asset_class, error)
+                    continue
+                try:
+                    # Savepoint per ticker: a rejected COPY keeps the histories staged so far
+                    with transaction.atomic():
+                        backfill.stage_frame(
+                            frame_to_records(data, ticker, names[(ticker, asset_class)], asset_class, timezone.now()))
+                except Exception as e:
+                    self.stdout.write(f"Error staging history for ticker {ticker} ({asset_class}): {e}")
+                    self.ledger.record_error(ticker, asset_class, e)
+                    continue
+                replaced.add((ticker, asset_class))
+            backfill.merge(replace=True)
+        self.replaced_histories.update(replaced)
+
+        self.stdout.write(f"Re-fetched {len(replaced)} of {len(restated)} histories: {backfill.merged_rows} bars rewritten, "
+                          f"{backfill.deleted_rows} stale bars removed")
+
+    def save_daily_price_data(self, data, ticker, name, asset_class, last_time_utc):
+        try:
             # Capture the current timestamp once per batch
             fetch_timestamp = timezone.now()
 
-            # Use `iloc` to access columns by index position
-            for i in range(len(data)):
-                row = data.iloc[i]
-                date = data.index[i].date()  # Convert timestamp index to date
-
-                # Using `iloc` with assumed column indices:
-                # 0: Adj Close, 1: Close, 2: High, 3: Low, 4: Open, 5: Volume
-                DailyPrice.objects.update_or_create(
-                    date=date,
-                    asset_class=asset_class,
-                    ticker=ticker,
-                    defaults={
-                        'name': name,
-                        'open': float(row.iloc[4]) if pd.notna(row.iloc[4]) else None,  # Open
-                        'high': float(row.iloc[2]) if pd.notna(row.iloc[2]) else None,  # High
-                        'low': float(row.iloc[3]) if pd.notna(row.iloc[3]) else None,   # Low
-                        'adj_close': float(row.iloc[0]) if pd.notna(row.iloc[0]) else None, # Adj Close
-                        'volume': int(row.iloc[5]) if pd.notna(row.iloc[5]) else None, # Volume
-                        'fetch_date': fetch_timestamp,  # Update with the current timestamp
-                        'time_utc': last_time_utc
-                    }
-                )
-            return True  # Data was successfully found and processed    
+            if data is None or data.empty:
+                self.ledger.record_error(ticker, asset_class, 'NoData')
+                return False
+
+            # Compare with the stored bars and upsert only the new or restated ones
+            started = time.perf_counter()
+            records = frame_to_records(data, ticker, name, asset_class, fetch_timestamp, last_time_utc)
+            counts = write_changed_prices(records)
+            self.ledger.record(ticker, asset_class, rows_fetched=len(records), rows_changed=counts['inserted'] + counts['updated'],
+                               db_write_seconds=time.perf_counter() - started)
+            self.ledger.count_bars(counts)
+            return True  # Data was successfully found and processed
 
         except Exception as e:
-            self.stdout.write(f"Error fetching data for ticker {ticker} ({asset_class}): {e}")
-            return False  # Return False on error
\ No newline at end of file
+            self.stdout.write(f"Error saving data for ticker {ticker} ({asset_class}): {e}")
+            self.ledger.record_error(ticker, asset_class, e)
+            return False  # Return False on error
@@ -0,0 +1,226 @@
+import os
+import pandas as pd
+import pytz
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from momentum.models import CountryData, Exchange, Exchange_Holiday
+from momentum.scheduler import calendar_fingerprint
+
+# Default exports of the reference data managers
+DEFAULT_PATHS = {
+    'exchanges': os.path.join(settings.BASE_DIR, 'momentum', 'momentum data', 'exchanges_export.csv'),
+    'holidays': os.path.join(settings.BASE_DIR, 'momentum', 'momentum data', 'holiday_export.csv'),
+    'countries': os.path.join(settings.BASE_DIR, 'momentum', 'country data', 'country_data_export.csv'),
+}
+
+# Model and unique key of each data set
+DATASETS = {
+    'exchanges': (Exchange, ['country', 'exchange_short_name']),
+    'holidays': (Exchange_Holiday, ['country', 'exchange_name', 'date']),
+    'countries': (CountryData, ['country_code']),
+}
+
+class Command(BaseCommand):
+    help = ('Import exchanges, exchange holidays and country data: every CSV is validated first, '
+            'then all of them are upserted in one transaction')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='*', choices=sorted(DATASETS), default=None,
+                            help='Import only these data sets (default: all three)')
+        parser.add_argument('--exchanges', default=DEFAULT_PATHS['exchanges'], help='Exchanges CSV')
+        parser.add_argument('--holidays', default=DEFAULT_PATHS['holidays'], help='Holidays CSV')
+        parser.add_argument('--countries', default=DEFAULT_PATHS['countries'], help='Country data CSV')
+        parser.add_argument('--keep-missing', action='store_true',
+                            help='Do not delete stored rows that are absent from the CSV')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate the CSVs and show the changes without writing them')
+
+    def handle(self, *args, **options):
+        datasets = options['only'] or list(DATASETS)
+
+        # 1) Parse and validate everything before touching the database
+        errors = []
+        records = {}
+        for name in datasets:
+            path = options[name]
+            if not os.path.exists(path):
+                errors.append(f"{name}: file {path} not found")
+                continue
+            data = pd.read_csv(path, encoding='ISO-8859-1')
+            records[name], dataset_errors = getattr(self, f'parse_{name}')(data)
+            errors.extend(f"{name}: {error}" for error in dataset_errors)
+
+        if 'holidays' in records and 'exchanges' in datasets:
+            countries = {values['country'] for values in records.get('exchanges', [])}
+            unknown = sorted({values['country'] for values in records['holidays']} - countries)
+            if unknown:
+                self.stdout.write(f"Warning: holidays for countries without an exchange: {', '.join(unknown)}")
+
+        if errors:
+            raise CommandError("Reference data not imported:\n" + "\n".join(errors))
+
+        # 2) One transaction for all data sets: readers see the old or the new reference data
+        fingerprint = calendar_fingerprint()
+        with transaction.atomic():
+            for name in datasets:
+                model, key_fields = DATASETS[name]
+                counts = self.sync(model, key_fields, records[name], options['keep_missing'], options['dry_run'])
+                self.stdout.write(f"{model.__name__}: {counts['inserted']} inserted, {counts['updated']} updated, "
+                                  f"{counts['deleted']} deleted, {counts['unchanged']} unchanged")
+
+        if options['dry_run']:
+            self.stdout.write("Dry run: nothing written.")
+        elif calendar_fingerprint() != fingerprint:
+            # Ingestion daemons compare this fingerprint and reload their calendars on their next check
+            self.stdout.write("Market calendars changed: cached calendars are reloaded by running ingestion daemons.")
+        self.stdout.write(self.style.SUCCESS("Reference data imported."))
+
+    def sync(self, model, key_fields, records, keep_missing=False, dry_run=False):
+        """Upsert the new and changed rows with INSERT ... ON CONFLICT and delete the ones gone from the CSV."""
+        value_fields = [field for field in records[0] if field not in key_fields] if records else []
+        existing = {tuple(getattr(instance, field) for field in key_fields): instance for instance in model.objects.all()}
+
+        incoming = {tuple(values[field] for field in key_fields): values for values in records}
+        changed = [
+            model(**values) for key, values in incoming.items()
+            if key not in existing or any(getattr(existing[key], field) != values[field] for field in value_fields)
+        ]
+        inserted = sum(1 for key in incoming if key not in existing)
+        to_delete = [] if keep_missing else [instance.pk for key, instance in existing.items() if key not in incoming]
+
+        if not dry_run:
+            if to_delete:
+                model.objects.filter(pk__in=to_delete).delete()
+            if changed:
+                model.objects.bulk_create(changed, batch_size=1000, update_conflicts=True,
+                                          unique_fields=key_fields, update_fields=value_fields)
+
+        return {
+            'inserted': inserted,
+            'updated': len(changed) - inserted,
+            'deleted': len(to_delete),
+            'unchanged': len(incoming) - len(changed),
+        }
+
+    #################################
+    # PARSERS: return (list of model field dicts, list of errors)
+
+    def parse_exchanges(self, data):
+        errors = []
+        data = self.require(data, ['country', 'exchange', 'timezone', 'market_open_local', 'market_close_local'], errors)
+        if errors:
+            return [], errors
+
+        opens = pd.to_datetime(data['market_open_local'], format='%I:%M:%S %p', errors='coerce')
+        closes = pd.to_datetime(data['market_close_local'], format='%I:%M:%S %p', errors='coerce')
+        for line in data.index[opens.isna() | closes.isna()]:
+            errors.append(f"line {line + 2}: unreadable opening hours")
+        for line in data.index[opens >= closes]:
+            errors.append(f"line {line + 2}: market_open_local is not before market_close_local")
+        for line, zone in data['timezone'].items():
+            if zone not in pytz.all_timezones_set:
+                errors.append(f"line {line + 2}: unknown timezone {zone!r}")
+
+        records = [
+            {
+                'country': row.country,
+                'exchange_short_name': row.exchange,
+                'timezone': row.timezone,
+                'market_open_local': opens[line].time() if pd.notna(opens[line]) else None,
+                'market_close_local': closes[line].time() if pd.notna(closes[line]) else None,
+            }
+            for line, row in zip(data.index, data.itertuples(index=False))
+        ]
+        return records, errors + self.duplicates(records, DATASETS['exchanges'][1])
+
+    def parse_holidays(self, data):
+        errors = []
+        data = self.require(data, ['date', 'country', 'exchange_name', 'holiday_name'], errors)
+        if errors:
+            return [], errors
+
+        dates = pd.to_datetime(data['date'], format='%m/%d/%Y', errors='coerce')
+        for line in data.index[dates.isna()]:
+            errors.append(f"line {line + 2}: unreadable date {data.at[line, 'date']!r}")
+
+        records = [
+            {
+                'country': row.country,
+                'exchange_name': row.exchange_name,
+                'date': dates[line].date() if pd.notna(dates[line]) else None,
+                'holiday_name': row.holiday_name,
+            }
+            for line, row in zip(data.index, data.itertuples(index=False))
+        ]
+        return records, errors + self.duplicates(records, DATASETS['holidays'][1])
+
+    def parse_countries(self, data):
+        errors = []
+        data = self.require(data, ['country_name', 'country_code', 'region', 'currency', 'capital_city'], errors)
+        if errors:
+            return [], errors
+
+        for line in data.index[data['country_code'].str.len() != 3]:
+            errors.append(f"line {line + 2}: country_code {data.at[line, 'country_code']!r} is not 3 letters")
+        for line in data.index[data['currency'].str.len() > 3]:
+            errors.append(f"line {line + 2}: currency {data.at[line, 'currency']!r} is longer than 3 letters")
+
+        # Amounts are exported in millions
+        amounts = {
+            'most_recent_GDP_USD': 'most_recent_GDP_USD (m)',
+            'GDP_USD_2023': 'GDP_USD (2023) (m)',
+            'GDP_USD_2022': 'GDP_USD (2022) (m)',
+            'population_size_2023': 'population_size (2023) (m)',
+        }
+        converted = {}
+        for field, column in amounts.items():
+            if column not in data.columns:
+                errors.append(f"missing column {column!r}")
+                continue
+            values = pd.to_numeric(data[column], errors='coerce')
+            for line in data.index[values.isna() & data[column].notna()]:
+                errors.append(f"line {line + 2}: {column} is not a number")
+            converted[field] = values * 1_000_000
+
+        decimal = CountryData._meta.get_field('most_recent_GDP_USD')
+        records = []
+        for line, row in zip(data.index, data.itertuples(index=False)):
+            second_name = data.at[line, 'country_name_2'] if 'country_name_2' in data.columns else None
+            values = {
+                'country_name': row.country_name,
+                'country_second_name': None if pd.isna(second_name) else second_name,
+                'country_code': row.country_code,
+                'region': row.region,
+                'currency': row.currency,
+                'capital_city': row.capital_city,
+            }
+            for field, series in converted.items():
+                amount = series[line]
+                values[field] = None if pd.isna(amount) else decimal.to_python(round(float(amount), 2))
+            records.append(values)
+        return records, errors + self.duplicates(records, DATASETS['countries'][1])
+
+    def require(self, data, columns, errors):
+        """Strip the text columns; record missing columns or empty required cells as errors."""
+        missing = [column for column in columns if column not in data.columns]
+        if missing:
+            errors.append(f"missing columns {', '.join(missing)}")
+            return data
+        data = data.copy()
+        for column in data.columns[data.dtypes == object]:
+            data[column] = data[column].str.strip()
+        for column in columns:
+            for line in data.index[data[column].isna() | (data[column].astype(str) == '')]:
+                errors.append(f"line {line + 2}: empty {column}")
+        return data
+
+    def duplicates(self, records, key_fields):
+        """Errors for keys given twice with different values (identical repeated rows are fine)."""
+        seen, errors = {}, []
+        for values in records:
+            key = tuple(values[field] for field in key_fields)
+            if key in seen and seen[key] != values:
+                errors.append(f"{dict(zip(key_fields, key))} appears twice with different values")
+            seen[key] = values
+        return errors
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Q, Sum
+from momentum.models import IngestionRun, IngestionTickerRun
+
+class Command(BaseCommand):
+    help = 'Summarise the ingestion ledger: throughput of the last runs and where the time goes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20,
+                            help='Number of most recent finished runs to summarise')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Number of slowest tickers to list')
+        parser.add_argument('--command', default=None,
+                            help='Only include runs of this command (e.g. frequent_update_dailyprice_db)')
+
+    def handle(self, *args, **options):
+        runs = IngestionRun.objects.filter(finished_at__isnull=False)
+        if options['command']:
+            runs = runs.filter(command=options['command'])
+        runs = list(runs.order_by('-started_at')[:options['runs']])
+
+        if not runs:
+            self.stdout.write("No finished ingestion runs recorded yet.")
+            return
+
+        # Throughput trend, oldest run first
+        self.stdout.write(f"Last {len(runs)} runs:")
+        self.stdout.write(f"{'run':>6}  {'started (UTC)':<16}  {'command':<30} {'provider':<9} {'tickers':>7} {'failed':>6} "
+                          f"{'fetched':>9} {'changed':>9} {'unchanged':>9} {'seconds':>8} {'rows/s':>9}")
+        for run in reversed(runs):
+            rate = run.rows_fetched / run.wall_seconds if run.wall_seconds else 0
+            self.stdout.write(f"{run.pk:>6}  {run.started_at:%Y-%m-%d %H:%M}  {run.command:<30} {run.provider:<9} "
+                              f"{run.tickers_total:>7} {run.tickers_failed:>6} {run.rows_fetched:>9} {run.rows_changed:>9} {run.rows_unchanged:>9} "
+                              f"{run.wall_seconds:>8.1f} {rate:>9,.0f}")
+
+        tickers = IngestionTickerRun.objects.filter(run__in=runs)
+
+        # Per provider: where the wall time of a run goes
+        self.stdout.write("\nBy provider:")
+        for row in (IngestionRun.objects.filter(pk__in=[run.pk for run in runs]).values('provider')
+                    .annotate(runs=Count('id'), wall=Avg('wall_seconds'), fetched=Sum('rows_fetched'), seconds=Sum('wall_seconds'))
+                    .order_by('provider')):
+            rate = row['fetched'] / row['seconds'] if row['seconds'] else 0
+            self.stdout.write(f"{row['provider']:<10} {row['runs']:>4} runs, {row['wall']:.1f}s per run, {rate:,.0f} rows/s")
+
+        # Per asset class: provider latency vs database write time
+        self.stdout.write("\nBy asset class:")
+        for row in (tickers.values('asset_class')
+                    .annotate(count=Count('id'), failed=Count('id', filter=Q(error_class__isnull=False)),
+                              latency=Avg('provider_latency'), write=Avg('db_write_seconds'), retries=Sum('retries'))
+                    .order_by('asset_class')):
+            self.stdout.write(f"{row['asset_class']:<15} {row['count']:>6} ticker runs, {row['failed']:>4} failed, "
+                              f"latency {row['latency'] or 0:.3f}s, write {row['write'] or 0:.3f}s, {row['retries']} retries")
+
+        # Slowest tickers by average provider latency
+        self.stdout.write(f"\nSlowest {options['top']} tickers (average provider latency):")
+        slowest = (tickers.filter(provider_latency__isnull=False).values('ticker', 'asset_class')
+                   .annotate(latency=Avg('provider_latency'), count=Count('id'), retries=Sum('retries'))
+                   .order_by('-latency')[:options['top']])
+        for row in slowest:
+            self.stdout.write(f"{row['ticker']:<15} ({row['asset_class']}) {row['latency']:.3f}s over {row['count']} runs, "
+                              f"{row['retries']} retries")
+
+        # Most frequent errors
+        errors = (tickers.filter(error_class__isnull=False).values('error_class')
+                  .annotate(count=Count('id')).order_by('-count'))
+        if errors:
+            self.stdout.write("\nErrors:")
+            for row in errors:
+                self.stdout.write(f"{row['error_class']:<30} {row['count']}")
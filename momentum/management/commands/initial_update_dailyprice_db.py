@@ -1,38 +1,103 @@
-# Executed twice it will create duplicates!
-
-import yfinance as yf
-import pandas as pd
+import time
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
-from momentum.models import DailyPrice, Equity_Tickers, Bond_Tickers, Forex_Tickers, Cryptocurrency_Tickers, Commodity_Tickers
+from momentum.ingestion import ASSET_CLASS_MODELS, WorkItem, FetchPool, add_pool_arguments
+from momentum.latest_prices import refresh_latest_prices
+from momentum.ledger import RunLedger
+from momentum.panel import format_panel_stats, refresh_price_panel
+from momentum.partitions import ensure_partitions
+from momentum.providers import add_provider_arguments, get_provider_from_options
+from momentum.price_writer import CopyBackfill, frame_to_records
 
 class Command(BaseCommand):
-    help = 'Populate the DailyPrice table with historical price data from yfinance'
-
-    def handle(self, *args, **kwargs):
-        # Define the asset classes and their corresponding models
-        asset_class_models = {
-            'equity': Equity_Tickers,
-            'bond': Bond_Tickers,
-            'forex': Forex_Tickers,
-            'cryptocurrency': Cryptocurrency_Tickers,
-            'commodity': Commodity_Tickers,
-        }
+    help = 'Backfill the DailyPrice table with historical price data from the price provider (COPY into staging, then one merge)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-panel', action='store_true',
+                            help='Do not rebuild the memory-mapped price panel after the backfill')
+        add_pool_arguments(parser)
+        add_provider_arguments(parser)
+
+    def handle(self, *args, **options):
+        # Fetch historical data from the provider (adjust period as needed, but data should ideally cover +10y)
+        work_items = [
+            WorkItem(ticker, name, asset_class, "2010-01-01")
+            for asset_class, model in ASSET_CLASS_MODELS.items()
+            for ticker, name in model.objects.values_list('ticker', 'name')  # Get ticker and name
+            if ticker  # Ensure the ticker is not empty
+        ]
 
         # List to store tickers with errors
         not_found_tickers = []
+        run_started = time.perf_counter()
+
+        provider = get_provider_from_options(options)
+        pool = FetchPool.from_options(options, provider)
+        # A bar dated in a year without a partition would be rejected
+        ensure_partitions(self.stdout)
+        ledger = RunLedger('initial_update_dailyprice_db', provider.name)
+        self.stdout.write(f"Fetching {len(work_items)} tickers from {provider.name} ({pool.workers} workers, {pool.limiter.rate:g} calls/s)")
+
+        def fetch(item):
+            started = time.perf_counter()
+            data = provider.history(item.ticker, item.start_date, timeout=pool.timeout)
+            return data, time.perf_counter() - started
+
+        jobs = [(item, [item.ticker], fetch, (item,)) for item in work_items]
+
+        # Every downloaded frame is streamed into a staging table, then merged into DailyPrice at once
+        with CopyBackfill() as backfill:
+            for item, result, error in pool.run(jobs):
+                if error is not None:
+                    self.stdout.write(f"Error fetching data for ticker {item.ticker}: {error}")
+                    ledger.record_error(item.ticker, item.asset_class, error)
+                    not_found_tickers.append({'ticker': item.ticker, 'name': item.name, 'asset_class': item.asset_class})
+                    continue
 
-        # Loop through each asset class and its model
-        for asset_class, model in asset_class_models.items():
-            self.stdout.write(f"Processing {asset_class} tickers")
-            tickers = model.objects.values_list('ticker', 'name')  # Get ticker and name
+                data, latency = result
+                ledger.record(item.ticker, item.asset_class, provider_latency=latency)
 
-            # For each ticker, fetch data from yfinance
-            for ticker, name in tickers:
-                if ticker:  # Ensure the ticker is not empty
-                    if not self.fetch_and_save_daily_price_data(ticker, name, asset_class):
-                        # If fetching data fails, add to not_found_tickers list
-                        not_found_tickers.append({'ticker': ticker, 'name': name, 'asset_class': asset_class})
+                # Check if data is empty, meaning no data was found for the ticker
+                if data.empty:
+                    ledger.record_error(item.ticker, item.asset_class, 'NoData')
+                    not_found_tickers.append({'ticker': item.ticker, 'name': item.name, 'asset_class': item.asset_class})
+                    continue
+
+                fetch_timestamp = timezone.now()  # Capture the current timestamp once per batch
+                copy_before = backfill.copy_seconds
+                try:
+                    # Savepoint per ticker: a rejected COPY (e.g. a price beyond numeric(12, 4)) keeps the rows staged so far
+                    with transaction.atomic():
+                        staged = backfill.stage_frame(
+                            frame_to_records(data, item.ticker, item.name, item.asset_class, fetch_timestamp))
+                except Exception as e:
+                    self.stdout.write(f"Error staging data for ticker {item.ticker}: {e}")
+                    ledger.record_error(item.ticker, item.asset_class, e)
+                    not_found_tickers.append({'ticker': item.ticker, 'name': item.name, 'asset_class': item.asset_class})
+                    continue
+                # Rows actually changed are only known for the whole merge, not per ticker
+                ledger.record(item.ticker, item.asset_class, rows_fetched=staged,
+                              db_write_seconds=backfill.copy_seconds - copy_before)
+
+            self.stdout.write(f"Merging {backfill.staged_rows} staged rows into DailyPrice")
+            backfill.merge()
+            copy_rate, merge_rate = backfill.rows_per_second()
+
+        self.stdout.write(
+            f"COPY: {backfill.staged_rows} rows in {backfill.copy_seconds:.2f}s ({copy_rate:,.0f} rows/s) | "
+            f"merge: {backfill.merged_rows} rows in {backfill.merge_seconds:.2f}s ({merge_rate:,.0f} rows/s) | "
+            f"total run: {time.perf_counter() - run_started:.1f}s"
+        )
+
+        run = ledger.finish(retries=pool.retries, rows_changed=backfill.merged_rows)
+        self.stdout.write(f"Run #{run.pk} recorded in the ingestion ledger")
+
+        retried = pool.retry_summary()
+        if retried:
+            self.stdout.write("Tickers retried after transient errors:")
+            for ticker, count in retried:
+                self.stdout.write(f"{ticker} - {count} retr{'y' if count == 1 else 'ies'}")
 
         # Print the tickers that were not found
         if not_found_tickers:
@@ -42,43 +107,14 @@ class Command(BaseCommand):
         else:
             self.stdout.write("All tickers processed successfully without errors.")
 
-    def fetch_and_save_daily_price_data(self, ticker, name, asset_class):
         try:
-            # Fetch historical data from yfinance (adjust period as needed, but data should ideally cover +10y)
-            data = yf.download(ticker, start="2010-01-01", progress=False, auto_adjust=False)
-
-            # Check if data is empty, meaning no data was found for the ticker
-            if data.empty:
-                return False  # No data found for this ticker
-
-            # Prepare a list for batch insertion
-            daily_price_objects = []
-            fetch_timestamp = timezone.now()  # Capture the current timestamp once per batch
-
-            # Store OHLCV data in the database using iloc for specific elements
-            for i in range(len(data)):
-                row = data.iloc[i]
-                date = data.index[i].date()  # Convert timestamp index to date
-
-                # Extract OHLCV data using iloc with specific indices
-                daily_price = DailyPrice(
-                    date=date,
-                    asset_class=asset_class,
-                    ticker=ticker,
-                    name=name,
-                    open=float(row.iloc[4]) if pd.notna(row.iloc[4]) else None,
-                    high=float(row.iloc[2]) if pd.notna(row.iloc[2]) else None,
-                    low=float(row.iloc[3]) if pd.notna(row.iloc[3]) else None,
-                    adj_close=float(row.iloc[0]) if pd.notna(row.iloc[0]) else None,
-                    volume=int(row.iloc[5]) if pd.notna(row.iloc[5]) else None,
-                    fetch_date=fetch_timestamp  # Use the same timestamp for all rows in this batch
-                )
-                daily_price_objects.append(daily_price)
-
-            # Bulk insert into the database
-            DailyPrice.objects.bulk_create(daily_price_objects, ignore_conflicts=True)
-            return True  # Data was successfully found and processed    
-
+            self.stdout.write(f"Latest prices refreshed in {refresh_latest_prices():.2f}s")
         except Exception as e:
-            self.stdout.write(f"Error fetching data for ticker {ticker}: {e}")
-            return False  # Return False on error
+            self.stdout.write(f"Latest prices refresh failed: {e}")
+
+        # A backfill rewrites most of the history: rebuild the panel rather than patching it
+        if not options['skip_panel']:
+            try:
+                self.stdout.write(format_panel_stats(refresh_price_panel(full=True)))
+            except Exception as e:
+                self.stdout.write(f"Price panel rebuild failed: {e}")
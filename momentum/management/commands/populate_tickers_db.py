@@ -1,10 +1,14 @@
 import os
 import pandas as pd
-import yfinance as yf
 import logging
+from decimal import ROUND_HALF_UP, Decimal
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from momentum.ingestion import ASSET_CLASS_MODELS, load_universe
+from momentum.instruments import sync_instruments
 from momentum.models import Equity_Tickers, Bond_Tickers, Forex_Tickers, Cryptocurrency_Tickers, Commodity_Tickers
+from momentum.providers import add_provider_arguments, get_provider_from_options
 
 # Suppress yfinance logging for errors and warnings
 logging.getLogger("yfinance").setLevel(logging.CRITICAL)
@@ -12,7 +16,17 @@ logging.getLogger("yfinance").setLevel(logging.CRITICAL)
 class Command(BaseCommand):
     help = 'Updates the ticker tables with the latest information (from a CSV file + yfinance)'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--bulk', action='store_true',
+                            help='Diff each CSV with its table and apply only the inserts, updates and deletes '
+                                 '(one transaction per model)')
+        parser.add_argument('--refresh-names', action='store_true',
+                            help='With --bulk: look up name_from_source for every ticker, not only new or changed ones')
+        add_provider_arguments(parser)
+
     def handle(self, *args, **kwargs):
+        self.provider = get_provider_from_options(kwargs)
+
         # Define the file paths
         file_paths = {
             'bond': os.path.join(settings.BASE_DIR, 'momentum', 'tickers', 'bond_export.csv'),
@@ -32,6 +46,10 @@ class Command(BaseCommand):
                 data = pd.read_csv(file_path, encoding='ISO-8859-1')
                 data = data.where(pd.notnull(data), None)
 
+                if kwargs['bulk']:
+                    self.bulk_sync(model_name, data, kwargs['refresh_names'])
+                    continue
+
                 if model_name == 'equity':
                     for _, row in data.iterrows():
                         Equity_Tickers.objects.update_or_create(
@@ -126,6 +144,10 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(f"File {file_path} not found.")
 
+        # New tickers get their instrument (the key DailyPrice rows refer to), renamed ones a new name
+        instruments = sync_instruments(load_universe())
+        self.stdout.write(f"{instruments} instruments synchronized.")
+
         # Print a success message if everything went smoothly
         self.stdout.write("All files processed successfully and database updated.")
 
@@ -145,11 +167,8 @@ class Command(BaseCommand):
 
             for instance in instances:
                 if instance.ticker:
-                    # Attempt to fetch data from yfinance
-                    ticker_data = yf.Ticker(instance.ticker)
-                    info = ticker_data.info
-                    # Get the name from source
-                    name_from_source = info.get('longName') or info.get('shortName')
+                    # Get the name from source (yfinance by default)
+                    name_from_source = self.provider.long_name(instance.ticker)
                     
                     # Only proceed if name_from_source is found
                     if name_from_source:
@@ -157,3 +176,86 @@ class Command(BaseCommand):
                         instance.save()
                     else:
                         self.stdout.write(f"No name_from_source found for ticker {instance.ticker}")
+
+    def bulk_sync(self, model_name, data, refresh_names=False):
+        """
+        Apply the CSV to its model as a diff on the (asset_class, name) key: one bulk insert,
+        one bulk update of the changed rows and one delete of the rows gone from the CSV.
+        Model fields the CSV has no column for are left as they are.
+        """
+        model = ASSET_CLASS_MODELS[model_name]
+        fields = [field for field in model._meta.concrete_fields if not field.primary_key and field.name in data.columns]
+        key_fields = ['asset_class', 'name']
+
+        # Incoming rows with the same Python types as the stored ones (last CSV row wins for a key)
+        incoming = {}
+        for record in data[[field.name for field in fields]].to_dict('records'):
+            values = {field.name: self.incoming_value(field, record[field.name]) for field in fields}
+            incoming[(values['asset_class'], values['name'])] = values
+
+        existing = {(instance.asset_class, instance.name): instance for instance in model.objects.all()}
+
+        to_create = [model(**values) for key, values in incoming.items() if key not in existing]
+        to_update, updated_fields, new_tickers = [], set(), set()
+        for key, values in incoming.items():
+            instance = existing.get(key)
+            if instance is None:
+                continue
+            changed = [name for name, value in values.items() if getattr(instance, name) != value]
+            if changed:
+                for name in changed:
+                    setattr(instance, name, values[name])
+                updated_fields.update(changed)
+                to_update.append(instance)
+                if 'ticker' in changed:
+                    new_tickers.add(key)
+        to_delete = [instance.pk for key, instance in existing.items() if key not in incoming]
+
+        with transaction.atomic():
+            if to_delete:
+                model.objects.filter(pk__in=to_delete).delete()
+            if to_create:
+                # update_conflicts: a row inserted meanwhile by another process is updated instead
+                model.objects.bulk_create(
+                    to_create, batch_size=1000, update_conflicts=True, unique_fields=key_fields,
+                    update_fields=[field.name for field in fields if field.name not in key_fields],
+                )
+            if to_update:
+                model.objects.bulk_update(to_update, sorted(updated_fields), batch_size=1000)
+
+        unchanged = len(incoming) - len(to_create) - len(to_update)
+        self.stdout.write(f"{model.__name__}: {len(to_create)} inserted, {len(to_update)} updated, "
+                          f"{len(to_delete)} deleted, {unchanged} unchanged")
+
+        # Provider look-ups only for the new rows and the rows whose ticker changed. A ticker the provider
+        # has no name for was already tried when it was added: it is not asked again on every run
+        if refresh_names:
+            lookup = model.objects.exclude(ticker__isnull=True).exclude(ticker='')
+        else:
+            keys = {(instance.asset_class, instance.name) for instance in to_create} | new_tickers
+            lookup = [instance for instance in model.objects.exclude(ticker__isnull=True).exclude(ticker='')
+                      if (instance.asset_class, instance.name) in keys]
+        self.bulk_update_names(model, lookup)
+
+    def incoming_value(self, field, value):
+        """CSV value converted the way the database would store it, so unchanged rows compare equal."""
+        if pd.isna(value):
+            return None
+        if isinstance(field, models.DecimalField):
+            # pandas reads decimals as floats: go through their shortest repr and round like numeric(p, s)
+            return Decimal(str(value)).quantize(Decimal(1).scaleb(-field.decimal_places), rounding=ROUND_HALF_UP)
+        return field.to_python(value)
+
+    def bulk_update_names(self, model, instances):
+        """Set name_from_source from the provider, writing the changed rows with one bulk update."""
+        changed = []
+        for instance in instances:
+            name_from_source = self.provider.long_name(instance.ticker)
+            if not name_from_source:
+                self.stdout.write(f"No name_from_source found for ticker {instance.ticker}")
+            elif name_from_source != instance.name_from_source:
+                instance.name_from_source = name_from_source
+                changed.append(instance)
+        if changed:
+            model.objects.bulk_update(changed, ['name_from_source'], batch_size=1000)
+        self.stdout.write(f"{model.__name__}: name_from_source looked up for {len(instances)} tickers, {len(changed)} updated")
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from momentum.ingestion import ASSET_CLASS_MODELS
+from momentum.providers import get_provider, record_fixture
+
+class Command(BaseCommand):
+    help = 'Record daily price frames from yfinance to CSV files that the fixture provider can replay offline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory the CSV frames are written to')
+        parser.add_argument('--tickers', nargs='*', default=None,
+                            help='Tickers to record (default: every ticker of the universe)')
+        parser.add_argument('--start', default='2010-01-01', help='First date to record')
+
+    def handle(self, *args, **options):
+        provider = get_provider('yfinance')
+
+        tickers = options['tickers']
+        if not tickers:
+            tickers = [
+                ticker
+                for model in ASSET_CLASS_MODELS.values()
+                for ticker in model.objects.exclude(ticker__isnull=True).exclude(ticker='').values_list('ticker', flat=True)
+            ]
+
+        recorded = 0
+        for ticker in tickers:
+            try:
+                data = provider.history(ticker, options['start'])
+            except Exception as e:
+                self.stdout.write(f"Error fetching data for ticker {ticker}: {e}")
+                continue
+            record_fixture(options['directory'], ticker, data)
+            recorded += 1
+            self.stdout.write(f"{ticker}: {len(data)} bars")
+
+        self.stdout.write(self.style.SUCCESS(f"Recorded {recorded}/{len(tickers)} tickers to {options['directory']}"))
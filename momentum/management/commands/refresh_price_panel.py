@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from momentum.panel import PANEL_FIELDS, default_panel_dir, format_panel_stats, open_price_panel, refresh_price_panel
+
+class Command(BaseCommand):
+    help = ('Refresh the memory-mapped price panel (dates x instruments float64 arrays of every DailyPrice field) '
+            'with the bars fetched since the last refresh, or rebuild it')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Rebuild the whole panel from DailyPrice (drops bars deleted since the last build)')
+        parser.add_argument('--directory', default=None,
+                            help=f'Panel directory (default: PRICE_PANEL_DIR, {default_panel_dir()})')
+
+    def handle(self, *args, **options):
+        stats = refresh_price_panel(directory=options['directory'], full=options['full'])
+        self.stdout.write(format_panel_stats(stats))
+
+        panel = open_price_panel(options['directory'])
+        self.stdout.write(f"{panel.build_dir}: {len(panel.tickers)} instruments x {panel.n_dates} days "
+                          f"from {panel.origin} ({', '.join(PANEL_FIELDS)}), watermark {panel.meta['watermark']}")
+
@@ -0,0 +1,125 @@
+import time
+from collections import Counter, defaultdict
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from momentum.gaps import find_gaps, load_stored_dates
+from momentum.ingestion import ASSET_CLASS_MODELS, FetchPool, add_pool_arguments
+from momentum.latest_prices import refresh_latest_prices
+from momentum.ledger import RunLedger
+from momentum.models import Instrument
+from momentum.price_writer import frame_to_records, write_changed_prices
+from momentum.providers import PriceDataMissing, add_provider_arguments, get_provider_from_options
+
+class Command(BaseCommand):
+    help = ('Find the trading days missing from stored DailyPrice histories (exchange calendars + weekdays) '
+            'and fetch only those ranges from the price provider')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--asset-class', nargs='*', choices=sorted(ASSET_CLASS_MODELS), default=None,
+                            help='Only check these asset classes')
+        parser.add_argument('--tickers', nargs='*', default=None,
+                            help='Only check these tickers')
+        parser.add_argument('--since', default=None,
+                            help='Ignore gaps before this date (YYYY-MM-DD)')
+        parser.add_argument('--merge-within', type=int, default=5,
+                            help='Fetch gaps separated by at most this many stored trading days with one request')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the missing ranges without fetching them')
+        add_pool_arguments(parser)
+        add_provider_arguments(parser)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stored = load_stored_dates(options['asset_class'], options['tickers'])
+        gaps = find_gaps(stored, since=options['since'], merge_within=options['merge_within'])
+
+        missing_days = sum(gap.missing_days for gap in gaps)
+        self.stdout.write(f"Checked {len(stored)} stored bars in {time.perf_counter() - started:.2f}s: "
+                          f"{missing_days} missing trading days in {len(gaps)} ranges "
+                          f"across {len({(gap.ticker, gap.asset_class) for gap in gaps})} tickers")
+
+        if not gaps:
+            self.stdout.write("No gaps found.")
+            return
+
+        if options['dry_run']:
+            for gap in gaps:
+                self.stdout.write(f"{gap.ticker} ({gap.asset_class}): {gap.start} to {gap.end} - {gap.missing_days} days")
+            return
+
+        self.repair(gaps, options)
+
+    def repair(self, gaps, options):
+        provider = get_provider_from_options(options)
+        pool = FetchPool.from_options(options, provider)
+        ledger = RunLedger('repair_dailyprice_gaps', provider.name)
+        # Gaps come from stored bars, so every ticker has an Instrument, even one dropped from the ticker models
+        names = {(ticker, asset_class): name for ticker, asset_class, name in Instrument.objects.values_list('ticker', 'asset_class', 'name')}
+
+        self.stdout.write(f"Fetching {len(gaps)} ranges from {provider.name} ({pool.workers} workers, {pool.limiter.rate:g} calls/s)")
+
+        def fetch(gap):
+            started = time.perf_counter()
+            data = provider.history(gap.ticker, gap.start, timeout=pool.timeout, end_date=gap.end)
+            return data, time.perf_counter() - started
+
+        jobs = [(gap, [gap.ticker], fetch, (gap,)) for gap in gaps]
+
+        # A ticker can have several ranges: its ledger entry holds the totals
+        totals = defaultdict(Counter)
+        unavailable = []
+        not_found_tickers = []
+
+        for gap, result, error in pool.run(jobs):
+            key = (gap.ticker, gap.asset_class)
+            if isinstance(error, PriceDataMissing):
+                # Nothing to fill: most likely a closure missing from the holiday table
+                unavailable.append(gap)
+                continue
+            if error is not None:
+                self.stdout.write(f"Error fetching {gap.ticker} ({gap.asset_class}) {gap.start} to {gap.end}: {error}")
+                ledger.record_error(gap.ticker, gap.asset_class, error)
+                not_found_tickers.append({'ticker': gap.ticker, 'name': names.get(key, ''), 'asset_class': gap.asset_class})
+                continue
+
+            data, latency = result
+            try:
+                write_started = time.perf_counter()
+                records = frame_to_records(data, gap.ticker, names.get(key, ''), gap.asset_class, timezone.now())
+                counts = write_changed_prices(records)
+            except Exception as e:
+                self.stdout.write(f"Error saving data for ticker {gap.ticker} ({gap.asset_class}): {e}")
+                ledger.record_error(gap.ticker, gap.asset_class, e)
+                continue
+
+            ledger.count_bars(counts)
+            totals[key].update(provider_latency=latency, rows_fetched=len(records),
+                               rows_changed=counts['inserted'] + counts['updated'],
+                               db_write_seconds=time.perf_counter() - write_started)
+            ledger.record(gap.ticker, gap.asset_class, **totals[key])
+
+        run = ledger.finish(retries=pool.retries)
+        self.stdout.write(f"Filled {run.rows_inserted} of {sum(gap.missing_days for gap in gaps)} missing trading days "
+                          f"({run.rows_updated} bars restated) in {run.wall_seconds:.1f}s")
+        if run.rows_inserted or run.rows_updated:
+            # Filled days can be lookback anchors of the performance commands
+            try:
+                self.stdout.write(f"Latest prices refreshed in {refresh_latest_prices():.2f}s")
+            except Exception as e:
+                self.stdout.write(f"Latest prices refresh failed: {e}")
+
+        if unavailable:
+            self.stdout.write(f"{len(unavailable)} ranges have no data at the provider (closures missing from Exchange_Holiday?):")
+            for gap in unavailable:
+                self.stdout.write(f"{gap.ticker} ({gap.asset_class}): {gap.start} to {gap.end}")
+
+        retried = pool.retry_summary()
+        if retried:
+            self.stdout.write("Tickers retried after transient errors:")
+            for ticker, count in retried:
+                self.stdout.write(f"{ticker} - {count} retr{'y' if count == 1 else 'ies'}")
+
+        if not_found_tickers:
+            self.stdout.write("Tickers not found or encountered errors:")
+            for ticker_info in not_found_tickers:
+                self.stdout.write(f"{ticker_info['ticker']} - {ticker_info['name']} ({ticker_info['asset_class']})")
@@ -0,0 +1,112 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from momentum.ingestion import build_incremental_work_items, load_universe
+from momentum.management.commands.frequent_update_dailyprice_db import Command as FrequentUpdateCommand
+from momentum.scheduler import calendar_fingerprint, load_calendars, group_universe_by_market, next_session_close
+
+# Longest sleep between two checks of the timetable (keeps Ctrl+C and reloads responsive)
+MAX_SLEEP_SECONDS = 60
+
+class Command(BaseCommand):
+    help = ('Follow-the-sun ingestion: stays up, fetches each exchange shortly after its local close '
+            'and crypto / other markets on their own intervals')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--close-delay', type=int, default=20,
+                            help='Minutes after an exchange closes before its tickers are fetched')
+        parser.add_argument('--crypto-interval', type=int, default=60,
+                            help='Minutes between cryptocurrency runs')
+        parser.add_argument('--other-interval', type=int, default=240,
+                            help='Minutes between runs for forex, commodities and tickers without an exchange calendar')
+        parser.add_argument('--refresh-hours', type=float, default=24,
+                            help='Hours between reloads of the ticker universe and the exchange calendars')
+        parser.add_argument('--once', action='store_true',
+                            help='Run the jobs that are due now, then exit')
+        parser.add_argument('--show-schedule', action='store_true',
+                            help='Print the upcoming timetable and exit')
+        # Same fetch options as frequent_update_dailyprice_db (batched mode, pool, provider)
+        FrequentUpdateCommand.add_arguments(self, parser)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.updater = FrequentUpdateCommand()
+        self.updater.stdout = self.stdout
+        self.updater.stderr = self.stderr
+
+        self.load_state()
+        # Interval jobs run right away; exchange jobs wait for their next close
+        now = timezone.now()
+        self.next_runs = {name: self.next_run(name, now, first=True) for name in self.groups}
+
+        if options['show_schedule']:
+            self.print_schedule()
+            return
+
+        self.stdout.write(f"Ingestion daemon started with {sum(len(g) for g in self.groups.values())} tickers "
+                          f"in {len(self.groups)} groups")
+        self.print_schedule()
+
+        while True:
+            now = timezone.now()
+            # Reload on schedule, or right away when exchanges / holidays were re-imported
+            if now >= self.reload_at or calendar_fingerprint() != self.fingerprint:
+                previous = self.fingerprint
+                self.load_state()
+                # New trading hours move the next close of every exchange group
+                self.next_runs = {
+                    name: self.next_run(name, now, first=True)
+                    if name not in self.next_runs or (name in self.calendars and self.fingerprint != previous)
+                    else self.next_runs[name]
+                    for name in self.groups
+                }
+
+            due = sorted((when, name) for name, when in self.next_runs.items() if when <= now)
+            for _, name in due:
+                self.run_group(name)
+                self.next_runs[name] = self.next_run(name, timezone.now())
+
+            if options['once']:
+                return
+
+            wake_at = min(min(self.next_runs.values()), self.reload_at)
+            time.sleep(max(1.0, min(MAX_SLEEP_SECONDS, (wake_at - timezone.now()).total_seconds())))
+
+    def load_state(self):
+        """Load the ticker universe and calendars once per refresh period (not once per run)."""
+        close_old_connections()
+        self.fingerprint = calendar_fingerprint()
+        self.calendars = load_calendars()
+        self.universe = load_universe()
+        self.groups = group_universe_by_market(self.universe, self.calendars)
+        self.reload_at = timezone.now() + timedelta(hours=self.options['refresh_hours'])
+
+    def next_run(self, name, now, first=False):
+        if name == 'cryptocurrency':
+            return now if first else now + timedelta(minutes=self.options['crypto_interval'])
+        if name == 'other':
+            return now if first else now + timedelta(minutes=self.options['other_interval'])
+
+        # Exchange group: shortly after its next local close
+        ex, holidays = self.calendars[name]
+        delay = timedelta(minutes=self.options['close_delay'])
+        return next_session_close(ex, holidays, now - delay) + delay
+
+    def run_group(self, name):
+        close_old_connections()  # The connection may have been idle for hours
+        started = time.perf_counter()
+        self.stdout.write(f"[{timezone.now():%Y-%m-%d %H:%M} UTC] Running {name} ({len(self.groups[name])} tickers)")
+
+        try:
+            work_items = build_incremental_work_items(self.groups[name])
+            self.updater.update(work_items, {**self.options, 'all_tickers': False})
+        except Exception as e:
+            self.stdout.write(f"Run for {name} failed: {e}")
+
+        self.stdout.write(f"{name} finished in {time.perf_counter() - started:.1f}s")
+
+    def print_schedule(self):
+        for name, when in sorted(self.next_runs.items(), key=lambda item: item[1]):
+            self.stdout.write(f"  {when:%Y-%m-%d %H:%M} UTC  {name} ({len(self.groups[name])} tickers)")
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import parse_qs, urlsplit
+from django.core.management.base import BaseCommand, CommandError
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+from momentum.instruments import instrument_ids
+from momentum.models import DailyPrice
+from momentum.streaming import ASSET_CLASS, load_stream_symbols
+
+# Price a symbol starts from when nothing is stored for it
+DEFAULT_START_PRICE = 100.0
+
+class Command(BaseCommand):
+    help = ('Local stand-in for the crypto trade feed: serves random-walk trades in the Binance trade stream '
+            'format over a websocket, so stream_crypto_prices can be tested and benchmarked offline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+        parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+        parser.add_argument('--rate', type=float, default=50,
+                            help='Trades per second sent to each client (0: as fast as possible)')
+        parser.add_argument('--batch', type=int, default=1,
+                            help='Trades per websocket message (more than 1 sends JSON arrays)')
+        parser.add_argument('--volatility', type=float, default=1e-4,
+                            help='Standard deviation of the relative price move of one trade')
+        parser.add_argument('--clock-start', default=None,
+                            help='UTC time of the first trade, e.g. 2026-10-18T23:59:30 to exercise a day change '
+                                 '(default: now); the clock then advances in real time')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options['seed'])
+        self.symbols = load_stream_symbols()
+        if not self.symbols:
+            raise CommandError("No cryptocurrency tickers to serve.")
+
+        # Random walks start from the last stored closes
+        ids = instrument_ids(ASSET_CLASS)
+        self.prices = {symbol: DEFAULT_START_PRICE for symbol in self.symbols}
+        for symbol, (ticker, _) in self.symbols.items():
+            close = (DailyPrice.objects.filter(instrument_id=ids.get(ticker), adj_close__isnull=False)
+                     .order_by('-date').values_list('adj_close', flat=True).first())
+            if close is not None:
+                self.prices[symbol] = float(close)
+
+        self.clock_offset_ms = 0
+        if options['clock_start']:
+            start = datetime.fromisoformat(options['clock_start'])
+            if start.tzinfo is None:
+                start = start.replace(tzinfo=dt_timezone.utc)
+            self.clock_offset_ms = start.timestamp() * 1000 - time.time() * 1000
+        self.trade_id = 0
+
+        self.stdout.write(f"Serving {len(self.symbols)} symbols on ws://{options['host']}:{options['port']} "
+                          f"at {options['rate'] or 'max'} trades/s per client")
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            self.stdout.write(f"Stopped after {self.trade_id} trades.")
+
+    async def serve(self):
+        async with serve(self.send_trades, self.options['host'], self.options['port'], max_size=None) as server:
+            await server.serve_forever()
+
+    async def send_trades(self, websocket):
+        # Subscribed streams from the path (?streams=btcusdt@trade/...), every symbol without one
+        query = parse_qs(urlsplit(websocket.request.path).query)
+        requested = {name.split('@')[0].upper() for value in query.get('streams', []) for name in value.split('/')}
+        symbols = sorted(requested & set(self.symbols)) if requested else sorted(self.symbols)
+        if not symbols:
+            await websocket.close(reason='No known symbols requested')
+            return
+
+        rate, batch = self.options['rate'], max(1, self.options['batch'])
+        self.stdout.write(f"Client connected: {len(symbols)} symbols")
+        sent = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                trades = [self.next_trade(self.random.choice(symbols)) for _ in range(batch)]
+                await websocket.send(json.dumps(trades if batch > 1 else trades[0]))
+                sent += batch
+                if rate:
+                    # Keep the average rate; sleeping per message also lets other clients run
+                    await asyncio.sleep(max(0.0, started + sent / rate - time.perf_counter()))
+                elif sent % 1000 < batch:
+                    await asyncio.sleep(0)
+        except ConnectionClosed:
+            pass
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Client disconnected after {sent} trades ({sent / elapsed if elapsed else 0:,.0f} trades/s)")
+
+    def next_trade(self, symbol):
+        price = self.prices[symbol] * (1 + self.random.gauss(0, self.options['volatility']))
+        self.prices[symbol] = price
+        self.trade_id += 1
+        trade_ms = int(time.time() * 1000 + self.clock_offset_ms)
+        return {
+            'stream': f'{symbol.lower()}@trade',
+            'data': {
+                'e': 'trade', 'E': trade_ms, 's': symbol, 't': self.trade_id,
+                'p': f'{price:.8f}', 'q': f'{self.random.expovariate(1 / 0.05):.6f}',
+                'T': trade_ms, 'm': self.random.random() < 0.5,
+            },
+        }
@@ -0,0 +1,149 @@
+import asyncio
+import statistics
+import time
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed, InvalidHandshake, InvalidURI
+from momentum.latest_prices import refresh_latest_prices
+from momentum.ledger import RunLedger
+from momentum.partitions import ensure_partitions
+from momentum.streaming import (ASSET_CLASS, DEFAULT_FEED_URL, DailyBarAggregator, feed_url, load_current_bars,
+                                load_stream_symbols, parse_trades, write_bars)
+
+# Longest wait between two reconnection attempts
+MAX_RECONNECT_SECONDS = 30
+
+class Command(BaseCommand):
+    help = ('Stream cryptocurrency trades from a websocket feed, aggregate them into the current daily bars '
+            'in memory and flush the moved bars to DailyPrice as live rows on a short interval')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=DEFAULT_FEED_URL,
+                            help='Feed base URL (ws://127.0.0.1:8765 for serve_crypto_feed); '
+                                 'the trade streams of the tickers are appended unless it has a query')
+        parser.add_argument('--tickers', nargs='*', default=None,
+                            help='Tickers to stream (default: the whole Cryptocurrency_Tickers universe)')
+        parser.add_argument('--flush-interval', type=float, default=5.0,
+                            help='Seconds between two flushes of the moved bars')
+        parser.add_argument('--duration', type=float, default=0,
+                            help='Stop after this many seconds (default: run until interrupted)')
+
+    def handle(self, *args, **options):
+        self.symbols = load_stream_symbols(options['tickers'])
+        if not self.symbols:
+            raise CommandError("No cryptocurrency tickers to stream.")
+
+        # The stream can run past New Year: its bars need next year's partition
+        ensure_partitions(self.stdout)
+        self.aggregator = DailyBarAggregator(self.symbols)
+        self.aggregator.seed(load_current_bars(self.symbols, timezone.now().date()))
+        self.url = feed_url(options['url'], self.symbols)
+        self.ledger = RunLedger('stream_crypto_prices', 'websocket')
+
+        # Totals of the run: written bars and database time per ticker, trade lag samples of the interval
+        self.written = {}
+        self.write_seconds = {}
+        self.trade_counts = {}
+        self.lags = []
+        self.latest_prices_stale = False  # Bars written since the last latest-price refresh
+
+        self.stdout.write(f"Streaming {len(self.symbols)} tickers from {self.url}")
+        started = time.perf_counter()
+        try:
+            asyncio.run(self.stream(options['flush_interval'], options['duration']))
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted.")
+        finally:
+            elapsed = time.perf_counter() - started
+            for ticker, _ in self.symbols.values():
+                self.ledger.record(ticker, ASSET_CLASS,
+                                   rows_fetched=self.trade_counts.get(ticker, 0),
+                                   rows_changed=self.written.get(ticker, 0),
+                                   db_write_seconds=self.write_seconds.get(ticker, 0.0))
+            run = self.ledger.finish()
+            if self.latest_prices_stale:
+                self.refresh_latest_prices()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Run #{run.pk}: {self.aggregator.trades} trades in {elapsed:.1f}s "
+            f"({self.aggregator.trades / elapsed if elapsed else 0:,.0f} trades/s), "
+            f"{self.aggregator.ignored} ignored, {run.rows_changed} bar writes"
+        ))
+
+    async def stream(self, flush_interval, duration):
+        consumer = asyncio.create_task(self.consume())
+        try:
+            deadline = time.monotonic() + duration if duration else None
+            while deadline is None or time.monotonic() < deadline:
+                wait = flush_interval if deadline is None else min(flush_interval, deadline - time.monotonic())
+                await asyncio.sleep(max(wait, 0))
+                if consumer.done():
+                    consumer.result()  # Re-raise what stopped the consumer
+                await self.flush()
+        finally:
+            consumer.cancel()
+            try:
+                await consumer
+            except (asyncio.CancelledError, Exception):
+                pass
+            # The open bars are final as of the last trade seen: nothing will update them any more
+            self.aggregator.close_bars()
+            await self.flush()
+
+    async def consume(self):
+        delay = 1
+        while True:
+            try:
+                async with connect(self.url, max_size=None) as websocket:
+                    delay = 1
+                    async for message in websocket:
+                        received_ms = time.time() * 1000
+                        for symbol, price, quantity, trade_ms in parse_trades(message):
+                            if self.aggregator.add(symbol, price, quantity, trade_ms):
+                                ticker = self.symbols[symbol][0]
+                                self.trade_counts[ticker] = self.trade_counts.get(ticker, 0) + 1
+                                self.lags.append(received_ms - trade_ms)
+            except InvalidURI as e:
+                raise CommandError(str(e))
+            except (OSError, ConnectionClosed, InvalidHandshake, TimeoutError) as e:
+                # The aggregated bars stay in memory; the stream resumes where the feed is
+                self.stdout.write(f"Feed disconnected ({type(e).__name__}: {e}), reconnecting in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_SECONDS)
+
+    async def flush(self):
+        # Bars of tickers without a trade since midnight UTC would otherwise stay live until their next trade
+        self.aggregator.close_bars(before=timezone.now().date())
+        bars = self.aggregator.drain()
+        lags, self.lags = self.lags, []
+        if not bars:
+            return
+
+        # The ORM is synchronous: the write runs in a worker thread while trades keep coming in
+        started = time.perf_counter()
+        await sync_to_async(write_bars, thread_sensitive=True)(bars, timezone.now())
+        seconds = time.perf_counter() - started
+
+        for bar in bars:
+            ticker = bar['ticker']
+            self.written[ticker] = self.written.get(ticker, 0) + 1
+            self.write_seconds[ticker] = self.write_seconds.get(ticker, 0.0) + seconds / len(bars)
+
+        final = sum(1 for bar in bars if not bar['is_live'])
+        self.latest_prices_stale = True
+        if final:
+            # A day closed (or the stream stopped): the final bars become the latest prices, live ones wait for the next
+            await sync_to_async(self.refresh_latest_prices, thread_sensitive=True)()
+            self.latest_prices_stale = False
+        lag = f", trade lag median {statistics.median(lags):.0f}ms max {max(lags):.0f}ms" if lags else ""
+        self.stdout.write(f"Flushed {len(bars)} bars ({final} final) in {seconds * 1000:.1f}ms "
+                          f"after {len(lags)} trades{lag}")
+
+    def refresh_latest_prices(self):
+        """Refresh the latest-price view read by the performance commands; a failure does not stop the stream."""
+        try:
+            self.stdout.write(f"Latest prices refreshed in {refresh_latest_prices():.2f}s")
+        except Exception as e:
+            self.stdout.write(f"Latest prices refresh failed: {e}")
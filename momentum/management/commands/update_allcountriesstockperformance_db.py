@@ -1,12 +1,15 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from datetime import timedelta
-from momentum.models import Equity_Tickers, CountryData, AllCountriesStockPerformance, DailyPrice
+from momentum.latest_prices import latest_prices, performance
+from momentum.models import Equity_Tickers, CountryData, AllCountriesStockPerformance
 
 class Command(BaseCommand):
     help = 'Populate the AllCountriesStockPerformance table with initial data'
 
     def handle(self, *args, **kwargs):
+        # Latest bar and lookback anchors of every equity, read once from the latest-price view
+        self.latest_prices = latest_prices('equity')
+
         # Fetch non-empty tickers from Equity_Tickers with non-null values in countries
         tickers = Equity_Tickers.objects.filter(ticker__isnull=False, country__isnull=False).exclude(ticker='')
 
@@ -17,15 +20,15 @@ class Command(BaseCommand):
             country_code = CountryData.objects.filter(country_name=country).values_list('country_code', flat=True).first()
 
             # Get the most recent price and fetch date for the ticker
-            latest_data = DailyPrice.objects.filter(ticker=ticker_entry.ticker).order_by('-date').values_list('adj_close', 'fetch_date').first()
-            latest_price, fetch_date = latest_data if latest_data else (None, None)
+            latest = self.latest_prices.get(ticker_entry.ticker)
+            latest_price, fetch_date = (latest.adj_close, latest.fetch_date) if latest else (None, None)
 
             # Calculate performance metrics based on different timeframes
-            d_performance = self.calculate_performance(ticker_entry.ticker, latest_price, days=1)
-            w_performance = self.calculate_performance(ticker_entry.ticker, latest_price, days=7)
-            m_performance = self.calculate_performance(ticker_entry.ticker, latest_price, days=30)
-            y_performance = self.calculate_performance(ticker_entry.ticker, latest_price, days=365)
-            decade_performance = self.calculate_performance(ticker_entry.ticker, latest_price, days=3650)
+            d_performance = performance(latest, 'd')
+            w_performance = performance(latest, 'w')
+            m_performance = performance(latest, 'm')
+            y_performance = performance(latest, 'y')
+            decade_performance = performance(latest, 'decade')
 
             # Update or create entry in AllCountriesStockPerformance
             AllCountriesStockPerformance.objects.update_or_create(
@@ -48,27 +51,3 @@ class Command(BaseCommand):
             )
 
         self.stdout.write("AllCountriesStockPerformance table successfully populated.")
-
-    def calculate_performance(self, ticker, latest_price, days):
-        """Calculate performance over a specific number of days."""
-        if latest_price is None:
-            return None
-        
-        # Get the date of the latest price
-        latest_price_entry = DailyPrice.objects.filter(ticker=ticker).order_by('-date').first()
-        latest_price_date = latest_price_entry.date if latest_price_entry else None
-
-        if not latest_price_date:
-            return None
-
-        # Calculate the target date based on the latest price date
-        target_date = latest_price_date - timedelta(days=days)
-                
-        # Get the closing price on or before the target date
-        target_price = DailyPrice.objects.filter(ticker=ticker, date__lte=target_date).order_by('-date').values_list('adj_close', flat=True).first()
-
-        # Calculate and return the performance percentage
-        if target_price:
-            return ((latest_price - target_price) / target_price) * 100
-        else:
-            return None
@@ -1,12 +1,15 @@
 from django.core.management.base import BaseCommand
 from django.db.models import Avg, Max, Min
-from datetime import timedelta
-from momentum.models import Equity_Tickers, AllRegionsStockPerformance, AllCountriesStockPerformance, DailyPrice, CountryData
+from momentum.latest_prices import latest_prices, performance
+from momentum.models import Equity_Tickers, AllRegionsStockPerformance, AllCountriesStockPerformance, CountryData
 
 class Command(BaseCommand):
     help = 'Populate the AllRegionsStockPerformance table with custom regions, individual ticker data, and calculated averages'
 
     def handle(self, *args, **kwargs):
+        # Latest bar and lookback anchors of every equity, read once from the latest-price view
+        self.latest_prices = latest_prices('equity')
+
         # Stage 1: Populate with unique custom regions
         self.populate_custom_regions()
 
@@ -44,14 +47,14 @@ class Command(BaseCommand):
             region = ticker_entry.region
             custom_region = ticker_entry.custom_region
 
-            latest_data = DailyPrice.objects.filter(ticker=ticker_entry.ticker).order_by('-date').values_list('adj_close', 'fetch_date').first()
-            latest_price, fetch_date = latest_data if latest_data else (None, None)
+            latest = self.latest_prices.get(ticker_entry.ticker)
+            latest_price, fetch_date = (latest.adj_close, latest.fetch_date) if latest else (None, None)
 
-            d_performance = self.calculate_performance(ticker_entry.ticker, latest_price, days=1)
-            w_performance = self.calculate_performance(ticker_entry.ticker, latest_price, days=7)
-            m_performance = self.calculate_performance(ticker_entry.ticker, latest_price, days=30)
-            y_performance = self.calculate_performance(ticker_entry.ticker, latest_price, days=365)
-            decade_performance = self.calculate_performance(ticker_entry.ticker, latest_price, days=3650)
+            d_performance = performance(latest, 'd')
+            w_performance = performance(latest, 'w')
+            m_performance = performance(latest, 'm')
+            y_performance = performance(latest, 'y')
+            decade_performance = performance(latest, 'decade')
 
             AllRegionsStockPerformance.objects.update_or_create(
                 region_name=region,
@@ -120,22 +123,3 @@ class Command(BaseCommand):
             basket.save()
 
         self.stdout.write("Country list populated for all Equity Basket rows in AllRegionsStockPerformance.")
-
-
-    def calculate_performance(self, ticker, latest_price, days):
-        if latest_price is None:
-            return None
-        
-        latest_price_entry = DailyPrice.objects.filter(ticker=ticker).order_by('-date').first()
-        latest_price_date = latest_price_entry.date if latest_price_entry else None
-
-        if not latest_price_date:
-            return None
-
-        target_date = latest_price_date - timedelta(days=days)
-        target_price = DailyPrice.objects.filter(ticker=ticker, date__lte=target_date).order_by('-date').values_list('adj_close', flat=True).first()
-
-        if target_price:
-            return ((latest_price - target_price) / target_price) * 100
-        else:
-            return None
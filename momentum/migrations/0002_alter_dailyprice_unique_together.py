@@ -0,0 +1,36 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:35
+
+from django.db import migrations
+
+# Keep one row per (ticker, asset_class, date): the latest fetch_date, then the highest id
+DEDUPLICATE_DAILYPRICE_SQL = """
+DELETE FROM momentum_dailyprice dp
+USING (
+    SELECT id
+    FROM (
+        SELECT id,
+               ROW_NUMBER() OVER (
+                   PARTITION BY ticker, asset_class, date
+                   ORDER BY fetch_date DESC, id DESC
+               ) AS rn
+        FROM momentum_dailyprice
+    ) ranked
+    WHERE ranked.rn > 1
+) duplicates
+WHERE dp.id = duplicates.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('momentum', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DEDUPLICATE_DAILYPRICE_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AlterUniqueTogether(
+            name='dailyprice',
+            unique_together={('ticker', 'asset_class', 'date')},
+        ),
+    ]
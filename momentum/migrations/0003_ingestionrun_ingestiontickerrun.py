@@ -0,0 +1,48 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('momentum', '0002_alter_dailyprice_unique_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('command', models.CharField(max_length=100)),
+                ('provider', models.CharField(max_length=50)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('wall_seconds', models.FloatField(blank=True, null=True)),
+                ('tickers_total', models.PositiveIntegerField(default=0)),
+                ('tickers_failed', models.PositiveIntegerField(default=0)),
+                ('rows_fetched', models.BigIntegerField(default=0)),
+                ('rows_changed', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IngestionTickerRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=20)),
+                ('asset_class', models.CharField(max_length=50)),
+                ('provider_latency', models.FloatField(blank=True, null=True)),
+                ('rows_fetched', models.PositiveIntegerField(default=0)),
+                ('rows_changed', models.PositiveIntegerField(blank=True, null=True)),
+                ('db_write_seconds', models.FloatField(blank=True, null=True)),
+                ('retries', models.PositiveIntegerField(default=0)),
+                ('error_class', models.CharField(blank=True, max_length=100, null=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tickers', to='momentum.ingestionrun')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ticker', 'asset_class'], name='momentum_in_ticker_3479b3_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:58
+
+from django.db import migrations, models
+
+# Keep one row per new unique key (the most recently inserted one) before the constraints are added
+DEDUPLICATE_SQL = """
+DELETE FROM {table} t
+USING (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY id DESC) AS rn
+    FROM {table}
+) ranked
+WHERE t.id = ranked.id AND ranked.rn > 1;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('momentum', '0004_ingestionrun_bar_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exchange_holiday',
+            name='exchange_name',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunSQL(DEDUPLICATE_SQL.format(table='momentum_exchange', key='country, exchange_short_name'),
+                          reverse_sql=migrations.RunSQL.noop),
+        migrations.RunSQL(DEDUPLICATE_SQL.format(table='momentum_exchange_holiday', key='country, exchange_name, date'),
+                          reverse_sql=migrations.RunSQL.noop),
+        migrations.RunSQL(DEDUPLICATE_SQL.format(table='momentum_countrydata', key='country_code'),
+                          reverse_sql=migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name='countrydata',
+            name='country_code',
+            field=models.CharField(max_length=3, unique=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='exchange',
+            unique_together={('country', 'exchange_short_name')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='exchange_holiday',
+            unique_together={('country', 'exchange_name', 'date')},
+        ),
+    ]
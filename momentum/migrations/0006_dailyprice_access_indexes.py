@@ -0,0 +1,30 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:03
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction; ingestion keeps writing meanwhile
+    atomic = False
+
+    dependencies = [
+        ('momentum', '0005_reference_data_unique_keys'),
+    ]
+
+    operations = [
+        # Latest bar / lookback of the performance commands, which filter on the ticker alone:
+        # WHERE ticker = %s [AND date <= %s] ORDER BY date DESC LIMIT 1. Lookups that also give the
+        # asset class already use the unique (ticker, asset_class, date) index of 0002
+        AddIndexConcurrently(
+            model_name='dailyprice',
+            index=models.Index(fields=['ticker', '-date'], name='dailyprice_ticker_date_desc'),
+        ),
+        # Next to the btree on date, which stays: bars are written instrument by instrument (backfill
+        # merge, history repairs), so only the tables fed day after day keep BRIN ranges narrow
+        AddIndexConcurrently(
+            model_name='dailyprice',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['date'], name='dailyprice_date_brin'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('momentum', '0006_dailyprice_access_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Instrument',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('asset_class', models.CharField(max_length=50)),
+                ('ticker', models.CharField(max_length=20)),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'unique_together': {('ticker', 'asset_class')},
+            },
+        ),
+    ]
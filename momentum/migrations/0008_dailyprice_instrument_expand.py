@@ -0,0 +1,143 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:20
+
+# Expand step of the instrument normalization: everything here runs while the previous code
+# keeps writing DailyPrice rows with ticker / asset_class / name strings. A trigger gives those
+# rows their instrument, the existing rows are backfilled in short batches and the new indexes
+# are built concurrently. 0009 then drops the strings once the new code is deployed.
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# Rows updated per backfill transaction
+BACKFILL_BATCH_SIZE = 50000
+
+# Ticker model of each DailyPrice asset class (as in momentum.ingestion.ASSET_CLASS_MODELS)
+TICKER_MODELS = {
+    'equity': 'Equity_Tickers',
+    'bond': 'Bond_Tickers',
+    'forex': 'Forex_Tickers',
+    'cryptocurrency': 'Cryptocurrency_Tickers',
+    'commodity': 'Commodity_Tickers',
+}
+
+# Instruments of the stored bars, with their most recently fetched name
+INSTRUMENTS_FROM_PRICES_SQL = """
+INSERT INTO momentum_instrument (asset_class, ticker, name)
+SELECT DISTINCT ON (ticker, asset_class) asset_class, ticker, name
+FROM momentum_dailyprice
+ORDER BY ticker, asset_class, fetch_date DESC
+ON CONFLICT (ticker, asset_class) DO NOTHING;
+"""
+
+ADD_COLUMN_SQL = """
+ALTER TABLE momentum_dailyprice ADD COLUMN instrument_id integer NULL;
+ALTER TABLE momentum_dailyprice ADD CONSTRAINT momentum_dailyprice_instrument_id_fk_momentum_instrument_id
+    FOREIGN KEY (instrument_id) REFERENCES momentum_instrument (id) DEFERRABLE INITIALLY DEFERRED NOT VALID;
+"""
+
+DROP_COLUMN_SQL = "ALTER TABLE momentum_dailyprice DROP COLUMN instrument_id;"
+
+# Rows written by the previous code (no instrument_id) get theirs on the way in
+TRIGGER_SQL = """
+CREATE FUNCTION momentum_dailyprice_set_instrument() RETURNS trigger AS $$
+BEGIN
+    IF NEW.instrument_id IS NULL THEN
+        INSERT INTO momentum_instrument (asset_class, ticker, name)
+        VALUES (NEW.asset_class, NEW.ticker, NEW.name)
+        ON CONFLICT (ticker, asset_class) DO NOTHING;
+        SELECT id INTO NEW.instrument_id FROM momentum_instrument
+        WHERE ticker = NEW.ticker AND asset_class = NEW.asset_class;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER momentum_dailyprice_set_instrument
+    BEFORE INSERT OR UPDATE ON momentum_dailyprice
+    FOR EACH ROW EXECUTE FUNCTION momentum_dailyprice_set_instrument();
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS momentum_dailyprice_set_instrument ON momentum_dailyprice;
+DROP FUNCTION IF EXISTS momentum_dailyprice_set_instrument();
+"""
+
+# The future conflict target, built without blocking writers; 0009 turns it into the constraint
+UNIQUE_INDEX_SQL = ("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS momentum_dailyprice_instrument_date_uniq "
+                    "ON momentum_dailyprice (instrument_id, date);")
+
+# Validation only takes a SHARE UPDATE EXCLUSIVE lock; the validated check lets 0009 set NOT NULL without a scan
+VALIDATE_SQL = """
+ALTER TABLE momentum_dailyprice VALIDATE CONSTRAINT momentum_dailyprice_instrument_id_fk_momentum_instrument_id;
+ALTER TABLE momentum_dailyprice ADD CONSTRAINT momentum_dailyprice_instrument_id_not_null
+    CHECK (instrument_id IS NOT NULL) NOT VALID;
+ALTER TABLE momentum_dailyprice VALIDATE CONSTRAINT momentum_dailyprice_instrument_id_not_null;
+"""
+
+
+def instruments_from_tickers(apps, schema_editor):
+    """Instruments of the five ticker models (their names win over the stored ones)."""
+    Instrument = apps.get_model('momentum', 'Instrument')
+    instruments = {}
+    for asset_class, model_name in TICKER_MODELS.items():
+        model = apps.get_model('momentum', model_name)
+        for ticker, name in model.objects.exclude(ticker__isnull=True).exclude(ticker='').values_list('ticker', 'name'):
+            instruments[(ticker, asset_class)] = Instrument(asset_class=asset_class, ticker=ticker, name=name)
+    Instrument.objects.bulk_create(list(instruments.values()), batch_size=1000, update_conflicts=True,
+                                   unique_fields=['ticker', 'asset_class'], update_fields=['name'])
+
+
+def backfill_instrument_ids(apps, schema_editor):
+    """Set instrument_id on the existing rows, one id range per transaction."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT MIN(id), MAX(id) FROM momentum_dailyprice")
+        first, last = cursor.fetchone()
+        if first is None:
+            return
+        for start in range(first, last + 1, BACKFILL_BATCH_SIZE):
+            cursor.execute(
+                "UPDATE momentum_dailyprice p SET instrument_id = i.id FROM momentum_instrument i "
+                "WHERE p.id >= %s AND p.id < %s AND p.instrument_id IS NULL "
+                "AND i.ticker = p.ticker AND i.asset_class = p.asset_class",
+                [start, start + BACKFILL_BATCH_SIZE],
+            )
+
+
+class Migration(migrations.Migration):
+    # Concurrent index builds and the batched backfill need their own transactions
+    atomic = False
+
+    dependencies = [
+        ('momentum', '0007_instrument'),
+    ]
+
+    operations = [
+        migrations.RunSQL(INSTRUMENTS_FROM_PRICES_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.RunPython(instruments_from_tickers, reverse_code=migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(ADD_COLUMN_SQL, reverse_sql=DROP_COLUMN_SQL),
+                migrations.RunSQL(TRIGGER_SQL, reverse_sql=DROP_TRIGGER_SQL),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='dailyprice',
+                    name='instrument',
+                    field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT,
+                                            related_name='prices', to='momentum.instrument'),
+                ),
+            ],
+        ),
+        migrations.RunPython(backfill_instrument_ids, reverse_code=migrations.RunPython.noop),
+        migrations.RunSQL(UNIQUE_INDEX_SQL,
+                          reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS momentum_dailyprice_instrument_date_uniq;"),
+        AddIndexConcurrently(
+            model_name='dailyprice',
+            index=models.Index(fields=['instrument', '-date'], name='dailyprice_instr_date_desc'),
+        ),
+        migrations.RunSQL(
+            VALIDATE_SQL,
+            reverse_sql="ALTER TABLE momentum_dailyprice DROP CONSTRAINT IF EXISTS momentum_dailyprice_instrument_id_not_null;",
+        ),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:20
+
+# Contract step of the instrument normalization, for the code that writes instrument_id itself:
+# the ticker / asset_class / name strings leave the bars, the table is renamed and a view under
+# the old name keeps the previous columns for existing SQL (reads only).
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CONTRACT_SQL = """
+ALTER TABLE momentum_dailyprice ALTER COLUMN instrument_id SET NOT NULL;
+ALTER TABLE momentum_dailyprice DROP CONSTRAINT momentum_dailyprice_instrument_id_not_null;
+ALTER TABLE momentum_dailyprice ADD CONSTRAINT momentum_dailyprice_instrument_id_date_uniq
+    UNIQUE USING INDEX momentum_dailyprice_instrument_date_uniq;
+DROP TRIGGER momentum_dailyprice_set_instrument ON momentum_dailyprice;
+DROP FUNCTION momentum_dailyprice_set_instrument();
+ALTER TABLE momentum_dailyprice DROP COLUMN ticker, DROP COLUMN asset_class, DROP COLUMN name;
+ALTER TABLE momentum_dailyprice RENAME TO momentum_dailyprice_bar;
+"""
+
+# Same columns as the table had before, so existing queries on momentum_dailyprice keep working
+VIEW_SQL = """
+CREATE VIEW momentum_dailyprice AS
+SELECT p.id, p.date, i.asset_class, i.ticker, i.name, p.open, p.high, p.low, p.adj_close, p.volume,
+       p.fetch_date, p.is_live, p.time_utc, p.instrument_id
+FROM momentum_dailyprice_bar p
+JOIN momentum_instrument i ON i.id = p.instrument_id;
+"""
+
+# Back to the string columns (filled from the instruments) and the previous unique key
+REVERSE_CONTRACT_SQL = """
+ALTER TABLE momentum_dailyprice_bar RENAME TO momentum_dailyprice;
+ALTER TABLE momentum_dailyprice ADD COLUMN asset_class varchar(50), ADD COLUMN ticker varchar(20),
+    ADD COLUMN name varchar(100);
+UPDATE momentum_dailyprice p SET asset_class = i.asset_class, ticker = i.ticker, name = i.name
+FROM momentum_instrument i WHERE i.id = p.instrument_id;
+ALTER TABLE momentum_dailyprice ALTER COLUMN asset_class SET NOT NULL, ALTER COLUMN ticker SET NOT NULL,
+    ALTER COLUMN name SET NOT NULL;
+ALTER TABLE momentum_dailyprice ADD CONSTRAINT momentum_dailyprice_ticker_asset_class_date_778524af_uniq
+    UNIQUE (ticker, asset_class, date);
+CREATE INDEX dailyprice_ticker_date_desc ON momentum_dailyprice (ticker, date DESC);
+ALTER TABLE momentum_dailyprice DROP CONSTRAINT momentum_dailyprice_instrument_id_date_uniq;
+CREATE UNIQUE INDEX momentum_dailyprice_instrument_date_uniq ON momentum_dailyprice (instrument_id, date);
+ALTER TABLE momentum_dailyprice ALTER COLUMN instrument_id DROP NOT NULL;
+ALTER TABLE momentum_dailyprice ADD CONSTRAINT momentum_dailyprice_instrument_id_not_null
+    CHECK (instrument_id IS NOT NULL);
+"""
+
+# Same trigger as in 0008, for rows written by the previous code after a rollback
+TRIGGER_SQL = """
+CREATE FUNCTION momentum_dailyprice_set_instrument() RETURNS trigger AS $$
+BEGIN
+    IF NEW.instrument_id IS NULL THEN
+        INSERT INTO momentum_instrument (asset_class, ticker, name)
+        VALUES (NEW.asset_class, NEW.ticker, NEW.name)
+        ON CONFLICT (ticker, asset_class) DO NOTHING;
+        SELECT id INTO NEW.instrument_id FROM momentum_instrument
+        WHERE ticker = NEW.ticker AND asset_class = NEW.asset_class;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER momentum_dailyprice_set_instrument
+    BEFORE INSERT OR UPDATE ON momentum_dailyprice
+    FOR EACH ROW EXECUTE FUNCTION momentum_dailyprice_set_instrument();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('momentum', '0008_dailyprice_instrument_expand'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(CONTRACT_SQL, reverse_sql=REVERSE_CONTRACT_SQL + TRIGGER_SQL),
+                migrations.RunSQL(VIEW_SQL, reverse_sql="DROP VIEW IF EXISTS momentum_dailyprice;"),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='dailyprice',
+                    name='instrument',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                                            related_name='prices', to='momentum.instrument'),
+                ),
+                migrations.AlterUniqueTogether(
+                    name='dailyprice',
+                    unique_together={('instrument', 'date')},
+                ),
+                migrations.RemoveIndex(
+                    model_name='dailyprice',
+                    name='dailyprice_ticker_date_desc',
+                ),
+                migrations.RemoveField(
+                    model_name='dailyprice',
+                    name='asset_class',
+                ),
+                migrations.RemoveField(
+                    model_name='dailyprice',
+                    name='name',
+                ),
+                migrations.RemoveField(
+                    model_name='dailyprice',
+                    name='ticker',
+                ),
+                migrations.AlterModelTable(
+                    name='dailyprice',
+                    table='momentum_dailyprice_bar',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,135 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:05
+
+# DailyPrice becomes a table partitioned by year on `date`: recent-data queries prune to the
+# last partition or two, and old years can be vacuumed, reindexed or moved on their own.
+#
+# PostgreSQL requires the partition key in every unique constraint, so the primary key becomes
+# (id, date); ids still come from one sequence and stay unique, and Django keeps `id` as the pk.
+# Identity columns are not supported on partitioned tables before PostgreSQL 17, hence the
+# plain sequence default. The bars are copied into the new table and the old one is dropped in
+# the same transaction.
+#
+# LOCKING AND DOWNTIME: this is not an online migration. The old table is locked in EXCLUSIVE
+# mode for the whole copy: reads go on, but every write (ingestion runs, the stream, the
+# daemon) waits until the migration commits. The time it takes grows with the table size.
+# It covers the copy, the unique key, the foreign key and the three indexes, about as long
+# as a VACUUM FULL of the table. The DROP at the end takes ACCESS EXCLUSIVE, so it also
+# waits for running reads and blocks new ones for a moment. The disk temporarily holds the
+# table twice. Stop the ingestion daemon, the stream and the scheduled updates, and run the
+# migration in a maintenance window.
+#
+# There is no DEFAULT partition, so a bar outside the created years is rejected rather than
+# filed in a catch-all that later partitions would have to be carved out of. Partitions are
+# created here through YEARS_AHEAD years after the current one. Every run of the price
+# ingestion commands then creates them ahead (momentum.partitions.ensure_partitions).
+
+from django.db import migrations
+
+# First partitioned year and years created ahead (same as momentum.partitions)
+FIRST_PARTITION_YEAR = 2000
+YEARS_AHEAD = 2
+
+COLUMNS = "id, date, open, high, low, adj_close, volume, fetch_date, is_live, time_utc, instrument_id"
+
+VIEW_SQL = """
+CREATE VIEW momentum_dailyprice AS
+SELECT p.id, p.date, i.asset_class, i.ticker, i.name, p.open, p.high, p.low, p.adj_close, p.volume,
+       p.fetch_date, p.is_live, p.time_utc, p.instrument_id
+FROM momentum_dailyprice_bar p
+JOIN momentum_instrument i ON i.id = p.instrument_id;
+"""
+
+# Constraints and indexes under the names of 0009, created once the bars are in
+KEYS_SQL = """
+ALTER TABLE momentum_dailyprice_bar ADD CONSTRAINT momentum_dailyprice_instrument_id_date_uniq
+    UNIQUE (instrument_id, date);
+ALTER TABLE momentum_dailyprice_bar ADD CONSTRAINT momentum_dailyprice_instrument_id_fk_momentum_instrument_id
+    FOREIGN KEY (instrument_id) REFERENCES momentum_instrument (id) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX dailyprice_instr_date_desc ON momentum_dailyprice_bar (instrument_id, date DESC);
+CREATE INDEX momentum_dailyprice_date_17ad4186 ON momentum_dailyprice_bar (date);
+CREATE INDEX dailyprice_date_brin ON momentum_dailyprice_bar USING brin (date);
+"""
+
+PARTITION_SQL = f"""
+LOCK TABLE momentum_dailyprice_bar IN EXCLUSIVE MODE;
+
+CREATE SEQUENCE momentum_dailyprice_bar_id_seq AS bigint;
+SELECT setval('momentum_dailyprice_bar_id_seq', COALESCE(MAX(id), 0) + 1, false) FROM momentum_dailyprice_bar;
+
+CREATE TABLE momentum_dailyprice_partitioned (
+    id bigint NOT NULL DEFAULT nextval('momentum_dailyprice_bar_id_seq'),
+    date date NOT NULL,
+    open numeric(12, 4),
+    high numeric(12, 4),
+    low numeric(12, 4),
+    adj_close numeric(12, 4),
+    volume bigint,
+    fetch_date timestamp with time zone NOT NULL,
+    is_live boolean NOT NULL,
+    time_utc time,
+    instrument_id integer NOT NULL,
+    PRIMARY KEY (id, date)
+) PARTITION BY RANGE (date);
+
+-- Everything before {FIRST_PARTITION_YEAR} in one partition, then one per year up to {YEARS_AHEAD} years ahead
+CREATE TABLE momentum_dailyprice_bar_history PARTITION OF momentum_dailyprice_partitioned
+    FOR VALUES FROM (MINVALUE) TO ('{FIRST_PARTITION_YEAR}-01-01');
+DO $$
+DECLARE
+    last_year integer := GREATEST(
+        extract(year FROM current_date)::integer + {YEARS_AHEAD},
+        (SELECT extract(year FROM MAX(date))::integer FROM momentum_dailyprice_bar)
+    );
+BEGIN
+    FOR year IN {FIRST_PARTITION_YEAR}..last_year LOOP
+        EXECUTE format(
+            'CREATE TABLE momentum_dailyprice_bar_y%s PARTITION OF momentum_dailyprice_partitioned '
+            'FOR VALUES FROM (%L) TO (%L)',
+            year, make_date(year, 1, 1), make_date(year + 1, 1, 1)
+        );
+    END LOOP;
+END
+$$;
+
+INSERT INTO momentum_dailyprice_partitioned ({COLUMNS})
+SELECT {COLUMNS} FROM momentum_dailyprice_bar ORDER BY date, instrument_id;
+
+DROP VIEW momentum_dailyprice;
+DROP TABLE momentum_dailyprice_bar;
+ALTER TABLE momentum_dailyprice_partitioned RENAME TO momentum_dailyprice_bar;
+ALTER SEQUENCE momentum_dailyprice_bar_id_seq OWNED BY momentum_dailyprice_bar.id;
+{KEYS_SQL}
+{VIEW_SQL}
+ANALYZE momentum_dailyprice_bar;
+"""
+
+# Back to a single table with the previous keys
+REVERSE_PARTITION_SQL = f"""
+LOCK TABLE momentum_dailyprice_bar IN EXCLUSIVE MODE;
+
+CREATE TABLE momentum_dailyprice_single (LIKE momentum_dailyprice_bar INCLUDING DEFAULTS);
+INSERT INTO momentum_dailyprice_single ({COLUMNS})
+SELECT {COLUMNS} FROM momentum_dailyprice_bar ORDER BY date, instrument_id;
+
+ALTER SEQUENCE momentum_dailyprice_bar_id_seq OWNED BY NONE;
+DROP VIEW momentum_dailyprice;
+DROP TABLE momentum_dailyprice_bar;
+ALTER TABLE momentum_dailyprice_single RENAME TO momentum_dailyprice_bar;
+ALTER SEQUENCE momentum_dailyprice_bar_id_seq OWNED BY momentum_dailyprice_bar.id;
+ALTER TABLE momentum_dailyprice_bar ADD CONSTRAINT momentum_dailyprice_pkey PRIMARY KEY (id);
+{KEYS_SQL}
+{VIEW_SQL}
+ANALYZE momentum_dailyprice_bar;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('momentum', '0009_dailyprice_instrument_contract'),
+    ]
+
+    # The model does not change: Django keeps `id` as the primary key and the same indexes
+    operations = [
+        migrations.RunSQL(PARTITION_SQL, reverse_sql=REVERSE_PARTITION_SQL),
+    ]
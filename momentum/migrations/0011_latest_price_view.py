@@ -0,0 +1,71 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:41
+
+# Latest bar of every instrument and its bars at the lookback anchors, as a materialized view:
+# one indexed read replaces the per-ticker ORDER BY date DESC LIMIT 1 queries of the performance
+# commands. Every lateral lookup below uses the (instrument_id, date DESC) index.
+# The unique index on instrument_id is what REFRESH ... CONCURRENTLY requires.
+# Migrations that rewrite momentum_dailyprice_bar must drop and recreate this view.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Same anchors as momentum.latest_prices.LOOKBACK_DAYS
+LOOKBACK_DAYS = {'d': 1, 'w': 7, 'm': 30, 'y': 365, 'decade': 3650}
+
+ANCHOR_COLUMNS = ',\n       '.join(f"{period}.date AS {period}_date, {period}.adj_close AS {period}_adj_close"
+                                   for period in LOOKBACK_DAYS)
+
+# The last bar on or before the latest date minus the lookback (with or without an adj_close, as before)
+ANCHOR_JOINS = '\n'.join(
+    f"LEFT JOIN LATERAL (SELECT b.date, b.adj_close FROM momentum_dailyprice_bar b "
+    f"WHERE b.instrument_id = i.id AND b.date <= latest.date - {days} "
+    f"ORDER BY b.date DESC LIMIT 1) {period} ON true"
+    for period, days in LOOKBACK_DAYS.items()
+)
+
+VIEW_SQL = f"""
+CREATE MATERIALIZED VIEW momentum_latest_price AS
+SELECT i.id AS instrument_id, latest.date, latest.adj_close, latest.fetch_date,
+       {ANCHOR_COLUMNS}
+FROM momentum_instrument i
+CROSS JOIN LATERAL (SELECT b.date, b.adj_close, b.fetch_date FROM momentum_dailyprice_bar b
+                    WHERE b.instrument_id = i.id ORDER BY b.date DESC LIMIT 1) latest
+{ANCHOR_JOINS}
+WITH DATA;
+
+CREATE UNIQUE INDEX momentum_latest_price_instrument_id_uniq ON momentum_latest_price (instrument_id);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('momentum', '0010_dailyprice_year_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestPrice',
+            fields=[
+                ('instrument', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='latest_price', serialize=False, to='momentum.instrument')),
+                ('date', models.DateField()),
+                ('adj_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('fetch_date', models.DateTimeField()),
+                ('d_date', models.DateField(blank=True, null=True)),
+                ('d_adj_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('w_date', models.DateField(blank=True, null=True)),
+                ('w_adj_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('m_date', models.DateField(blank=True, null=True)),
+                ('m_adj_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('y_date', models.DateField(blank=True, null=True)),
+                ('y_adj_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('decade_date', models.DateField(blank=True, null=True)),
+                ('decade_adj_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+            ],
+            options={
+                'db_table': 'momentum_latest_price',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(VIEW_SQL, reverse_sql="DROP MATERIALIZED VIEW IF EXISTS momentum_latest_price;"),
+    ]
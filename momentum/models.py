@@ -3,6 +3,7 @@
 #################################
 # LIBRARIES
 
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models
 from django.utils import timezone
 
@@ -92,20 +93,37 @@ class Exchange(models.Model):
     market_open_local = models.TimeField()
     market_close_local = models.TimeField()
 
+    class Meta:
+        unique_together = ('country', 'exchange_short_name')
+
 # Holiday
 class Exchange_Holiday(models.Model):
     date = models.DateField()
     country = models.CharField(max_length=100)
+    exchange_name = models.CharField(max_length=100, blank=True, default='')  # Exchanges of a country can close on different days
     holiday_name = models.CharField(max_length=100)
 
+    class Meta:
+        unique_together = ('country', 'exchange_name', 'date')
+
 #################################
 # DAILYPRICE DATA
 
-class DailyPrice(models.Model):
-    date = models.DateField(db_index=True)
+# One row per priced (ticker, asset_class), filled from the five ticker models and by the price writers
+class Instrument(models.Model):
+    id = models.AutoField(primary_key=True)  # 4-byte key repeated on every DailyPrice row
     asset_class = models.CharField(max_length=50)
     ticker = models.CharField(max_length=20)
     name = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ('ticker', 'asset_class')
+
+# Bars refer to their instrument by key; the `momentum_dailyprice` view still shows ticker, asset_class and name.
+# The table is partitioned by year on `date` (primary key (id, date) in the database, see momentum/partitions.py)
+class DailyPrice(models.Model):
+    instrument = models.ForeignKey(Instrument, on_delete=models.PROTECT, related_name='prices', db_index=False)
+    date = models.DateField(db_index=True)  # Date range scans (bars are written instrument by instrument)
     open = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
     high = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
     low = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
@@ -115,6 +133,72 @@ class DailyPrice(models.Model):
     is_live = models.BooleanField(default=False)
     time_utc = models.TimeField(null=True, blank=True)
 
+    class Meta:
+        db_table = 'momentum_dailyprice_bar'
+        unique_together = ('instrument', 'date')  # Conflict target of the bulk upsert
+        indexes = [
+            # Latest bar / lookback of an instrument: WHERE instrument_id = %s [AND date <= %s] ORDER BY date DESC LIMIT 1
+            models.Index(fields=['instrument', '-date'], name='dailyprice_instr_date_desc'),
+            # Next to the btree on date: a few pages for the partitions whose bars are still in date order
+            BrinIndex(fields=['date'], name='dailyprice_date_brin'),
+        ]
+
+# Latest bar of every instrument and its bars at the lookback anchors (latest date minus 1, 7, 30, 365 and 3650 days).
+# Materialized view over DailyPrice, refreshed concurrently at the end of each ingestion run (momentum/latest_prices.py)
+class LatestPrice(models.Model):
+    instrument = models.OneToOneField(Instrument, on_delete=models.DO_NOTHING, primary_key=True, related_name='latest_price')
+    date = models.DateField()
+    adj_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    fetch_date = models.DateTimeField()
+    d_date = models.DateField(null=True, blank=True)
+    d_adj_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    w_date = models.DateField(null=True, blank=True)
+    w_adj_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    m_date = models.DateField(null=True, blank=True)
+    m_adj_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    y_date = models.DateField(null=True, blank=True)
+    y_adj_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    decade_date = models.DateField(null=True, blank=True)
+    decade_adj_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+
+    class Meta:
+        managed = False
+        db_table = 'momentum_latest_price'
+
+#################################
+# INGESTION MONITORING
+
+# One execution of a price ingestion command
+class IngestionRun(models.Model):
+    command = models.CharField(max_length=100)
+    provider = models.CharField(max_length=50)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    wall_seconds = models.FloatField(null=True, blank=True)
+    tickers_total = models.PositiveIntegerField(default=0)
+    tickers_failed = models.PositiveIntegerField(default=0)
+    rows_fetched = models.BigIntegerField(default=0)
+    rows_changed = models.BigIntegerField(default=0)
+    # Change detection: bars written as new, rewritten because they moved, or skipped as identical
+    rows_inserted = models.BigIntegerField(default=0)
+    rows_updated = models.BigIntegerField(default=0)
+    rows_unchanged = models.BigIntegerField(default=0)
+
+# What one ticker cost during a run
+class IngestionTickerRun(models.Model):
+    run = models.ForeignKey(IngestionRun, on_delete=models.CASCADE, related_name='tickers')
+    ticker = models.CharField(max_length=20)
+    asset_class = models.CharField(max_length=50)
+    provider_latency = models.FloatField(null=True, blank=True)  # Seconds waiting on the provider
+    rows_fetched = models.PositiveIntegerField(default=0)
+    rows_changed = models.PositiveIntegerField(null=True, blank=True)
+    db_write_seconds = models.FloatField(null=True, blank=True)
+    retries = models.PositiveIntegerField(default=0)
+    error_class = models.CharField(max_length=100, null=True, blank=True)  # None when the ticker succeeded
+
+    class Meta:
+        indexes = [models.Index(fields=['ticker', 'asset_class'])]
+
 #################################
 # OUTPUTS
 
@@ -175,7 +259,7 @@ class AllRegionsStockPerformance(models.Model):
 class CountryData(models.Model):
     country_name = models.CharField(max_length=100)
     country_second_name = models.CharField(max_length=100, null=True, blank=True)
-    country_code = models.CharField(max_length=3)
+    country_code = models.CharField(max_length=3, unique=True)
     region = models.CharField(max_length=100)
     currency = models.CharField(max_length=3)
     capital_city = models.CharField(max_length=100)
@@ -0,0 +1,428 @@
+"""
+Columnar snapshot of DailyPrice for analytics: one float64 dates x instruments panel per
+price field, stored as .npy files that are opened memory-mapped (no parsing, no copy).
+
+    panel = open_price_panel()
+    closes = panel.field('adj_close')            # (days, instruments) view of the file
+    spy = panel.column('SPY', 'equity')          # one instrument's history, contiguous
+    frame = panel.frame('adj_close')             # DataFrame over the same memory
+
+Rows are calendar days from `origin` (missing bars are NaN), so a date maps to its row
+without a lookup; columns are instruments in order of appearance. Arrays are stored in
+Fortran order, which keeps every instrument's history contiguous on disk.
+
+Files are allocated with spare rows (through the end of next year) and spare columns, so
+refresh_price_panel() writes the bars fetched since the previous refresh in place. A full
+build, also used when the panel outgrows its capacity, writes a new build directory and
+then switches the CURRENT pointer to it: open panels keep reading the previous files, and
+a previous build is only deleted once no panel has it mapped (Windows refuses to delete
+mapped files; it is retried by the next build).
+
+A refresh reads the bars whose fetch_date is at or after the watermark of the previous
+one. The watermark is when the oldest ingestion run still in progress started (or the time
+of the refresh when none is): a run stamps its bars with a fetch_date from after its start
+but commits them later, so they are never older than a watermark taken while it runs.
+
+Bars deleted from DailyPrice are only dropped by a full build, or by reloading the
+instruments concerned (the restatement repair of frequent_update_dailyprice_db does).
+"""
+
+import json
+import math
+import os
+import shutil
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+
+from momentum.models import DailyPrice, IngestionRun, Instrument
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+PANEL_FIELDS = ['open', 'high', 'low', 'adj_close', 'volume']
+
+# Unfinished runs older than this crashed or are long-lived (the stream): they do not hold the watermark back
+RUN_WATERMARK_MAX_AGE = timedelta(hours=6)
+
+# Seconds a refresh waits for another writer before giving up, and between attempts at the lock
+LOCK_TIMEOUT = 600
+LOCK_POLL_INTERVAL = 0.5
+
+# Spare instrument columns of a new build (fraction of the current count, rounded up to a multiple of 64)
+INSTRUMENT_HEADROOM = 0.25
+
+FETCH_SIZE = 100000
+
+# Attempts at replacing a file that a reader has open for a moment (Windows only refuses that)
+REPLACE_ATTEMPTS = 10
+
+
+def default_panel_dir():
+    return getattr(settings, 'PRICE_PANEL_DIR', os.path.join(settings.BASE_DIR, 'price_panel'))
+
+
+class PricePanel:
+    """A panel build opened read-only: the arrays are memory-mapped views of its files."""
+
+    def __init__(self, build_dir, meta):
+        self.build_dir = build_dir
+        self.meta = meta
+        self.origin = np.datetime64(meta['origin'], 'D')
+        self.n_dates = meta['n_dates']
+        self.instrument_ids = np.array([row[0] for row in meta['instruments']], dtype=np.int64)
+        self.tickers = [row[1] for row in meta['instruments']]
+        self.asset_classes = [row[2] for row in meta['instruments']]
+        self.columns = {(ticker, asset_class): i for i, (_, ticker, asset_class) in enumerate(meta['instruments'])}
+        self._arrays = {}
+        # Every field is mapped up front (mapping reads nothing), so the build stays readable once replaced
+        for name in PANEL_FIELDS:
+            self.field(name)
+
+    @property
+    def dates(self):
+        return self.origin + np.arange(self.n_dates)
+
+    def field(self, name):
+        """(dates, instruments) float64 view of one field; NaN where there is no bar."""
+        if name not in self._arrays:
+            if name not in PANEL_FIELDS:
+                raise KeyError(f"Unknown panel field {name!r} (expected one of {', '.join(PANEL_FIELDS)})")
+            array = np.load(os.path.join(self.build_dir, f'{name}.npy'), mmap_mode='r')
+            self._arrays[name] = array[:self.n_dates, :len(self.tickers)]
+        return self._arrays[name]
+
+    def row(self, day):
+        """Row of a date (may be out of range: check against n_dates)."""
+        return int((np.datetime64(day, 'D') - self.origin).astype(int))
+
+    def column_index(self, ticker, asset_class=None):
+        if asset_class is not None:
+            return self.columns[(ticker, asset_class)]
+        matches = [i for (t, _), i in self.columns.items() if t == ticker]
+        if len(matches) != 1:
+            raise KeyError(f"{ticker!r} is {'ambiguous' if matches else 'not in the panel'}; pass its asset class")
+        return matches[0]
+
+    def column(self, ticker, asset_class=None, field='adj_close'):
+        """History of one instrument, oldest first (a contiguous slice of the file)."""
+        return self.field(field)[:, self.column_index(ticker, asset_class)]
+
+    def frame(self, field='adj_close'):
+        """DataFrame of one field over the mapped memory (dates x tickers)."""
+        return pd.DataFrame(self.field(field), index=pd.DatetimeIndex(self.dates, name='date'),
+                            columns=pd.Index(self.tickers, name='ticker'), copy=False)
+
+
+def _read_current(directory):
+    try:
+        with open(os.path.join(directory, 'CURRENT')) as f:
+            build = f.read().strip()
+        with open(os.path.join(directory, build, 'meta.json')) as f:
+            return os.path.join(directory, build), json.load(f)
+    except FileNotFoundError:
+        return None, None
+
+
+def open_price_panel(directory=None):
+    """Open the current panel build; raises FileNotFoundError before the first build."""
+    directory = directory or default_panel_dir()
+    for attempt in range(2):
+        build_dir, meta = _read_current(directory)
+        if meta is None:
+            raise FileNotFoundError(f"No price panel in {directory}: run refresh_price_panel --full")
+        try:
+            return PricePanel(build_dir, meta)
+        except FileNotFoundError:
+            # The build was replaced and deleted between reading CURRENT and mapping it
+            if attempt:
+                raise
+
+
+def _replace(source, target):
+    """os.replace, retried while a reader has the target open (Windows does not replace open files)."""
+    for attempt in range(REPLACE_ATTEMPTS):
+        try:
+            os.replace(source, target)
+            return
+        except PermissionError:
+            if attempt == REPLACE_ATTEMPTS - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+
+def _write_json(path, payload):
+    """Replace a file atomically, so readers never see half of it."""
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(payload, f)
+    _replace(f'{path}.tmp', path)
+
+
+def _write_pointer(directory, build):
+    """Point CURRENT at a build directory (atomically, like the meta file)."""
+    path = os.path.join(directory, 'CURRENT')
+    with open(f'{path}.tmp', 'w') as f:
+        f.write(build)
+    _replace(f'{path}.tmp', path)
+
+
+def _remove_old_builds(directory, current):
+    """
+    Delete the builds other than `current`. A build is first renamed out of the way: Windows
+    refuses that while a panel has one of its files mapped, and the build is then kept until
+    a later build. On POSIX open maps keep the deleted files alive.
+    """
+    for name in os.listdir(directory):
+        if name.startswith('build-') and name != current:
+            try:
+                os.rename(os.path.join(directory, name), os.path.join(directory, 'deleted-' + name[len('build-'):]))
+            except OSError:
+                pass
+    for name in os.listdir(directory):
+        if name.startswith('deleted-'):
+            # Leftovers a reader still maps are retried next time
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+class _WriterLock:
+    """
+    Exclusive lock on the panel directory's .lock file (fcntl on POSIX, msvcrt on Windows).
+    Waits up to `timeout` seconds for another writer, then raises TimeoutError.
+    """
+
+    def __init__(self, directory, timeout=None):
+        self.path = os.path.join(directory, '.lock')
+        self.timeout = LOCK_TIMEOUT if timeout is None else timeout
+        self.file = None
+
+    def _try_lock(self):
+        try:
+            if os.name == 'nt':
+                # Locks the first byte
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def __enter__(self):
+        self.file = open(self.path, 'a+')
+        deadline = time.monotonic() + self.timeout
+        while not self._try_lock():
+            if time.monotonic() >= deadline:
+                self.file.close()
+                raise TimeoutError(f"Another refresh held {self.path} for more than {self.timeout}s")
+            time.sleep(LOCK_POLL_INTERVAL)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if os.name == 'nt':
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            # Closing the file releases the fcntl lock
+            self.file.close()
+        return False
+
+
+def _read_bars(where='', params=(), instrument_ids=None):
+    """Yield (instrument ids, dates, {field: float64 values}) chunks, cast to float in SQL."""
+    table = DailyPrice._meta.db_table
+    conditions = [where] if where else []
+    if instrument_ids is not None:
+        conditions.append('instrument_id = ANY(%s)')
+        params = [*params, list(instrument_ids)]
+    sql = (f"SELECT instrument_id, date, {', '.join(f'{field}::float8' for field in PANEL_FIELDS)} FROM {table}"
+           + (f" WHERE {' AND '.join(conditions)}" if conditions else ""))
+    # Server-side cursor: the bars arrive in chunks instead of all at once
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            ids, days, *values = zip(*rows)
+            # None (NULL) becomes NaN with a float dtype
+            yield (np.array(ids, dtype=np.int64), np.array(days, dtype='datetime64[D]'),
+                   {field: np.array(column, dtype=np.float64) for field, column in zip(PANEL_FIELDS, values)})
+
+
+def _watermark():
+    """Start of the oldest ingestion run in progress, or now: no bar committed later has an older fetch_date."""
+    now = timezone.now()
+    started = (IngestionRun.objects.filter(finished_at__isnull=True, started_at__gte=now - RUN_WATERMARK_MAX_AGE)
+               .aggregate(Min('started_at'))['started_at__min'])
+    return min(started, now) if started else now
+
+
+def _build_panel(directory):
+    """Write a new build of the whole panel and make it current (under the writer lock); returns its stats."""
+    started = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+
+    # Taken before reading: bars committed meanwhile are read again by the next refresh
+    watermark = _watermark()
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(date), MAX(date) FROM {DailyPrice._meta.db_table}")
+        first_date, last_date = cursor.fetchone()
+    first_date = first_date or timezone.now().date()
+    last_date = last_date or first_date
+
+    # Every instrument gets a column, so the first bars of a new listing need no rebuild
+    instruments = list(Instrument.objects.order_by('id').values_list('id', 'ticker', 'asset_class'))
+    date_capacity = (date(last_date.year + 2, 1, 1) - first_date).days
+    instrument_capacity = max(64, math.ceil(len(instruments) * (1 + INSTRUMENT_HEADROOM) / 64) * 64)
+
+    build = f"build-{timezone.now():%Y%m%d%H%M%S%f}"
+    build_dir = os.path.join(directory, build)
+    os.makedirs(build_dir)
+    arrays = {}
+    for field in PANEL_FIELDS:
+        arrays[field] = np.lib.format.open_memmap(os.path.join(build_dir, f'{field}.npy'), mode='w+', dtype=np.float64,
+                                                  shape=(date_capacity, instrument_capacity), fortran_order=True)
+        arrays[field][:] = np.nan
+
+    meta = {
+        'origin': first_date.isoformat(),
+        'n_dates': (last_date - first_date).days + 1,
+        'date_capacity': date_capacity,
+        'instrument_capacity': instrument_capacity,
+        'instruments': [list(row) for row in instruments],
+        'watermark': watermark.isoformat(),
+        'built_at': timezone.now().isoformat(),
+    }
+    columns = {pk: i for i, (pk, _, _) in enumerate(instruments)}
+    bars = _write_chunks(arrays, meta, columns, _read_bars())
+
+    for array in arrays.values():
+        array.flush()
+    meta['refreshed_at'] = meta['built_at']
+    _write_json(os.path.join(build_dir, 'meta.json'), meta)
+
+    # Switch readers to the new build, then drop the old ones that no panel has mapped
+    _write_pointer(directory, build)
+    _remove_old_builds(directory, build)
+
+    return {'mode': 'full', 'bars': bars, 'instruments': len(instruments), 'dates': meta['n_dates'],
+            'seconds': time.perf_counter() - started, 'build_dir': build_dir}
+
+
+def _write_chunks(arrays, meta, columns, chunks):
+    """Scatter bar chunks into the arrays; returns the number of bars written."""
+    origin = np.datetime64(meta['origin'], 'D')
+    written = 0
+    for ids, days, values in chunks:
+        rows = (days - origin).astype(np.int64)
+        cols = np.fromiter((columns[pk] for pk in ids), dtype=np.int64, count=len(ids))
+        for field in PANEL_FIELDS:
+            arrays[field][rows, cols] = values[field]
+        written += len(ids)
+    return written
+
+
+class PanelRebuildRequired(Exception):
+    """The new bars do not fit the current build (dates or instruments beyond its capacity)."""
+
+
+def refresh_price_panel(reload=(), directory=None, full=False):
+    """
+    Bring the panel up to date with the bars fetched since the previous refresh, writing in
+    place; `reload` is a collection of (ticker, asset_class) whose columns are rebuilt from
+    scratch (e.g. after their history was replaced). Falls back to a full build when there
+    is no panel yet or the new bars do not fit. Returns the stats of what was done.
+    """
+    directory = directory or default_panel_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    # One writer at a time (the daemon and a manual run may overlap); readers never wait
+    with _WriterLock(directory):
+        build_dir, meta = _read_current(directory)
+        if full or meta is None:
+            return _build_panel(directory)
+        try:
+            return _refresh_in_place(build_dir, meta, reload)
+        except PanelRebuildRequired as e:
+            stats = _build_panel(directory)
+            stats['reason'] = str(e)
+            return stats
+
+
+def _refresh_in_place(build_dir, meta, reload):
+    started = time.perf_counter()
+    watermark = _watermark()
+    since = pd.Timestamp(meta['watermark']) if meta['watermark'] else None
+
+    arrays = {field: np.load(os.path.join(build_dir, f'{field}.npy'), mmap_mode='r+') for field in PANEL_FIELDS}
+    origin = date.fromisoformat(meta['origin'])
+    columns = {pk: i for i, (pk, _, _) in enumerate(meta['instruments'])}
+
+    # Instruments to reload: clear their columns, then read their whole history
+    reload_ids = set()
+    if reload:
+        keys = set(reload)
+        reload_ids = {pk for pk, ticker, asset_class in Instrument.objects.values_list('id', 'ticker', 'asset_class')
+                      if (ticker, asset_class) in keys}
+
+    chunks = []
+    if since is not None:
+        chunks.extend(_read_bars('fetch_date >= %s', [since.to_pydatetime()]))
+    if reload_ids:
+        chunks.extend(_read_bars(instrument_ids=reload_ids))
+
+    # Check the new bars against the capacity before touching the files
+    new_ids = sorted({int(pk) for ids, _, _ in chunks for pk in ids} - set(columns))
+    last_day = max((days.max() for _, days, _ in chunks), default=None)
+    first_day = min((days.min() for _, days, _ in chunks), default=None)
+    if first_day is not None and first_day < np.datetime64(origin, 'D'):
+        raise PanelRebuildRequired(f"bars before the origin {origin}")
+    if last_day is not None and (last_day - np.datetime64(origin, 'D')).astype(int) >= meta['date_capacity']:
+        raise PanelRebuildRequired(f"bars beyond the date capacity ({last_day})")
+    if len(columns) + len(new_ids) > meta['instrument_capacity']:
+        raise PanelRebuildRequired(f"{len(new_ids)} new instruments beyond the instrument capacity")
+
+    if new_ids:
+        added = Instrument.objects.filter(id__in=new_ids).order_by('id').values_list('id', 'ticker', 'asset_class')
+        for row in added:
+            columns[row[0]] = len(meta['instruments'])
+            meta['instruments'].append(list(row))
+
+    for pk in reload_ids & set(columns):
+        for field in PANEL_FIELDS:
+            arrays[field][:, columns[pk]] = np.nan
+
+    bars = _write_chunks(arrays, meta, columns, chunks)
+    for array in arrays.values():
+        array.flush()
+
+    if last_day is not None:
+        meta['n_dates'] = max(meta['n_dates'], int((last_day - np.datetime64(origin, 'D')).astype(int)) + 1)
+    meta['watermark'] = watermark.isoformat()
+    meta['refreshed_at'] = timezone.now().isoformat()
+    # The arrays are written first, so a reader of the new meta never sees missing bars
+    _write_json(os.path.join(build_dir, 'meta.json'), meta)
+
+    return {'mode': 'incremental', 'bars': bars, 'instruments': len(columns), 'new_instruments': len(new_ids),
+            'reloaded': len(reload_ids), 'dates': meta['n_dates'], 'seconds': time.perf_counter() - started,
+            'build_dir': build_dir}
+
+
+def format_panel_stats(stats):
+    """One line for the ingestion commands' output."""
+    line = (f"Price panel ({stats['mode']}): {stats['bars']} bars written, {stats['instruments']} instruments x "
+            f"{stats['dates']} days in {stats['seconds']:.2f}s")
+    if stats.get('reloaded'):
+        line += f", {stats['reloaded']} instruments reloaded"
+    if stats.get('reason'):
+        line += f" (rebuilt: {stats['reason']})"
+    return line
@@ -0,0 +1,91 @@
+"""
+Yearly partitions of the DailyPrice bar table (PARTITION BY RANGE (date), see migration 0010).
+
+Bars before FIRST_PARTITION_YEAR share one history partition, then every calendar year has
+its own. There is no default partition: a bar dated in a year without a partition is
+rejected, so partitions are created ahead of time (create_dailyprice_partitions, and every
+run of the price ingestion commands).
+"""
+
+import re
+
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from momentum.models import DailyPrice
+
+FIRST_PARTITION_YEAR = 2000
+
+# Years created beyond the current one
+YEARS_AHEAD = 2
+
+# momentum_dailyprice_bar_y2024
+YEAR_PARTITION_RE = re.compile(r'_y(\d{4})$')
+
+
+def partition_name(year):
+    return f"{DailyPrice._meta.db_table}_y{year}"
+
+
+def list_partitions(cursor):
+    """[(partition, bound, estimated rows, total bytes)] of the bar table, oldest first."""
+    cursor.execute(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint, pg_total_relation_size(c.oid) "
+        "FROM pg_inherits h JOIN pg_class c ON c.oid = h.inhrelid "
+        "WHERE h.inhparent = %s::regclass "
+        "ORDER BY c.relname",
+        [DailyPrice._meta.db_table],
+    )
+    # The history partition sorts after the years by name; put it first
+    return sorted(cursor.fetchall(), key=lambda row: (YEAR_PARTITION_RE.search(row[0]) is not None, row[0]))
+
+
+def partition_years(cursor):
+    """Years that already have their own partition."""
+    years = set()
+    for name, *_ in list_partitions(cursor):
+        match = YEAR_PARTITION_RE.search(name)
+        if match:
+            years.add(int(match.group(1)))
+    return years
+
+
+def create_year_partitions(through_year, lock_timeout_ms=5000, dry_run=False):
+    """
+    Create the missing yearly partitions up to `through_year`; return their names.
+    Attaching a partition locks the parent table, so each one is created in its own short
+    transaction that gives up after `lock_timeout_ms` rather than queueing behind long reads.
+    """
+    table = DailyPrice._meta.db_table
+    with connection.cursor() as cursor:
+        existing = partition_years(cursor)
+        missing = [year for year in range(FIRST_PARTITION_YEAR, through_year + 1) if year not in existing]
+        if dry_run:
+            return [partition_name(year) for year in missing]
+
+        created = []
+        for year in missing:
+            with transaction.atomic():
+                cursor.execute(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}")
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {partition_name(year)} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+                )
+            created.append(partition_name(year))
+    return created
+
+
+def ensure_partitions(stdout, years_ahead=YEARS_AHEAD):
+    """
+    Create the partitions missing through `years_ahead` years after the current one, at the start
+    of an ingestion run. A failure (usually the lock timeout) is reported, not raised: bars of the
+    years that have a partition can still be written, and the next run tries again.
+    """
+    try:
+        created = create_year_partitions(timezone.now().year + years_ahead)
+    except OperationalError as e:
+        stdout.write(f"Could not create the DailyPrice partitions: {e}")
+        return []
+    for name in created:
+        stdout.write(f"Created partition {name}")
+    return created
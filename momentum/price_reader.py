@@ -0,0 +1,118 @@
+"""
+Float read path for DailyPrice: prices are cast to double precision in SQL and every column
+comes back as a single binary array value (array_send(array_agg(...))) that NumPy decodes in
+one pass. No Decimal (or any other Python object) is created per value, unlike the ORM or
+pd.read_sql on the numeric columns.
+
+    arrays = read_price_arrays(tickers=['SPY', 'QQQ'], asset_class='equity', start='2015-01-01')
+    arrays['adj_close']                          # float64 (or float32) ndarray
+    frame = read_price_frame(asset_class='equity', fields=['adj_close'], dtype='float32')
+
+NULL prices come back as NaN.
+"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from django.db import connection
+
+from momentum.models import DailyPrice, Instrument
+
+PRICE_FIELDS = ['open', 'high', 'low', 'adj_close', 'volume']
+
+# Instruments per query: bounds the arrays PostgreSQL builds in memory (a value is at most 1 GB)
+INSTRUMENTS_PER_QUERY = 500
+
+# Binary dates are days since 2000-01-01
+PG_EPOCH = np.datetime64('2000-01-01', 'D')
+
+# One-dimensional array_send output: ndim, has_null, element type, length, lower bound
+ARRAY_HEADER_SIZE = 20
+
+
+def _decode_array(data, value_type):
+    """Values of an array_send bytea without NULLs: every element is its length, then the value."""
+    if data is None:
+        return np.empty(0, dtype=value_type)
+    elements = np.frombuffer(data, dtype=[('length', '>i4'), ('value', value_type)], offset=ARRAY_HEADER_SIZE)
+    return elements['value']
+
+
+def _instrument_ids(tickers, asset_class):
+    instruments = Instrument.objects.all()
+    if asset_class is not None:
+        instruments = instruments.filter(asset_class=asset_class)
+    if tickers is not None:
+        instruments = instruments.filter(ticker__in=list(tickers))
+    return sorted(instruments.values_list('id', flat=True))
+
+
+def read_price_arrays(tickers=None, asset_class=None, start=None, end=None, fields=None, dtype=np.float64):
+    """
+    Bars as NumPy arrays: {'instrument_id': int32, 'date': datetime64[D], field: dtype}, ordered
+    by instrument then date. `dtype` may be float32 to halve the memory of the price columns
+    (values are still computed in double precision by PostgreSQL, then rounded once).
+    """
+    fields = list(fields or PRICE_FIELDS)
+    unknown = set(fields) - set(PRICE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown price fields: {', '.join(sorted(unknown))}")
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'f':
+        raise ValueError(f"dtype must be a float type, not {dtype}")
+
+    conditions, params = ["instrument_id = ANY(%s)"], []
+    if start is not None:
+        conditions.append("date >= %s")
+        params.append(date.fromisoformat(start) if isinstance(start, str) else start)
+    if end is not None:
+        conditions.append("date <= %s")
+        params.append(date.fromisoformat(end) if isinstance(end, str) else end)
+
+    # NULLs become NaN so that the arrays have fixed-size elements
+    columns = ', '.join(f"array_send(array_agg(COALESCE({field}::float8, 'NaN')))" for field in fields)
+    sql = (f"SELECT array_send(array_agg(instrument_id)), array_send(array_agg(date)), {columns} "
+           f"FROM {DailyPrice._meta.db_table} WHERE {' AND '.join(conditions)}")
+
+    # Aggregates of one query see the rows in the same order, so the columns stay aligned
+    chunks = []
+    instrument_ids = _instrument_ids(tickers, asset_class)
+    with connection.cursor() as cursor:
+        for i in range(0, len(instrument_ids), INSTRUMENTS_PER_QUERY):
+            cursor.execute(sql, [instrument_ids[i:i + INSTRUMENTS_PER_QUERY], *params])
+            chunks.append(cursor.fetchone())
+
+    ids = np.concatenate([_decode_array(chunk[0], '>i4') for chunk in chunks] or [np.empty(0, '>i4')])
+    days = np.concatenate([_decode_array(chunk[1], '>i4') for chunk in chunks] or [np.empty(0, '>i4')])
+    # array_agg follows the scan order: sort here rather than in PostgreSQL
+    order = np.lexsort((days, ids))
+
+    arrays = {
+        'instrument_id': ids[order].astype(np.int32),
+        'date': PG_EPOCH + days[order].astype(np.int64),
+    }
+    for position, field in enumerate(fields, start=2):
+        values = np.concatenate([_decode_array(chunk[position], '>f8') for chunk in chunks] or [np.empty(0, '>f8')])
+        # One conversion from big-endian doubles straight to the requested width
+        arrays[field] = values[order].astype(dtype)
+    return arrays
+
+
+def read_price_frame(tickers=None, asset_class=None, start=None, end=None, fields=None, dtype=np.float64):
+    """read_price_arrays as a DataFrame with ticker and asset_class columns (float price columns)."""
+    arrays = read_price_arrays(tickers, asset_class, start, end, fields, dtype)
+    keys = dict((pk, (ticker, instrument_class)) for pk, ticker, instrument_class
+                in Instrument.objects.values_list('id', 'ticker', 'asset_class'))
+    ids, positions = np.unique(arrays.pop('instrument_id'), return_inverse=True)
+    frame = pd.DataFrame(arrays, copy=False)
+    frame.insert(0, 'ticker', _categorical([keys[pk][0] for pk in ids], positions))
+    frame.insert(1, 'asset_class', _categorical([keys[pk][1] for pk in ids], positions))
+    return frame
+
+
+def _categorical(labels, positions):
+    """Per-bar labels as a Categorical: one string per instrument instead of one per bar."""
+    # One hash lookup per instrument rather than a list scan; the categories stay sorted
+    codes, categories = pd.factorize(np.asarray(labels, dtype=object), sort=True)
+    return pd.Categorical.from_codes(codes[positions], categories)
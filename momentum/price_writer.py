@@ -0,0 +1,385 @@
+"""Set-based write path for the DailyPrice table (PostgreSQL)."""
+
+import io
+import time
+
+import numpy as np
+import pandas as pd
+from django.db import connection, transaction
+
+from momentum.models import DailyPrice, Instrument
+
+# Column order of the row tuples accepted by upsert_daily_prices
+INSERT_COLUMNS = [
+    'date', 'asset_class', 'ticker', 'name',
+    'open', 'high', 'low', 'adj_close', 'volume',
+    'fetch_date', 'is_live', 'time_utc',
+]
+
+# Stored once per instrument (Instrument); the bars refer to it by instrument_id
+INSTRUMENT_COLUMNS = ['asset_class', 'ticker', 'name']
+
+# Columns of the DailyPrice table written from INSERT_COLUMNS tuples, besides instrument_id
+BAR_COLUMNS = [column for column in INSERT_COLUMNS if column not in INSTRUMENT_COLUMNS]
+
+# SQL types of the bar columns (rows sent as VALUES lists carry untyped NULLs)
+COLUMN_TYPES = {
+    'date': 'date', 'open': 'numeric', 'high': 'numeric', 'low': 'numeric', 'adj_close': 'numeric',
+    'volume': 'bigint', 'fetch_date': 'timestamptz', 'is_live': 'boolean', 'time_utc': 'time',
+}
+
+# Natural key of a bar in frames and row tuples (the table's unique key is (instrument_id, date))
+CONFLICT_COLUMNS = ['ticker', 'asset_class', 'date']
+
+# Columns refreshed when the bar already exists (is_live is left untouched, as before)
+UPDATE_COLUMNS = ['open', 'high', 'low', 'adj_close', 'volume', 'fetch_date', 'time_utc']
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Fields compared by change detection (numeric(12, 4) prices and the volume)
+COMPARED_COLUMNS = ['open', 'high', 'low', 'adj_close', 'volume']
+
+# Half a unit of the last stored decimal: an incoming float this close rounds to the stored value
+PRICE_TOLERANCE = 0.5e-4
+
+
+# Provider column behind each DailyPrice price field (selected by name, never by position)
+FIELD_COLUMNS = {
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'adj_close': 'Adj Close',
+    'volume': 'Volume',
+}
+
+
+def price_columns(data, ticker=None):
+    """
+    Flatten provider columns to one plain column per price field. Handles the MultiIndex
+    of yf.download, either (Price, Ticker) or (Ticker, Price) when grouped by ticker.
+    Fields the provider did not return come back as all-NaN columns.
+    """
+    columns = data.columns
+    if isinstance(columns, pd.MultiIndex):
+        names = set(FIELD_COLUMNS.values())
+        price_level = next(
+            (level for level in range(columns.nlevels) if names & set(columns.get_level_values(level))),
+            None,
+        )
+        if price_level is None:
+            raise KeyError(f"No price columns found in {list(columns)[:6]}")
+        for level in range(columns.nlevels):
+            if level != price_level and ticker is not None and ticker in set(columns.get_level_values(level)):
+                data = data.xs(ticker, axis=1, level=level)
+                break
+        if isinstance(data.columns, pd.MultiIndex):
+            # A single ticker left on its own level: keep only the price names
+            levels = range(data.columns.nlevels)
+            keep = next(level for level in levels if names & set(data.columns.get_level_values(level)))
+            data = data.droplevel([level for level in levels if level != keep], axis=1)
+    return data.reindex(columns=list(FIELD_COLUMNS.values()))
+
+
+def frame_to_records(data, ticker, name, asset_class, fetch_timestamp, time_utc=None):
+    """Convert a provider frame into a DataFrame with INSERT_COLUMNS, whole columns at a time."""
+    prices = price_columns(data, ticker)
+    index = pd.DatetimeIndex(prices.index)
+
+    records = pd.DataFrame({
+        'date': index.date,  # Exchange-local trading dates
+        'open': prices[FIELD_COLUMNS['open']].to_numpy(dtype=float),
+        'high': prices[FIELD_COLUMNS['high']].to_numpy(dtype=float),
+        'low': prices[FIELD_COLUMNS['low']].to_numpy(dtype=float),
+        'adj_close': prices[FIELD_COLUMNS['adj_close']].to_numpy(dtype=float),
+        'volume': pd.Series(prices[FIELD_COLUMNS['volume']].to_numpy(dtype=float)).round().astype('Int64'),
+    })
+    records['asset_class'] = asset_class
+    records['ticker'] = ticker
+    records['name'] = name
+    records['fetch_date'] = fetch_timestamp
+    records['is_live'] = False
+    records['time_utc'] = time_utc
+    return records[INSERT_COLUMNS]
+
+
+def records_to_rows(records):
+    """INSERT_COLUMNS tuples (NaN / NA as None) from a frame built by frame_to_records."""
+    columns = []
+    for column in INSERT_COLUMNS:
+        values = records[column].to_numpy(dtype=object, copy=True)
+        missing = records[column].isna().to_numpy()
+        if missing.any():
+            values[missing] = None
+        columns.append(values.tolist())
+    return list(zip(*columns))
+
+
+def frame_to_rows(data, ticker, name, asset_class, fetch_timestamp, time_utc=None):
+    """Convert a provider frame into INSERT_COLUMNS tuples ready for upsert_daily_prices."""
+    return records_to_rows(frame_to_records(data, ticker, name, asset_class, fetch_timestamp, time_utc))
+
+
+def _on_conflict_sql(table, update_live=False):
+    updates = [f'{column} = EXCLUDED.{column}' for column in UPDATE_COLUMNS if column != 'time_utc']
+    if update_live:
+        # Streaming writers own the flag: a live bar becomes final when its day is over
+        updates.append('is_live = EXCLUDED.is_live')
+    # A write without a market time (e.g. a backfill) must not erase a known one
+    updates.append(f'time_utc = COALESCE(EXCLUDED.time_utc, {table}.time_utc)')
+    return f"ON CONFLICT (instrument_id, date) DO UPDATE SET {', '.join(updates)}"
+
+
+# New instruments are added; a renamed one is only rewritten when its name really changed
+_INSTRUMENT_CONFLICT_SQL = (
+    "ON CONFLICT (ticker, asset_class) DO UPDATE SET name = EXCLUDED.name "
+    "WHERE i.name IS DISTINCT FROM EXCLUDED.name"
+)
+
+
+def _keyed_columns(bar_alias, instrument_alias):
+    """INSERT_COLUMNS of bars joined to their instrument, e.g. 'p.date, i.asset_class, i.ticker, ...'."""
+    return ', '.join(
+        f"{instrument_alias if column in INSTRUMENT_COLUMNS else bar_alias}.{column}" for column in INSERT_COLUMNS
+    )
+
+
+def _upsert_instruments(cursor, rows):
+    """Make sure every (ticker, asset_class) of the INSERT_COLUMNS tuples has an instrument."""
+    positions = [INSERT_COLUMNS.index(column) for column in INSTRUMENT_COLUMNS]
+    # The last row of an instrument carries its current name
+    instruments = {(row[positions[1]], row[positions[0]]): tuple(row[i] for i in positions) for row in rows}
+    placeholders = ', '.join(['(%s, %s, %s)'] * len(instruments))
+    cursor.execute(
+        f"INSERT INTO {Instrument._meta.db_table} AS i ({', '.join(INSTRUMENT_COLUMNS)}) "
+        f"VALUES {placeholders} {_INSTRUMENT_CONFLICT_SQL}",
+        [value for values in instruments.values() for value in values],
+    )
+
+
+def _upsert_sql(row_count, update_live=False):
+    table = DailyPrice._meta.db_table
+    placeholders = '(' + ', '.join(['%s'] * len(INSERT_COLUMNS)) + ')'
+    values = ', '.join(f'v.{column}::{COLUMN_TYPES[column]}' for column in BAR_COLUMNS)
+    return (
+        f"INSERT INTO {table} (instrument_id, {', '.join(BAR_COLUMNS)}) "
+        f"SELECT i.id, {values} "
+        f"FROM (VALUES {', '.join([placeholders] * row_count)}) AS v ({', '.join(INSERT_COLUMNS)}) "
+        f"JOIN {Instrument._meta.db_table} i ON i.ticker = v.ticker AND i.asset_class = v.asset_class "
+        f"{_on_conflict_sql(table, update_live)}"
+    )
+
+
+def upsert_daily_prices(rows, chunk_size=DEFAULT_CHUNK_SIZE, update_live=False):
+    """
+    Insert or update DailyPrice bars with INSERT ... ON CONFLICT, one statement per chunk.
+    `rows` are tuples in INSERT_COLUMNS order. Returns the number of rows written.
+    With `update_live`, is_live of existing bars is overwritten as well.
+    """
+    # One statement cannot touch the same bar twice: keep the last version of each key
+    key_positions = [INSERT_COLUMNS.index(column) for column in CONFLICT_COLUMNS]
+    rows = list({tuple(row[i] for i in key_positions): row for row in rows}.values())
+    if not rows:
+        return 0
+
+    written = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        _upsert_instruments(cursor, rows)
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            params = [value for row in chunk for value in row]
+            cursor.execute(_upsert_sql(len(chunk), update_live), params)
+            written += cursor.rowcount
+    return written
+
+
+class CopyBackfill:
+    """
+    Bulk loader for large backfills: every staged frame is streamed into a temporary
+    staging table with COPY FROM STDIN, and merge() moves everything into DailyPrice
+    with a single INSERT ... SELECT ... ON CONFLICT statement (safe to re-run).
+
+        with CopyBackfill() as backfill:
+            backfill.stage_rows(rows)
+            ...
+            backfill.merge()
+    """
+
+    staging_table = 'momentum_dailyprice_staging'
+
+    def __init__(self):
+        self.staged_rows = 0
+        self.merged_rows = 0
+        self.copy_seconds = 0.0
+        self.merge_seconds = 0.0
+        self.deleted_rows = 0
+        self.cursor = None
+
+    def __enter__(self):
+        self.cursor = connection.cursor()
+        self.cursor.execute(f"DROP TABLE IF EXISTS {self.staging_table}")
+        # Same column types as the bars joined to their instrument, without id, constraints or indexes
+        self.cursor.execute(
+            f"CREATE TEMP TABLE {self.staging_table} AS "
+            f"SELECT {_keyed_columns('p', 'i')} FROM {DailyPrice._meta.db_table} p "
+            f"JOIN {Instrument._meta.db_table} i ON i.id = p.instrument_id WITH NO DATA"
+        )
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.cursor.execute(f"DROP TABLE IF EXISTS {self.staging_table}")
+        finally:
+            self.cursor.close()
+        return False
+
+    def stage_rows(self, rows):
+        """Stream INSERT_COLUMNS tuples into the staging table; return the number staged."""
+        frame = pd.DataFrame(rows, columns=INSERT_COLUMNS)
+        frame['volume'] = frame['volume'].astype('Int64')  # Keep volumes integral next to NULLs
+        return self.stage_frame(frame)
+
+    def stage_frame(self, frame):
+        """Stream a frame built by frame_to_records into the staging table; return the number staged."""
+        if frame.empty:
+            return 0
+
+        buffer = io.StringIO()
+        frame.to_csv(buffer, index=False, header=False)
+
+        started = time.perf_counter()
+        self._copy(buffer.getvalue())
+        self.copy_seconds += time.perf_counter() - started
+        self.staged_rows += len(frame)
+        return len(frame)
+
+    def _copy(self, csv_text):
+        sql = f"COPY {self.staging_table} ({', '.join(INSERT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+        raw_cursor = self.cursor.cursor
+        if hasattr(raw_cursor, 'copy'):
+            # psycopg 3
+            with raw_cursor.copy(sql) as copy:
+                copy.write(csv_text)
+        else:
+            # psycopg2
+            raw_cursor.copy_expert(sql, io.StringIO(csv_text))
+
+    def merge(self, replace=False):
+        """
+        Merge the staged bars into DailyPrice in one statement; return the rows written.
+        With `replace`, stored bars of the staged tickers that the new history no longer
+        contains (within its date range) are deleted in the same transaction.
+        """
+        table = DailyPrice._meta.db_table
+        instruments = Instrument._meta.db_table
+        columns = ', '.join(BAR_COLUMNS)
+        started = time.perf_counter()
+        self.deleted_rows = 0
+        with transaction.atomic():
+            # Instruments first (with the name of their latest staged fetch), then the bars by key
+            self.cursor.execute(
+                f"INSERT INTO {instruments} AS i ({', '.join(INSTRUMENT_COLUMNS)}) "
+                f"SELECT DISTINCT ON (ticker, asset_class) {', '.join(INSTRUMENT_COLUMNS)} FROM {self.staging_table} "
+                f"ORDER BY ticker, asset_class, fetch_date DESC "
+                f"{_INSTRUMENT_CONFLICT_SQL}"
+            )
+            # DISTINCT ON keeps one version of a bar staged twice (the most recent fetch)
+            self.cursor.execute(
+                f"INSERT INTO {table} (instrument_id, {columns}) "
+                f"SELECT DISTINCT ON (i.id, s.date) i.id, {', '.join(f's.{column}' for column in BAR_COLUMNS)} "
+                f"FROM {self.staging_table} s "
+                f"JOIN {instruments} i ON i.ticker = s.ticker AND i.asset_class = s.asset_class "
+                f"ORDER BY i.id, s.date, s.fetch_date DESC "
+                f"{_on_conflict_sql(table)}"
+            )
+            self.merged_rows = self.cursor.rowcount
+            if replace:
+                self.cursor.execute(
+                    f"DELETE FROM {table} t USING ("
+                    f"SELECT i.id AS instrument_id, s.ticker, s.asset_class, "
+                    f"MIN(s.date) AS first_date, MAX(s.date) AS last_date "
+                    f"FROM {self.staging_table} s "
+                    f"JOIN {instruments} i ON i.ticker = s.ticker AND i.asset_class = s.asset_class "
+                    f"GROUP BY i.id, s.ticker, s.asset_class) k "
+                    f"WHERE t.instrument_id = k.instrument_id "
+                    f"AND t.date BETWEEN k.first_date AND k.last_date "
+                    f"AND NOT EXISTS (SELECT 1 FROM {self.staging_table} s "
+                    f"WHERE s.ticker = k.ticker AND s.asset_class = k.asset_class AND s.date = t.date)"
+                )
+                self.deleted_rows = self.cursor.rowcount
+            self.cursor.execute(f"TRUNCATE {self.staging_table}")
+        self.merge_seconds = time.perf_counter() - started
+        return self.merged_rows
+
+    def rows_per_second(self):
+        """Return (COPY throughput, merge throughput) in rows per second."""
+        copy_rate = self.staged_rows / self.copy_seconds if self.copy_seconds else 0.0
+        merge_rate = self.merged_rows / self.merge_seconds if self.merge_seconds else 0.0
+        return copy_rate, merge_rate
+
+
+#################################
+# CHANGE DETECTION
+
+def load_stored_bars(records):
+    """
+    Stored versions of the bars in `records` (a frame from frame_to_records), with one query:
+    every (ticker, asset_class) of the frame from its earliest incoming date.
+    """
+    since = records.groupby(['ticker', 'asset_class'])['date'].min()
+    table = DailyPrice._meta.db_table
+    keys = ', '.join(['(%s, %s, %s::date)'] * len(since))
+    params = [value for (ticker, asset_class), day in since.items() for value in (ticker, asset_class, day)]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT i.ticker, i.asset_class, p.date, p.open::float8, p.high::float8, p.low::float8, "
+            f"p.adj_close::float8, p.volume, p.time_utc "
+            f"FROM (VALUES {keys}) AS k (ticker, asset_class, since) "
+            f"JOIN {Instrument._meta.db_table} i ON i.ticker = k.ticker AND i.asset_class = k.asset_class "
+            f"JOIN {table} p ON p.instrument_id = i.id AND p.date >= k.since",
+            params,
+        )
+        rows = cursor.fetchall()
+    return pd.DataFrame(rows, columns=CONFLICT_COLUMNS + COMPARED_COLUMNS + ['time_utc'])
+
+
+def split_changed_records(records, stored):
+    """
+    Compare incoming bars with the stored ones, whole columns at a time.
+    Returns (new, restated, unchanged_count): new and restated are the rows of `records`
+    to write. A latest bar whose market time moved (e.g. a live bar now final) counts as restated.
+    """
+    merged = records.merge(stored, on=CONFLICT_COLUMNS, how='left', suffixes=('', '_stored'), indicator=True)
+    is_new = (merged['_merge'] == 'left_only').to_numpy()
+
+    differs = np.zeros(len(merged), dtype=bool)
+    for column in COMPARED_COLUMNS:
+        incoming = pd.to_numeric(merged[column]).to_numpy(dtype=float, na_value=np.nan)
+        current = pd.to_numeric(merged[f'{column}_stored']).to_numpy(dtype=float, na_value=np.nan)
+        differs |= ~np.isclose(incoming, current, rtol=0, atol=PRICE_TOLERANCE, equal_nan=True)
+
+    # time_utc is stamped on every incoming row but only describes the latest bar of a ticker
+    latest = (merged['date'] == merged.groupby(['ticker', 'asset_class'])['date'].transform('max')).to_numpy()
+    differs |= latest & (merged['time_utc'].notna() & (merged['time_utc'] != merged['time_utc_stored'])).to_numpy()
+
+    restated = differs & ~is_new
+    return records[is_new], records[restated], int((~is_new & ~differs).sum())
+
+
+def write_changed_prices(records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Upsert only the bars of `records` that are new or differ from the stored version,
+    so re-fetched overlap days that did not move cost no UPDATE (and no WAL).
+    Returns {'inserted', 'updated', 'unchanged'} bar counts.
+    """
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    records = records.drop_duplicates(CONFLICT_COLUMNS, keep='last')
+    if records.empty:
+        return counts
+
+    new, restated, counts['unchanged'] = split_changed_records(records, load_stored_bars(records))
+    changed = pd.concat([new, restated])
+    if not changed.empty:
+        upsert_daily_prices(records_to_rows(changed), chunk_size)
+    counts['inserted'], counts['updated'] = len(new), len(restated)
+    return counts
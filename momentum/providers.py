@@ -0,0 +1,281 @@
+"""
+Price providers used by the ingestion commands.
+
+Every provider returns daily bars as frames indexed by date with PRICE_COLUMNS, so the
+write path does not care where the prices come from:
+    - yfinance: the live Yahoo Finance service
+    - fixture:  recorded CSV frames from disk, or synthetic histories (no network needed)
+"""
+
+import abc
+import os
+import threading
+import time
+import zlib
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+
+# Columns of the frames returned by every provider (same as a single-ticker yf.download)
+PRICE_COLUMNS = ['Adj Close', 'Close', 'High', 'Low', 'Open', 'Volume']
+
+
+class PriceDataMissing(LookupError):
+    """The provider has no prices for this ticker (not worth retrying)."""
+
+
+def split_batch_frame(data, tickers):
+    """
+    Split the wide frame of a multi-symbol download into one frame per ticker.
+    Each frame keeps the PRICE_COLUMNS order and drops the dates on which
+    that ticker did not trade (other tickers of the batch did).
+    """
+    frames = {}
+    if data is None or data.empty:
+        return frames
+
+    columns = data.columns
+    if isinstance(columns, pd.MultiIndex):
+        # group_by='ticker' puts the ticker on level 0, the default on level 1
+        ticker_level = 0 if set(tickers) & set(columns.get_level_values(0)) else 1
+        available = set(columns.get_level_values(ticker_level))
+        for ticker in tickers:
+            if ticker not in available:
+                continue
+            frame = data.xs(ticker, axis=1, level=ticker_level)
+            frames[ticker] = frame
+    elif len(tickers) == 1:
+        frames[tickers[0]] = data
+
+    result = {}
+    for ticker, frame in frames.items():
+        frame = frame.reindex(columns=PRICE_COLUMNS).dropna(how='all')
+        if not frame.empty:
+            result[ticker] = frame
+    return result
+
+
+class PriceProvider(abc.ABC):
+    """Interface of a price provider. Methods may be called from several worker threads."""
+
+    name = None
+
+    # Errors that will not go away by asking again (not retried by the FetchPool)
+    permanent_errors = (PriceDataMissing,)
+
+    @abc.abstractmethod
+    def history(self, ticker, start_date, timeout=10, end_date=None):
+        """Daily bars of one ticker from start_date (to end_date, inclusive); raises PriceDataMissing if there are none."""
+
+    def history_batch(self, tickers, start_date, timeout=10, end_date=None, threads=1):
+        """{ticker: daily bars} for several tickers (tickers without data are left out), `threads` downloads at once."""
+        return {ticker: self.history(ticker, start_date, timeout=timeout, end_date=end_date) for ticker in tickers}
+
+    def last_trade_times(self, tickers, timeout=10, threads=1):
+        """{ticker: last trade time in UTC} for the tickers trading today."""
+        return {}
+
+    def batch_concurrency(self, workers):
+        """(batches fetched at the same time, download threads per batch) for `workers` (--concurrency)."""
+        return workers, 1
+
+    def long_name(self, ticker):
+        """Full security name according to the provider, or None."""
+        return None
+
+
+#################################
+# YFINANCE
+
+class YFinanceProvider(PriceProvider):
+    name = 'yfinance'
+
+    # The pinned yfinance keeps yf.download state in module globals: one download at a time
+    _download_lock = threading.Lock()
+
+    def __init__(self):
+        # Only needed when the live provider is used
+        import yfinance as yf
+        from yfinance.exceptions import YFInvalidPeriodError, YFPricesMissingError, YFTickerMissingError, YFTzMissingError
+
+        self.yf = yf
+        # "No data" errors (prices missing, ticker delisted or unknown) are reported as PriceDataMissing
+        self.missing_errors = (YFTickerMissingError, YFPricesMissingError, YFTzMissingError)
+        self.permanent_errors = PriceProvider.permanent_errors + self.missing_errors + (YFInvalidPeriodError,)
+
+    @staticmethod
+    def _end(end_date):
+        # yfinance treats `end` as exclusive
+        return pd.Timestamp(end_date) + pd.Timedelta(days=1) if end_date is not None else None
+
+    def history(self, ticker, start_date, timeout=10, end_date=None):
+        # Ticker.history is thread-safe and raises on provider errors
+        end = self._end(end_date)
+        try:
+            data = self.yf.Ticker(ticker).history(start=start_date, end=end, auto_adjust=False, timeout=timeout, raise_errors=True)
+        except self.missing_errors as e:
+            raise PriceDataMissing(str(e)) from e
+        data = data.reindex(columns=PRICE_COLUMNS).dropna(how='all')
+        if data.empty:
+            raise PriceDataMissing(f"No prices for {ticker} from {start_date} to {end_date or 'today'}")
+        return data
+
+    def _download(self, tickers, **kwargs):
+        with self._download_lock:
+            return self.yf.download(list(tickers), group_by='ticker', progress=False, auto_adjust=False, **kwargs)
+
+    def batch_concurrency(self, workers):
+        # Downloads are serialized by _download_lock: one batch at a time, `workers` symbols in parallel inside it
+        return 1, workers
+
+    def history_batch(self, tickers, start_date, timeout=10, end_date=None, threads=1):
+        # One multi-symbol download for the whole batch
+        data = self._download(tickers, start=start_date, end=self._end(end_date), threads=threads, timeout=timeout)
+        return split_batch_frame(data, list(tickers))
+
+    def last_trade_times(self, tickers, timeout=10, threads=1):
+        # One multi-symbol 1-minute snapshot instead of a history call per ticker
+        intraday = self._download(tickers, period="1d", interval="1m", threads=threads, timeout=timeout)
+        times = {}
+        if intraday is None or intraday.empty or getattr(intraday.index, "tz", None) is None:
+            return times
+        for ticker, frame in split_batch_frame(intraday, list(tickers)).items():
+            times[ticker] = frame.index[-1].tz_convert("UTC").time()
+        return times
+
+    def long_name(self, ticker):
+        info = self.yf.Ticker(ticker).info
+        return info.get('longName') or info.get('shortName')
+
+
+#################################
+# OFFLINE FIXTURES
+
+def fixture_path(directory, ticker):
+    return os.path.join(directory, f"{ticker.replace('/', '_')}.csv")
+
+
+def record_fixture(directory, ticker, data):
+    """Save a frame of daily bars where FixtureProvider can replay it."""
+    os.makedirs(directory, exist_ok=True)
+    data = data.reindex(columns=PRICE_COLUMNS)
+    data.index = data.index.strftime('%Y-%m-%d')  # Plain exchange-local dates, no timezone offsets
+    data.to_csv(fixture_path(directory, ticker), index_label='Date')
+
+
+class FixtureProvider(PriceProvider):
+    """
+    Offline provider: replays CSV frames recorded with record_fixture(), and generates a
+    synthetic random-walk history for tickers without a recording (when `synthetic` is on).
+    Synthetic histories depend only on the ticker and the seed, so repeated runs see the
+    same bars. `latency` adds a sleep per call to imitate network round trips.
+    """
+
+    name = 'fixture'
+
+    # First business day of every synthetic history
+    synthetic_epoch = date(2000, 1, 3)
+
+    def __init__(self, directory=None, synthetic=True, seed=0, latency=0.0):
+        self.directory = directory
+        self.synthetic = synthetic
+        self.seed = seed
+        self.latency = latency
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def synthetic_history(self, ticker, end_date=None):
+        """Deterministic business-day history of one ticker, from synthetic_epoch to end_date."""
+        dates = pd.bdate_range(self.synthetic_epoch, end_date or timezone.now().date())
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()) ^ self.seed)
+        size = len(dates)
+
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0002, 0.01, size)))
+        open_ = close * np.exp(rng.normal(0, 0.003, size))
+        spread = np.abs(rng.normal(0, 0.005, size))
+        return pd.DataFrame({
+            'Adj Close': close,
+            'Close': close,
+            'High': np.maximum(open_, close) * (1 + spread),
+            'Low': np.minimum(open_, close) * (1 - spread),
+            'Open': open_,
+            'Volume': rng.integers(1_000, 1_000_000, size).astype(float),
+        }, index=dates)
+
+    def _load(self, ticker):
+        if self.directory:
+            path = fixture_path(self.directory, ticker)
+            if os.path.exists(path):
+                data = pd.read_csv(path, index_col='Date', parse_dates=['Date'])
+                return data.reindex(columns=PRICE_COLUMNS)
+        if self.synthetic:
+            return self.synthetic_history(ticker)
+        raise PriceDataMissing(f"No fixture recorded for {ticker}")
+
+    def history(self, ticker, start_date, timeout=10, end_date=None):
+        self._wait()
+        data = self._load(ticker)
+        data = data[data.index >= pd.Timestamp(start_date)]
+        if end_date is not None:
+            data = data[data.index <= pd.Timestamp(end_date)]
+        data = data.dropna(how='all')
+        if data.empty:
+            raise PriceDataMissing(f"No fixture prices for {ticker} from {start_date} to {end_date or 'today'}")
+        return data
+
+    def history_batch(self, tickers, start_date, timeout=10, end_date=None, threads=1):
+        self._wait()
+        frames = {}
+        for ticker in tickers:
+            try:
+                data = self._load(ticker)
+            except PriceDataMissing:
+                continue
+            data = data[data.index >= pd.Timestamp(start_date)]
+            if end_date is not None:
+                data = data[data.index <= pd.Timestamp(end_date)]
+            data = data.dropna(how='all')
+            if not data.empty:
+                frames[ticker] = data
+        return frames
+
+    def last_trade_times(self, tickers, timeout=10, threads=1):
+        self._wait()
+        now = timezone.now().time().replace(second=0, microsecond=0)
+        return {ticker: now for ticker in tickers}
+
+
+#################################
+# REGISTRY
+
+PROVIDERS = {
+    'yfinance': YFinanceProvider,
+    'fixture': FixtureProvider,
+}
+
+
+def get_provider(name='yfinance', **kwargs):
+    """Instantiate a registered provider by name."""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown price provider '{name}'. Available: {', '.join(PROVIDERS)}")
+    return PROVIDERS[name](**kwargs)
+
+
+def add_provider_arguments(parser):
+    """Command-line options selecting the price provider."""
+    parser.add_argument('--provider', choices=sorted(PROVIDERS), default='yfinance',
+                        help='Where prices come from (fixture = offline recordings / synthetic histories)')
+    parser.add_argument('--fixture-dir', default=None,
+                        help='Directory of recorded CSV frames (fixture provider)')
+    parser.add_argument('--fixture-latency', type=float, default=0.0,
+                        help='Seconds of simulated network latency per call (fixture provider)')
+
+
+def get_provider_from_options(options):
+    if options['provider'] == 'fixture':
+        return get_provider('fixture', directory=options['fixture_dir'], latency=options['fixture_latency'])
+    return get_provider(options['provider'])
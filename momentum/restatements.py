@@ -0,0 +1,125 @@
+"""
+Detect tickers whose whole adj_close history was restated by the provider (splits, dividends).
+
+The incremental update only re-fetches a few overlap days, so a new adjustment factor would
+leave older bars with the previous one. For each anchor window (a week, some time back) one
+multi-symbol request per batch returns the provider's current adjusted closes, which are
+compared with the stored values on the latest common date.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.db.models import Min
+from django.utils import timezone
+
+from momentum.models import DailyPrice
+from momentum.price_writer import PRICE_TOLERANCE
+from momentum.scheduler import EXCHANGE_LISTED
+
+# Asset classes with corporate actions (forex, crypto and commodity adj_close is the close)
+ADJUSTED_ASSET_CLASSES = set(EXCHANGE_LISTED)
+
+# How far back the anchors are (days before today); each anchor is a one-week window
+ANCHOR_OFFSETS_DAYS = (30, 365, 5 * 365)
+ANCHOR_WINDOW_DAYS = 7
+
+# Relative difference above which an adjusted close counts as restated (a 0.05% dividend)
+RESTATEMENT_TOLERANCE = 5e-4
+
+
+def anchor_windows(today=None, offsets=ANCHOR_OFFSETS_DAYS):
+    """[(start, end)] date windows, one per anchor offset."""
+    today = today or timezone.now().date()
+    return [
+        (today - timedelta(days=offset + ANCHOR_WINDOW_DAYS - 1), today - timedelta(days=offset))
+        for offset in offsets
+    ]
+
+
+def load_stored_adj_close(keys, windows):
+    """Frame of stored (ticker, asset_class, date, stored) adjusted closes inside the windows."""
+    tickers = {ticker for ticker, _ in keys}
+    frames = []
+    for start, end in windows:
+        rows = (DailyPrice.objects.filter(instrument__ticker__in=tickers, date__range=(start, end), adj_close__isnull=False)
+                .values_list('instrument__ticker', 'instrument__asset_class', 'date', 'adj_close'))
+        frames.append(pd.DataFrame.from_records(rows, columns=['ticker', 'asset_class', 'date', 'stored']))
+    stored = pd.concat(frames, ignore_index=True)
+    keys = pd.DataFrame(list(keys), columns=['ticker', 'asset_class'])
+    stored = stored.merge(keys, on=['ticker', 'asset_class'])
+    stored['stored'] = stored['stored'].astype(float)
+    return stored
+
+
+def compare_anchors(provided, stored):
+    """
+    {(ticker, asset_class): (date, stored, provided)} for the tickers whose provider value
+    differs from the stored one on the latest common date of any window.
+    """
+    merged = provided.merge(stored, on=['ticker', 'asset_class', 'date'])
+    if merged.empty:
+        return {}
+
+    # One anchor per window: its latest date stored and returned by the provider
+    merged = merged.sort_values('date').groupby(['ticker', 'asset_class', 'window']).tail(1)
+    difference = np.abs(merged['provided'] - merged['stored'])
+    limit = np.maximum(PRICE_TOLERANCE, RESTATEMENT_TOLERANCE * np.abs(merged['stored']))
+    failed = merged[difference > limit]
+    return {
+        (row.ticker, row.asset_class): (row.date, row.stored, row.provided)
+        for row in failed.itertuples(index=False)
+    }
+
+
+def find_restated_tickers(provider, pool, work_items, batch_size=50, today=None):
+    """
+    Check the adjusted closes of the work items against the provider at the anchor windows.
+    Returns ({(ticker, asset_class): (date, stored, provided)}, number of provider calls).
+    """
+    keys = {(item.ticker, item.asset_class) for item in work_items if item.asset_class in ADJUSTED_ASSET_CLASSES}
+    if not keys:
+        return {}, 0
+
+    windows = anchor_windows(today)
+    by_class = defaultdict(list)
+    for ticker, asset_class in sorted(keys):
+        by_class[asset_class].append(ticker)
+
+    workers, threads = provider.batch_concurrency(pool.workers)
+
+    def fetch(tickers, start, end):
+        return provider.history_batch(tickers, start, timeout=pool.timeout, end_date=end, threads=threads)
+
+    jobs = []
+    for asset_class, tickers in by_class.items():
+        for i in range(0, len(tickers), max(1, batch_size)):
+            chunk = tickers[i:i + max(1, batch_size)]
+            for number, (start, end) in enumerate(windows):
+                jobs.append(((asset_class, number), chunk, fetch, (chunk, start, end)))
+
+    provided = []
+    for (asset_class, number), frames, error in pool.run(jobs, workers):
+        if error is not None:
+            continue  # No verdict for this window; the others still count
+        for ticker, data in frames.items():
+            values = data['Adj Close'].dropna()
+            provided.append(pd.DataFrame({
+                'ticker': ticker, 'asset_class': asset_class, 'window': number,
+                'date': pd.DatetimeIndex(values.index).date, 'provided': values.to_numpy(dtype=float),
+            }))
+
+    if not provided:
+        return {}, len(jobs)
+    return compare_anchors(pd.concat(provided, ignore_index=True), load_stored_adj_close(keys, windows)), len(jobs)
+
+
+def first_stored_dates(keys):
+    """{(ticker, asset_class): first stored date} with one grouped query."""
+    tickers = {ticker for ticker, _ in keys}
+    rows = (DailyPrice.objects.filter(instrument__ticker__in=tickers).values('instrument__ticker', 'instrument__asset_class')
+            .annotate(first_date=Min('date')).values_list('instrument__ticker', 'instrument__asset_class', 'first_date'))
+    return {(ticker, asset_class): first_date for ticker, asset_class, first_date in rows
+            if (ticker, asset_class) in keys}
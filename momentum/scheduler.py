@@ -0,0 +1,157 @@
+"""Decide which tickers actually need a provider call, from the exchange calendars."""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from types import SimpleNamespace
+
+import pytz
+from django.db import connection
+from django.utils import timezone
+
+from momentum.models import Exchange, Exchange_Holiday, Equity_Tickers, Bond_Tickers
+from momentum.utils import get_session_state, is_trading_day
+
+# Forex and commodity futures trade around the clock on weekdays: one UTC "session" per weekday
+ROUND_THE_CLOCK = SimpleNamespace(timezone='UTC', market_open_local=time(0, 0), market_close_local=time(23, 59, 59))
+
+# Asset classes whose tickers are listed on an exchange of their `country`
+EXCHANGE_LISTED = {'equity': Equity_Tickers, 'bond': Bond_Tickers}
+
+# Asset classes that trade every day, at all hours
+ALWAYS_TRADING = {'cryptocurrency'}
+
+
+def load_calendars():
+    """{country (lowercase): (exchange, set of holiday dates)} with two queries."""
+    holidays = defaultdict(set)
+    for country, date in Exchange_Holiday.objects.values_list('country', 'date'):
+        if country and date:
+            holidays[country.strip().lower()].add(date)
+
+    calendars = {}
+    for ex in Exchange.objects.order_by('id'):
+        key = ex.country.strip().lower()
+        # Several exchanges per country share the same hours: keep the first one, like get_market_info
+        calendars.setdefault(key, (ex, holidays[key]))
+    return calendars
+
+
+def calendar_fingerprint():
+    """
+    Hash of the Exchange and Exchange_Holiday rows, with one small query. Processes that keep
+    the calendars in memory compare it to notice a reference-data import.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT md5(COALESCE((SELECT string_agg(e::text, ',' ORDER BY e.id) FROM {Exchange._meta.db_table} e), '') || '|' || "
+            f"COALESCE((SELECT string_agg(h::text, ',' ORDER BY h.id) FROM {Exchange_Holiday._meta.db_table} h), ''))"
+        )
+        return cursor.fetchone()[0]
+
+
+def load_ticker_countries():
+    """{(asset_class, ticker): country} for the exchange-listed asset classes."""
+    countries = {}
+    for asset_class, model in EXCHANGE_LISTED.items():
+        for ticker, country in model.objects.exclude(ticker__isnull=True).values_list('ticker', 'country'):
+            if country:
+                countries[(asset_class, ticker)] = country.strip().lower()
+    return countries
+
+
+def is_due(item, calendar, now_utc):
+    """
+    Return (due, reason) for one WorkItem. A ticker is due when its market is open now
+    (the current bar is moving) or when a session completed after its last fetch.
+    """
+    if item.last_date is None or item.last_fetch is None:
+        return True, "no stored data"
+    if item.asset_class in ALWAYS_TRADING:
+        return True, "trades around the clock"
+
+    if item.asset_class in EXCHANGE_LISTED:
+        if calendar is None:
+            return True, "no exchange calendar"
+        ex, holidays = calendar
+    else:
+        ex, holidays = ROUND_THE_CLOCK, set()
+
+    state = get_session_state(ex, holidays, now_utc)
+    if state["is_open"]:
+        return True, "market open"
+    if item.last_date < state["last_session_date"] or item.last_fetch < state["last_session_close_utc"]:
+        return True, "new completed session"
+    return False, "no session since last fetch"
+
+
+def select_due_work_items(work_items, now_utc=None):
+    """Split work items into (due, skipped); skipped is a list of (item, reason)."""
+    now_utc = now_utc or timezone.now()
+    calendars = load_calendars()
+    countries = load_ticker_countries()
+
+    due, skipped = [], []
+    for item in work_items:
+        country = countries.get((item.asset_class, item.ticker))
+        fetch, reason = is_due(item, calendars.get(country), now_utc)
+        if fetch:
+            due.append(item)
+        else:
+            skipped.append((item, reason))
+    return due, skipped
+
+
+def session_close_times(work_items, now_utc=None):
+    """
+    {ticker: session close time in UTC} for the exchange-listed tickers whose market is
+    closed right now: their last bar is final, so no intraday snapshot is needed.
+    """
+    now_utc = now_utc or timezone.now()
+    calendars = load_calendars()
+    countries = load_ticker_countries()
+
+    times = {}
+    for item in work_items:
+        if item.asset_class not in EXCHANGE_LISTED:
+            continue
+        calendar = calendars.get(countries.get((item.asset_class, item.ticker)))
+        if calendar is None:
+            continue
+        ex, holidays = calendar
+        state = get_session_state(ex, holidays, now_utc)
+        if not state["is_open"]:
+            times[item.ticker] = state["last_session_close_utc"].time()
+    return times
+
+
+def next_session_close(ex, holidays, after_utc):
+    """First session close of the exchange strictly after `after_utc`, in UTC."""
+    local_tz = pytz.timezone(ex.timezone)
+    day = after_utc.astimezone(local_tz).date()
+    while True:
+        if is_trading_day(day, holidays):
+            close = local_tz.localize(datetime.combine(day, ex.market_close_local)).astimezone(pytz.utc)
+            if close > after_utc:
+                return close
+        day += timedelta(days=1)
+
+
+def group_universe_by_market(universe, calendars=None):
+    """
+    Split (ticker, name, asset_class) entries into fetch groups:
+    one per exchange country, 'cryptocurrency', and 'other' (markets without a calendar).
+    """
+    calendars = load_calendars() if calendars is None else calendars
+    countries = load_ticker_countries()
+
+    groups = defaultdict(list)
+    for entry in universe:
+        ticker, _, asset_class = entry
+        country = countries.get((asset_class, ticker))
+        if asset_class in ALWAYS_TRADING:
+            groups['cryptocurrency'].append(entry)
+        elif asset_class in EXCHANGE_LISTED and country in calendars:
+            groups[country].append(entry)
+        else:
+            groups['other'].append(entry)
+    return dict(groups)
@@ -0,0 +1,186 @@
+"""
+Live cryptocurrency bars built from a websocket trade feed.
+
+Trades are folded into the current UTC daily bar of each ticker in memory (crypto days
+follow UTC, like the provider's daily history), and only the bars that moved since the
+previous flush are upserted, as is_live rows, on a short interval. When a trade of a new
+day arrives, at the first flush after midnight UTC and when the stream stops, the open bars
+of the day are flushed one last time as final (is_live = False).
+
+The wire format is Binance's trade stream (combined `{"stream", "data"}` envelopes or bare
+trade objects); `serve_crypto_feed` replays the same format locally for offline runs.
+"""
+
+import json
+from datetime import datetime, timezone as dt_timezone
+
+from momentum.models import Cryptocurrency_Tickers, DailyPrice
+from momentum.price_writer import INSERT_COLUMNS, upsert_daily_prices
+
+ASSET_CLASS = 'cryptocurrency'
+
+# Public Binance endpoint for combined streams; the stream names are appended to it
+DEFAULT_FEED_URL = 'wss://stream.binance.com:9443'
+
+# Quote currency of the feed for each quote currency of the tickers (BTC-USD trades as BTCUSDT)
+FEED_QUOTES = {'USD': 'USDT'}
+
+
+def feed_symbol(ticker):
+    """Feed symbol of a provider ticker: 'BTC-USD' -> 'BTCUSDT'."""
+    base, _, quote = ticker.upper().partition('-')
+    return base + FEED_QUOTES.get(quote, quote)
+
+
+def feed_url(base_url, symbols):
+    """Combined-stream URL subscribing to the trades of `symbols` (left alone if it has a query)."""
+    if '?' in base_url:
+        return base_url
+    streams = '/'.join(f'{symbol.lower()}@trade' for symbol in sorted(symbols))
+    return f"{base_url.rstrip('/')}/stream?streams={streams}"
+
+
+def load_stream_symbols(tickers=None):
+    """{feed symbol: (ticker, name)} for the cryptocurrency universe (or the given tickers)."""
+    rows = Cryptocurrency_Tickers.objects.exclude(ticker__isnull=True).exclude(ticker='')
+    if tickers:
+        rows = rows.filter(ticker__in=tickers)
+    return {feed_symbol(ticker): (ticker, name) for ticker, name in rows.values_list('ticker', 'name')}
+
+
+def parse_trades(message):
+    """
+    [(symbol, price, quantity, trade time in ms)] from one feed message: a combined-stream
+    envelope, a bare trade, or a list of either. Other events (e.g. subscription acks) are skipped.
+    """
+    payload = json.loads(message)
+    items = payload if isinstance(payload, list) else [payload]
+    trades = []
+    for item in items:
+        trade = item.get('data', item)
+        if trade.get('e') != 'trade':
+            continue
+        trades.append((trade['s'], float(trade['p']), float(trade['q']), int(trade['T'])))
+    return trades
+
+
+class DailyBarAggregator:
+    """
+    Current daily bar of every ticker, updated trade by trade. drain() hands over the bars
+    that changed since the previous drain (copies, so a flush can run in another thread).
+    """
+
+    def __init__(self, symbols):
+        self.symbols = symbols  # {feed symbol: (ticker, name)}
+        self.bars = {}          # {ticker: bar dict}
+        self.dirty = set()      # tickers whose live bar moved since the last drain
+        self.closed = []        # finished bars of previous days, waiting for their final flush
+        self.trades = 0
+        self.ignored = 0
+
+    def seed(self, bars):
+        """Start from stored bars of the current day, so a restart keeps the day's open, range and volume."""
+        for bar in bars:
+            self.bars[bar['ticker']] = bar
+
+    def add(self, symbol, price, quantity, trade_ms):
+        """Fold one trade into its ticker's bar; False when the trade is ignored."""
+        entry = self.symbols.get(symbol)
+        if entry is None or not price > 0:
+            self.ignored += 1
+            return False
+
+        ticker, name = entry
+        traded_at = datetime.fromtimestamp(trade_ms / 1000, tz=dt_timezone.utc)
+        day = traded_at.date()
+        bar = self.bars.get(ticker)
+
+        if bar is not None and (day < bar['date'] or (day == bar['date'] and not bar['is_live'])):
+            # Late trade of a day whose bar is already final
+            self.ignored += 1
+            return False
+
+        if bar is None or day > bar['date']:
+            if bar is not None and bar['is_live']:
+                bar['is_live'] = False
+                self.closed.append(bar)
+            bar = {
+                'ticker': ticker, 'name': name, 'date': day,
+                'open': price, 'high': price, 'low': price, 'close': price,
+                'volume': 0.0, 'traded_at': traded_at, 'is_live': True,
+            }
+            self.bars[ticker] = bar
+        else:
+            bar['high'] = max(bar['high'], price)
+            bar['low'] = min(bar['low'], price)
+            if traded_at >= bar['traded_at']:
+                bar['close'] = price
+                bar['traded_at'] = traded_at
+
+        # The provider's crypto volumes are quote-currency (USD) volumes
+        bar['volume'] += price * quantity
+        self.dirty.add(ticker)
+        self.trades += 1
+        return True
+
+    def close_bars(self, before=None):
+        """
+        Make the live bars final: those of days before `before` (the UTC day rollover, for tickers
+        without a trade since midnight), or all of them when the stream stops. Returns how many.
+        """
+        closed = 0
+        for ticker, bar in self.bars.items():
+            if bar['is_live'] and (before is None or bar['date'] < before):
+                bar['is_live'] = False
+                self.closed.append(dict(bar))
+                self.dirty.discard(ticker)
+                closed += 1
+        return closed
+
+    def drain(self):
+        """Bars to write: the finished ones, then a copy of every live bar that moved."""
+        bars = self.closed + [dict(self.bars[ticker]) for ticker in sorted(self.dirty)]
+        self.closed = []
+        self.dirty.clear()
+        return bars
+
+
+def bars_to_rows(bars, fetch_timestamp):
+    """INSERT_COLUMNS tuples for upsert_daily_prices."""
+    rows = []
+    for bar in bars:
+        values = {
+            'date': bar['date'], 'asset_class': ASSET_CLASS, 'ticker': bar['ticker'], 'name': bar['name'],
+            'open': bar['open'], 'high': bar['high'], 'low': bar['low'],
+            'adj_close': bar['close'],  # No corporate actions: the adjusted close is the close
+            'volume': round(bar['volume']), 'fetch_date': fetch_timestamp,
+            'is_live': bar['is_live'], 'time_utc': bar['traded_at'].time().replace(microsecond=0),
+        }
+        rows.append(tuple(values[column] for column in INSERT_COLUMNS))
+    return rows
+
+
+def load_current_bars(symbols, day):
+    """Stored bars of `day` for the tickers of `symbols`, as aggregator bars."""
+    names = dict(symbols.values())
+    stored = (DailyPrice.objects
+              .filter(instrument__asset_class=ASSET_CLASS, instrument__ticker__in=names, date=day, adj_close__isnull=False)
+              .values_list('instrument__ticker', 'open', 'high', 'low', 'adj_close', 'volume', 'time_utc'))
+    bars = []
+    for ticker, open_, high, low, close, volume, time_utc in stored:
+        close = float(close)
+        bars.append({
+            'ticker': ticker, 'name': names[ticker], 'date': day,
+            'open': float(open_ if open_ is not None else close),
+            'high': float(high if high is not None else close),
+            'low': float(low if low is not None else close),
+            'close': close, 'volume': float(volume or 0),
+            'traded_at': datetime.combine(day, time_utc or datetime.min.time(), tzinfo=dt_timezone.utc),
+            'is_live': True,
+        })
+    return bars
+
+
+def write_bars(bars, fetch_timestamp):
+    """Upsert the drained bars, is_live included; returns the number of rows written."""
+    return upsert_daily_prices(bars_to_rows(bars, fetch_timestamp), update_live=True)
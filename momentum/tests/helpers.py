@@ -0,0 +1,24 @@
+"""Frames shared by the momentum tests."""
+
+from datetime import datetime, timezone as dt_timezone
+
+import pandas as pd
+
+from momentum.price_writer import COMPARED_COLUMNS, CONFLICT_COLUMNS
+
+FETCHED = datetime(2024, 1, 10, 12, tzinfo=dt_timezone.utc)
+
+
+def provider_frame(closes, start='2024-01-01'):
+    """A provider frame of business days with the given adjusted closes (prices all equal)."""
+    index = pd.bdate_range(start, periods=len(closes))
+    return pd.DataFrame({'Open': closes, 'High': closes, 'Low': closes, 'Adj Close': closes,
+                         'Volume': [1000.0] * len(closes)}, index=index)
+
+
+def stored_frame(records):
+    """What load_stored_bars returns for bars stored exactly as `records`."""
+    stored = records[CONFLICT_COLUMNS + COMPARED_COLUMNS + ['time_utc']].copy()
+    for column in ['open', 'high', 'low', 'adj_close']:
+        stored[column] = stored[column].round(4)
+    return stored
@@ -0,0 +1,43 @@
+from datetime import date, datetime, time, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from momentum.models import Cryptocurrency_Tickers, DailyPrice, Equity_Tickers, Exchange, Exchange_Holiday
+from momentum.scheduler import group_universe_by_market, load_calendars, next_session_close
+
+# Saturday: the New York group is not due before Monday's close, crypto runs right away
+SATURDAY = datetime(2024, 1, 6, 12, tzinfo=dt_timezone.utc)
+
+
+class IngestionDaemonTests(TestCase):
+
+    def setUp(self):
+        Exchange.objects.create(country='United States', exchange_short_name='NYSE', timezone='America/New_York',
+                                market_open_local=time(9, 30), market_close_local=time(16, 0))
+        Exchange_Holiday.objects.create(date=date(2024, 1, 8), country='United States', holiday_name='Closed')
+        Equity_Tickers.objects.create(asset_class='equity', ticker='SPY', name='S&P 500', country='United States')
+        Cryptocurrency_Tickers.objects.create(asset_class='cryptocurrency', ticker='TST-USD', name='Test coin')
+
+    def test_groups_follow_the_exchange_calendars(self):
+        groups = group_universe_by_market([('SPY', 'S&P 500', 'equity'), ('TST-USD', 'Test coin', 'cryptocurrency'),
+                                           ('EURUSD=X', 'Euro', 'forex')])
+        self.assertEqual({name: [ticker for ticker, _, _ in entries] for name, entries in groups.items()},
+                         {'united states': ['SPY'], 'cryptocurrency': ['TST-USD'], 'other': ['EURUSD=X']})
+
+        ex, holidays = load_calendars()['united states']
+        # Monday is a holiday: the next close is Tuesday 16:00 New York
+        self.assertEqual(next_session_close(ex, holidays, SATURDAY), datetime(2024, 1, 9, 21, tzinfo=dt_timezone.utc))
+
+    def test_once_runs_only_the_groups_that_are_due(self):
+        out = StringIO()
+        daemon = 'momentum.management.commands.run_ingestion_daemon'
+        # close_old_connections would close the connection of the test transaction
+        with mock.patch(f'{daemon}.timezone.now', return_value=SATURDAY), mock.patch(f'{daemon}.close_old_connections'):
+            call_command('run_ingestion_daemon', '--once', '--skip-panel', '--skip-adjustment-check',
+                         provider='fixture', rate_limit=0, stdout=out)
+        self.assertIn('2024-01-09 21:20 UTC  united states (1 tickers)', out.getvalue())
+        self.assertTrue(DailyPrice.objects.filter(instrument__ticker='TST-USD').exists())
+        self.assertFalse(DailyPrice.objects.filter(instrument__ticker='SPY').exists())
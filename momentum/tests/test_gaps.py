@@ -0,0 +1,96 @@
+from datetime import date
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from momentum.gaps import missing_ranges, trading_days
+from momentum.models import Cryptocurrency_Tickers, DailyPrice, Instrument
+
+
+
+
+#################################
+# GAPS
+
+class TradingDaysTests(SimpleTestCase):
+
+    def test_weekdays_minus_holidays(self):
+        # Friday 2024-03-29 is a holiday, the weekend is skipped
+        days = trading_days(date(2024, 3, 27), date(2024, 4, 2), holidays={date(2024, 3, 29)})
+        self.assertEqual(days.astype(object).tolist(),
+                         [date(2024, 3, 27), date(2024, 3, 28), date(2024, 4, 1), date(2024, 4, 2)])
+
+    def test_every_day(self):
+        days = trading_days(date(2024, 3, 29), date(2024, 4, 1), every_day=True)
+        self.assertEqual(len(days), 4)
+
+
+class MissingRangesTests(SimpleTestCase):
+
+    def setUp(self):
+        # Two weeks of trading days: Jan 1-5 and Jan 8-12, 2024
+        self.expected = trading_days(date(2024, 1, 1), date(2024, 1, 12))
+
+    def stored_without(self, *missing):
+        missing = np.array([np.datetime64(day, 'D') for day in missing])
+        return self.expected[~np.isin(self.expected, missing)]
+
+    def test_complete_history(self):
+        self.assertEqual(missing_ranges(self.expected, self.expected), [])
+
+    def test_ranges_span_weekends(self):
+        stored = self.stored_without(date(2024, 1, 5), date(2024, 1, 8), date(2024, 1, 11))
+        self.assertEqual(missing_ranges(stored, self.expected), [
+            (date(2024, 1, 5), date(2024, 1, 8), 2),
+            (date(2024, 1, 11), date(2024, 1, 11), 1),
+        ])
+
+    def test_nearby_ranges_are_merged(self):
+        stored = self.stored_without(date(2024, 1, 2), date(2024, 1, 4), date(2024, 1, 12))
+        # One stored trading day between the first two gaps, five before the last one
+        for merge_within in (1, 4):
+            self.assertEqual(missing_ranges(stored, self.expected, merge_within=merge_within), [
+                (date(2024, 1, 2), date(2024, 1, 4), 2),
+                (date(2024, 1, 12), date(2024, 1, 12), 1),
+            ])
+        self.assertEqual(missing_ranges(stored, self.expected, merge_within=5),
+                         [(date(2024, 1, 2), date(2024, 1, 12), 3)])
+
+
+#################################
+
+
+#################################
+# REPAIR COMMAND (offline fixture provider)
+
+class RepairDailyPriceGapsTests(TestCase):
+    options = {'provider': 'fixture', 'rate_limit': 0}
+
+    def setUp(self):
+        Cryptocurrency_Tickers.objects.create(asset_class='cryptocurrency', ticker='TST-USD', name='Test coin')
+        call_command('frequent_update_dailyprice_db', '--skip-panel', '--skip-adjustment-check', stdout=StringIO(),
+                     **self.options)
+        self.bars = DailyPrice.objects.filter(instrument__ticker='TST-USD')
+        self.total = self.bars.count()
+        # The fixture history has business days only: a crypto calendar expects every day, which
+        # the provider cannot fill, so only the deleted weekdays come back
+        self.deleted = list(self.bars.filter(date__range=(date(2020, 3, 2), date(2020, 3, 6)))
+                            .values_list('date', flat=True).order_by('date'))
+        self.bars.filter(date__in=self.deleted).delete()
+
+    def repair(self):
+        call_command('repair_dailyprice_gaps', '--tickers', 'TST-USD', stdout=StringIO(), **self.options)
+
+    def test_gap_repair_fills_deleted_days(self):
+        self.repair()
+        self.assertEqual(self.bars.count(), self.total)
+        self.assertEqual(list(self.bars.filter(date__in=self.deleted).values_list('date', flat=True).order_by('date')),
+                         self.deleted)
+
+    def test_ticker_dropped_from_the_ticker_models_keeps_its_name(self):
+        Cryptocurrency_Tickers.objects.all().delete()
+        self.repair()
+        self.assertEqual(self.bars.count(), self.total)
+        self.assertEqual(Instrument.objects.get(ticker='TST-USD').name, 'Test coin')
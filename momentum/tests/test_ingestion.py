@@ -0,0 +1,167 @@
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from momentum.ingestion import FetchPool, TokenBucket, WorkItem, group_work_items, load_ledger_fetches, load_watermarks
+from momentum.models import DailyPrice, Equity_Tickers, IngestionRun, IngestionTickerRun, Instrument
+from momentum.providers import FixtureProvider, PriceDataMissing, record_fixture
+from momentum.tests.helpers import FETCHED
+
+
+#################################
+# WORK ITEMS
+
+class GroupWorkItemsTests(SimpleTestCase):
+
+    def test_batches_share_asset_class_and_start_date(self):
+        items = [WorkItem(f'E{i}', '', 'equity', date(2024, 1, 1)) for i in range(5)]
+        items += [WorkItem('C1', '', 'cryptocurrency', date(2024, 1, 1)), WorkItem('E9', '', 'equity', date(2024, 1, 2))]
+        batches = group_work_items(items, batch_size=2)
+        self.assertEqual([[item.ticker for item in batch] for batch in batches],
+                         [['E0', 'E1'], ['E2', 'E3'], ['E4'], ['C1'], ['E9']])
+
+
+#################################
+# WORKER POOL
+
+class TokenBucketTests(SimpleTestCase):
+
+    def setUp(self):
+        # A clock that only moves when the bucket sleeps
+        self.now = 0.0
+        self.sleeps = []
+        clock = mock.patch('momentum.ingestion.time')
+        self.time = clock.start()
+        self.addCleanup(clock.stop)
+        self.time.monotonic.side_effect = lambda: self.now
+        self.time.sleep.side_effect = self.sleep
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def test_burst_up_to_capacity_then_one_call_per_interval(self):
+        bucket = TokenBucket(rate=2, capacity=3)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(self.sleeps, [])
+
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(self.sleeps, [0.5, 0.5])
+
+    def test_tokens_refill_up_to_capacity(self):
+        bucket = TokenBucket(rate=1, capacity=2)
+        bucket.acquire()
+        bucket.acquire()
+        self.now += 60  # A long pause does not buy more than `capacity` calls
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(self.sleeps, [])
+        bucket.acquire()
+        self.assertEqual(self.sleeps, [1.0])
+
+    def test_zero_rate_disables_the_limit(self):
+        bucket = TokenBucket(rate=0)
+        for _ in range(100):
+            bucket.acquire()
+        self.assertEqual(self.sleeps, [])
+
+
+class FetchPoolTests(SimpleTestCase):
+
+    def pool(self, **kwargs):
+        pool = FetchPool(workers=2, rate=0, backoff=0, max_backoff=0, permanent_errors=(PriceDataMissing,), **kwargs)
+        pool.limiter = mock.Mock(wraps=pool.limiter)
+        return pool
+
+    def test_transient_errors_are_retried_with_a_token_per_attempt(self):
+        pool = self.pool(attempts=3)
+        fetch = mock.Mock(side_effect=[ConnectionError('reset'), TimeoutError('slow'), 'bars'])
+        self.assertEqual(pool.call(['AAA'], fetch), 'bars')
+        self.assertEqual(fetch.call_count, 3)
+        self.assertEqual(pool.limiter.acquire.call_count, 3)
+        self.assertEqual(pool.retry_summary(), [('AAA', 2)])
+
+    def test_permanent_errors_and_exhausted_attempts_are_reported(self):
+        pool = self.pool(attempts=2)
+        missing = mock.Mock(side_effect=PriceDataMissing('none'))
+        failing = mock.Mock(side_effect=ConnectionError('reset'))
+        results = {job: (result, error) for job, result, error in pool.run([
+            ('missing', ['AAA'], missing, ()), ('failing', ['BBB'], failing, ()), ('ok', ['CCC'], lambda: 'bars', ()),
+        ])}
+        self.assertIsInstance(results['missing'][1], PriceDataMissing)
+        self.assertIsInstance(results['failing'][1], ConnectionError)
+        self.assertEqual(results['ok'], ('bars', None))
+        self.assertEqual((missing.call_count, failing.call_count), (1, 2))
+
+
+class InitialUpdateTests(TestCase):
+
+    def setUp(self):
+        Equity_Tickers.objects.create(asset_class='equity', ticker='GOOD', name='Good')
+        Equity_Tickers.objects.create(asset_class='equity', ticker='HUGE', name='Huge')
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        # Prices beyond numeric(12, 4): COPY rejects the whole frame
+        huge = FixtureProvider().synthetic_history('HUGE', date(2024, 1, 31)) * 1e9
+        record_fixture(self.directory, 'HUGE', huge)
+
+    def test_a_rejected_ticker_does_not_abort_the_backfill(self):
+        out = StringIO()
+        call_command('initial_update_dailyprice_db', '--skip-panel', provider='fixture', rate_limit=0,
+                     fixture_dir=self.directory, stdout=out)
+        self.assertIn('Error staging data for ticker HUGE', out.getvalue())
+        self.assertFalse(DailyPrice.objects.filter(instrument__ticker='HUGE').exists())
+        self.assertEqual(DailyPrice.objects.filter(instrument__ticker='GOOD').count(),
+                         len(FixtureProvider().history('GOOD', '2010-01-01')))
+        self.assertEqual(IngestionTickerRun.objects.get(ticker='HUGE').error_class, 'NumericValueOutOfRange')
+
+    def test_running_the_backfill_twice_does_not_duplicate_bars(self):
+        for _ in range(2):
+            call_command('initial_update_dailyprice_db', '--skip-panel', provider='fixture', rate_limit=0,
+                         fixture_dir=self.directory, stdout=StringIO())
+        bars = DailyPrice.objects.filter(instrument__ticker='GOOD')
+        self.assertEqual(bars.count(), len(FixtureProvider().history('GOOD', '2010-01-01')))
+        self.assertEqual(bars.values('date').distinct().count(), bars.count())
+
+
+#################################
+# WATERMARKS
+
+class LoadWatermarksTests(TestCase):
+
+    def setUp(self):
+        self.equity = Instrument.objects.create(ticker='AAA', asset_class='equity', name='A')
+        self.crypto = Instrument.objects.create(ticker='AAA', asset_class='cryptocurrency', name='A coin')
+        Instrument.objects.create(ticker='NEW', asset_class='equity', name='Never fetched')
+        for instrument, day, fetched in [(self.equity, date(2024, 1, 2), FETCHED),
+                                         (self.equity, date(2024, 1, 3), FETCHED - timedelta(days=1)),
+                                         (self.crypto, date(2024, 1, 1), FETCHED - timedelta(days=2))]:
+            DailyPrice.objects.create(instrument=instrument, date=day, adj_close=1, fetch_date=fetched)
+
+    def test_last_date_and_fetch_per_key(self):
+        self.assertEqual(load_watermarks(), {
+            ('AAA', 'equity'): (date(2024, 1, 3), FETCHED),
+            ('AAA', 'cryptocurrency'): (date(2024, 1, 1), FETCHED - timedelta(days=2)),
+        })
+
+    def test_a_later_successful_fetch_in_the_ledger_moves_the_fetch_time(self):
+        # Bars unchanged by the last run keep their fetch_date; the ledger knows the run fetched them
+        started = timezone.now()
+        for command, ticker, asset_class, error in [('frequent_update_dailyprice_db', 'AAA', 'equity', None),
+                                                    ('frequent_update_dailyprice_db', 'AAA', 'cryptocurrency', 'HTTPError'),
+                                                    ('repair_dailyprice_gaps', 'AAA', 'cryptocurrency', None)]:
+            run = IngestionRun.objects.create(command=command, provider='fixture', started_at=started)
+            IngestionTickerRun.objects.create(run=run, ticker=ticker, asset_class=asset_class, error_class=error)
+
+        self.assertEqual(load_ledger_fetches(), {('AAA', 'equity'): started})
+        watermarks = load_watermarks()
+        self.assertEqual(watermarks[('AAA', 'equity')], (date(2024, 1, 3), started))
+        self.assertEqual(watermarks[('AAA', 'cryptocurrency')], (date(2024, 1, 1), FETCHED - timedelta(days=2)))
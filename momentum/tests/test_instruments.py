@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.db import connection
+from django.test import TestCase
+
+from momentum.instruments import instrument_ids, instrument_keys, sync_instruments
+from momentum.models import DailyPrice, Instrument
+from momentum.price_writer import frame_to_records, write_changed_prices
+from momentum.tests.helpers import FETCHED, provider_frame
+
+
+class InstrumentTests(TestCase):
+
+    def test_sync_inserts_and_renames_without_duplicates(self):
+        self.assertEqual(sync_instruments([('AAA', 'A', 'equity'), ('AAA', 'A coin', 'cryptocurrency'), (None, 'X', 'bond')]), 2)
+        sync_instruments([('AAA', 'A Corp', 'equity')])
+        self.assertEqual(sorted(Instrument.objects.values_list('ticker', 'asset_class', 'name')),
+                         [('AAA', 'cryptocurrency', 'A coin'), ('AAA', 'equity', 'A Corp')])
+        equity = Instrument.objects.get(asset_class='equity')
+        self.assertEqual(instrument_ids('equity'), {'AAA': equity.pk})
+        self.assertEqual(instrument_keys()[equity.pk], ('AAA', 'equity'))
+
+    def test_bars_point_to_one_instrument_and_the_view_keeps_the_old_columns(self):
+        write_changed_prices(frame_to_records(provider_frame([10.0, 11.0]), 'AAA', 'A', 'equity', FETCHED))
+        write_changed_prices(frame_to_records(provider_frame([12.0], start='2024-01-03'), 'AAA', 'A Corp', 'equity', FETCHED))
+
+        instrument = Instrument.objects.get()
+        self.assertEqual(instrument.name, 'A Corp')  # The latest fetch carries the current name
+        self.assertEqual(DailyPrice.objects.filter(instrument=instrument).count(), 3)
+
+        # Existing SQL on momentum_dailyprice still sees the string columns
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT ticker, asset_class, name, date, adj_close FROM momentum_dailyprice ORDER BY date")
+            rows = cursor.fetchall()
+        self.assertEqual([row[:4] for row in rows],
+                         [('AAA', 'equity', 'A Corp', date(2024, 1, day)) for day in (1, 2, 3)])
+        self.assertEqual(float(rows[-1][4]), 12.0)
@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.test import TestCase
+
+from momentum.latest_prices import latest_prices, performance, refresh_latest_prices
+from momentum.price_writer import frame_to_records, write_changed_prices
+from momentum.tests.helpers import FETCHED, provider_frame
+
+
+class LatestPriceTests(TestCase):
+
+    def test_view_holds_the_latest_bar_and_the_anchors_on_or_before_each_lookback(self):
+        # Business days 2024-01-01 .. 2024-01-10, closes 100 .. 107
+        closes = [100.0 + i for i in range(8)]
+        write_changed_prices(frame_to_records(provider_frame(closes), 'AAA', 'A', 'equity', FETCHED))
+        write_changed_prices(frame_to_records(provider_frame([5.0]), 'AAA', 'A coin', 'cryptocurrency', FETCHED))
+        self.assertEqual(latest_prices('equity'), {})  # Nothing until the view is refreshed
+
+        refresh_latest_prices()
+        latest = latest_prices('equity')['AAA']
+        self.assertEqual((latest.date, float(latest.adj_close)), (date(2024, 1, 10), 107.0))
+        self.assertEqual((latest.d_date, latest.w_date, latest.m_date), (date(2024, 1, 9), date(2024, 1, 3), None))
+
+        self.assertAlmostEqual(float(performance(latest, 'd')), 1 / 106 * 100)
+        self.assertAlmostEqual(float(performance(latest, 'w')), 5 / 102 * 100)
+        self.assertIsNone(performance(latest, 'm'))
+        self.assertIsNone(performance(None, 'd'))
+        self.assertEqual(list(latest_prices('cryptocurrency')), ['AAA'])
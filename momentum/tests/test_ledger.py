@@ -0,0 +1,39 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from momentum.ledger import RunLedger
+from momentum.models import IngestionTickerRun
+
+
+class RunLedgerTests(TestCase):
+
+    def test_metrics_of_a_run_and_its_tickers(self):
+        ledger = RunLedger('frequent_update_dailyprice_db', 'fixture')
+        ledger.record('AAA', 'equity', provider_latency=0.5, rows_fetched=10)
+        ledger.record('AAA', 'equity', rows_changed=2, db_write_seconds=0.1)
+        ledger.record('AAA', 'cryptocurrency', rows_fetched=5, rows_changed=5)
+        ledger.record_error('BBB', 'equity', TimeoutError('slow'))
+        ledger.count_bars({'inserted': 5, 'updated': 2, 'unchanged': 8})
+        run = ledger.finish(retries={'BBB': 3})
+
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual((run.tickers_total, run.tickers_failed), (3, 1))
+        self.assertEqual((run.rows_fetched, run.rows_changed), (15, 7))
+        self.assertEqual((run.rows_inserted, run.rows_updated, run.rows_unchanged), (5, 2, 8))
+
+        aaa = IngestionTickerRun.objects.get(run=run, ticker='AAA', asset_class='equity')
+        self.assertEqual((aaa.provider_latency, aaa.rows_fetched, aaa.rows_changed, aaa.error_class), (0.5, 10, 2, None))
+        bbb = IngestionTickerRun.objects.get(run=run, ticker='BBB')
+        self.assertEqual((bbb.error_class, bbb.retries), ('TimeoutError', 3))
+
+    def test_report_summarises_the_runs(self):
+        ledger = RunLedger('frequent_update_dailyprice_db', 'fixture')
+        ledger.record('AAA', 'equity', provider_latency=2.0, rows_fetched=10)
+        ledger.finish()
+
+        out = StringIO()
+        call_command('ingestion_report', stdout=out)
+        self.assertIn('frequent_update_dailyprice_db', out.getvalue())
+        self.assertIn('AAA', out.getvalue())
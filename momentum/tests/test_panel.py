@@ -0,0 +1,57 @@
+import shutil
+import tempfile
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.test import TestCase
+from django.utils import timezone
+
+from momentum.models import IngestionRun
+from momentum.panel import _WriterLock, open_price_panel, refresh_price_panel
+from momentum.price_writer import frame_to_records, write_changed_prices
+from momentum.tests.helpers import FETCHED, provider_frame
+
+
+class PricePanelTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def write(self, closes, start='2024-01-01', fetched=FETCHED):
+        write_changed_prices(frame_to_records(provider_frame(closes, start=start), 'AAA', 'A', 'equity', fetched))
+
+    def test_refresh_writes_the_bars_fetched_since_the_watermark(self):
+        self.write([10.0, 11.0])
+        self.assertEqual(refresh_price_panel(directory=self.directory)['mode'], 'full')
+
+        # A run in progress holds the watermark at its start, so its bars are read by a later refresh
+        run = IngestionRun.objects.create(command='test', provider='fixture',
+                                          started_at=timezone.now() - timedelta(minutes=5))
+        stats = refresh_price_panel(directory=self.directory)
+        self.assertEqual((stats['mode'], stats['bars']), ('incremental', 0))
+        self.assertEqual(pd.Timestamp(open_price_panel(self.directory).meta['watermark']), run.started_at)
+
+        self.write([12.0], start='2024-01-03', fetched=run.started_at + timedelta(minutes=1))
+        run.finished_at = timezone.now()
+        run.save()
+        self.assertEqual(refresh_price_panel(directory=self.directory)['bars'], 1)
+
+        panel = open_price_panel(self.directory)
+        np.testing.assert_array_equal(panel.column('AAA'), [10.0, 11.0, 12.0])
+        self.assertEqual(refresh_price_panel(directory=self.directory)['bars'], 0)
+
+    def test_stale_unfinished_runs_do_not_hold_the_watermark(self):
+        IngestionRun.objects.create(command='test', provider='fixture', started_at=timezone.now() - timedelta(days=2))
+        before = timezone.now()
+        refresh_price_panel(directory=self.directory)
+        self.assertGreaterEqual(pd.Timestamp(open_price_panel(self.directory).meta['watermark']), before)
+
+    def test_writer_lock_gives_up_after_its_timeout(self):
+        with _WriterLock(self.directory):
+            with self.assertRaises(TimeoutError):
+                with _WriterLock(self.directory, timeout=0):
+                    pass
+        with _WriterLock(self.directory, timeout=0):
+            pass
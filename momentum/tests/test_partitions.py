@@ -0,0 +1,38 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from momentum.models import Cryptocurrency_Tickers
+from momentum.partitions import YEARS_AHEAD, ensure_partitions, partition_name, partition_years
+
+
+class PartitionTests(TestCase):
+
+    def years(self):
+        with connection.cursor() as cursor:
+            return partition_years(cursor)
+
+    def drop_partition(self, year):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {partition_name(year)}")
+
+    def test_missing_years_are_created_once(self):
+        last_year = timezone.now().year + YEARS_AHEAD
+        self.assertLessEqual(set(range(2000, last_year + 1)), self.years())
+        out = StringIO()
+        self.assertEqual(ensure_partitions(out, years_ahead=YEARS_AHEAD + 1), [partition_name(last_year + 1)])
+        self.assertEqual(ensure_partitions(out, years_ahead=YEARS_AHEAD + 1), [])
+        self.assertIn(last_year + 1, self.years())
+
+    def test_ingestion_runs_create_the_partitions_ahead(self):
+        year = timezone.now().year + YEARS_AHEAD
+        self.drop_partition(year)
+        Cryptocurrency_Tickers.objects.create(asset_class='cryptocurrency', ticker='TST-USD', name='Test coin')
+        out = StringIO()
+        call_command('frequent_update_dailyprice_db', '--skip-panel', '--skip-adjustment-check', provider='fixture',
+                     rate_limit=0, stdout=out)
+        self.assertIn(f"Created partition {partition_name(year)}", out.getvalue())
+        self.assertIn(year, self.years())
@@ -0,0 +1,51 @@
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase, TestCase
+
+from momentum.management.commands.populate_tickers_db import Command as PopulateTickersCommand
+from momentum.models import Bond_Tickers, Equity_Tickers
+
+
+class IncomingValueTests(SimpleTestCase):
+
+    def test_csv_floats_compare_equal_to_stored_decimals(self):
+        command = PopulateTickersCommand()
+        market_cap = Equity_Tickers._meta.get_field('market_cap')
+        self.assertEqual(command.incoming_value(market_cap, 123.45), Decimal('123.45'))
+        self.assertEqual(str(command.incoming_value(market_cap, 0.125)), '0.13')  # numeric(20, 2) rounds half up
+        self.assertEqual(str(command.incoming_value(Bond_Tickers._meta.get_field('maturity'), 7.0)), '7.00')
+        self.assertIsNone(command.incoming_value(market_cap, float('nan')))
+
+
+class BulkSyncTests(TestCase):
+
+    def setUp(self):
+        self.command = PopulateTickersCommand(stdout=StringIO())
+        self.command.provider = mock.Mock()
+        # The provider knows no name for NONAME
+        self.command.provider.long_name.side_effect = lambda ticker: None if ticker == 'NONAME' else f'{ticker} Inc.'
+
+    def sync(self, rows):
+        data = pd.DataFrame(rows, columns=['asset_class', 'ticker', 'name', 'country'])
+        self.command.provider.long_name.reset_mock()
+        self.command.bulk_sync('equity', data)
+        return sorted(call.args[0] for call in self.command.provider.long_name.call_args_list)
+
+    def test_only_new_rows_and_changed_tickers_are_written_and_looked_up(self):
+        rows = [('equity', 'AAA', 'A', 'United States'), ('equity', 'NONAME', 'N', 'Japan'),
+                ('equity', 'CCC', 'C', 'France')]
+        self.assertEqual(self.sync(rows), ['AAA', 'CCC', 'NONAME'])
+        self.assertEqual(Equity_Tickers.objects.get(name='A').name_from_source, 'AAA Inc.')
+
+        # Unchanged CSV: no writes, and NONAME is not asked again
+        self.assertEqual(self.sync(rows), [])
+        self.assertIn('0 inserted, 0 updated, 0 deleted, 3 unchanged', self.command.stdout.getvalue())
+
+        # New ticker for A, C gone from the CSV, D added
+        self.assertEqual(self.sync([('equity', 'AAB', 'A', 'United States'), ('equity', 'NONAME', 'N', 'Japan'),
+                                    ('equity', 'DDD', 'D', 'Germany')]), ['AAB', 'DDD'])
+        self.assertEqual(sorted(Equity_Tickers.objects.values_list('ticker', flat=True)), ['AAB', 'DDD', 'NONAME'])
+        self.assertEqual(Equity_Tickers.objects.get(name='A').name_from_source, 'AAB Inc.')
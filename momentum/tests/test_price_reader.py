@@ -0,0 +1,35 @@
+import numpy as np
+from django.test import TestCase
+
+from momentum.price_reader import _categorical, read_price_arrays, read_price_frame
+from momentum.price_writer import frame_to_records, write_changed_prices
+from momentum.tests.helpers import FETCHED, provider_frame
+
+
+class PriceReaderTests(TestCase):
+
+    def setUp(self):
+        write_changed_prices(frame_to_records(provider_frame([10.0, 11.0, 12.0]), 'BBB', 'B', 'equity', FETCHED))
+        write_changed_prices(frame_to_records(provider_frame([1.5, 2.5]), 'AAA', 'A', 'equity', FETCHED))
+        write_changed_prices(frame_to_records(provider_frame([7.0]), 'AAA', 'A coin', 'cryptocurrency', FETCHED))
+
+    def test_arrays_are_decoded_in_instrument_and_date_order(self):
+        arrays = read_price_arrays(tickers=['BBB'], start='2024-01-02', fields=['adj_close', 'volume'], dtype='float32')
+        self.assertEqual(set(arrays), {'instrument_id', 'date', 'adj_close', 'volume'})
+        np.testing.assert_array_equal(arrays['date'], np.array(['2024-01-02', '2024-01-03'], dtype='datetime64[D]'))
+        np.testing.assert_array_equal(arrays['adj_close'], [11.0, 12.0])
+        self.assertEqual(arrays['adj_close'].dtype, np.float32)
+        self.assertEqual(len(read_price_arrays(tickers=['ZZZ'])['date']), 0)
+
+    def test_frame_labels_every_bar_with_its_instrument(self):
+        frame = read_price_frame(fields=['adj_close'])
+        self.assertEqual(list(frame['ticker'].cat.categories), ['AAA', 'BBB'])
+        self.assertEqual(sorted(zip(frame['ticker'], frame['asset_class'], frame['adj_close'])),
+                         [('AAA', 'cryptocurrency', 7.0), ('AAA', 'equity', 1.5), ('AAA', 'equity', 2.5),
+                          ('BBB', 'equity', 10.0), ('BBB', 'equity', 11.0), ('BBB', 'equity', 12.0)])
+
+    def test_categorical_maps_positions_to_labels(self):
+        labels = _categorical(['b', 'a', 'b'], np.array([2, 0, 1, 1]))
+        self.assertEqual(list(labels), ['b', 'b', 'a', 'a'])
+        self.assertEqual(list(labels.categories), ['a', 'b'])
+        self.assertEqual(len(_categorical([], np.empty(0, dtype=np.int64))), 0)
@@ -0,0 +1,195 @@
+from datetime import date, time as dt_time, timedelta
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, TestCase
+
+from momentum.models import DailyPrice
+from momentum.price_writer import (INSERT_COLUMNS, PRICE_TOLERANCE, CopyBackfill, frame_to_records, frame_to_rows,
+                                   split_changed_records, upsert_daily_prices, write_changed_prices)
+from momentum.tests.helpers import FETCHED, provider_frame, stored_frame
+
+
+#################################
+# FRAME CONVERSION
+
+class FrameToRecordsTests(SimpleTestCase):
+
+    def test_multi_ticker_columns_in_either_order(self):
+        single = provider_frame([10.0, 11.0])
+        wide = pd.concat({'AAA': single, 'BBB': single * 2}, axis=1)
+        for frame in (wide, wide.swaplevel(axis=1)):
+            records = frame_to_records(frame, 'BBB', 'B', 'equity', FETCHED)
+            self.assertEqual(list(records.columns), INSERT_COLUMNS)
+            self.assertEqual(list(records['adj_close']), [20.0, 22.0])
+            self.assertEqual(list(records['ticker']), ['BBB', 'BBB'])
+
+    def test_columns_are_selected_by_name(self):
+        frame = provider_frame([10.0, 11.0])
+        frame['Open'] = [9.0, 10.0]
+        records = frame_to_records(frame[frame.columns[::-1]], 'AAA', 'A', 'equity', FETCHED)
+        self.assertEqual(list(records['open']), [9.0, 10.0])
+        self.assertEqual(list(records['adj_close']), [10.0, 11.0])
+
+    def test_missing_values_become_none(self):
+        frame = provider_frame([10.0, np.nan]).drop(columns=['Low'])
+        frame.loc[frame.index[0], 'Volume'] = np.nan
+        rows = frame_to_rows(frame, 'AAA', 'A', 'equity', FETCHED, dt_time(21, 0))
+        row = dict(zip(INSERT_COLUMNS, rows[0]))
+        self.assertEqual((row['volume'], row['low'], row['time_utc']), (None, None, dt_time(21, 0)))
+        self.assertIsNone(dict(zip(INSERT_COLUMNS, rows[1]))['adj_close'])
+
+
+#################################
+# CHANGE DETECTION
+
+class SplitChangedRecordsTests(SimpleTestCase):
+
+    def records(self, closes, time_utc=None):
+        return frame_to_records(provider_frame(closes), 'AAA', 'Test', 'equity', FETCHED, time_utc)
+
+    def test_identical_bars_are_unchanged(self):
+        records = self.records([10.0, 11.0, 12.0])
+        new, restated, unchanged = split_changed_records(records, stored_frame(records))
+        self.assertTrue(new.empty)
+        self.assertTrue(restated.empty)
+        self.assertEqual(unchanged, 3)
+
+    def test_float_noise_below_the_stored_precision_is_unchanged(self):
+        stored = stored_frame(self.records([10.0, 11.0, 12.0]))
+        incoming = self.records([10.0 + PRICE_TOLERANCE * 0.9, 11.0 - PRICE_TOLERANCE * 0.9, 12.00001])
+        new, restated, unchanged = split_changed_records(incoming, stored)
+        self.assertTrue(restated.empty)
+        self.assertEqual(unchanged, 3)
+
+    def test_moved_price_is_restated(self):
+        stored = stored_frame(self.records([10.0, 11.0, 12.0]))
+        incoming = self.records([10.0, 11.0002, 12.0])
+        new, restated, unchanged = split_changed_records(incoming, stored)
+        self.assertEqual(list(restated['date']), [date(2024, 1, 2)])
+        self.assertEqual(unchanged, 2)
+
+    def test_missing_bars_are_new(self):
+        stored = stored_frame(self.records([10.0, 11.0]))
+        new, restated, unchanged = split_changed_records(self.records([10.0, 11.0, 12.0]), stored)
+        self.assertEqual(list(new['date']), [date(2024, 1, 3)])
+        self.assertTrue(restated.empty)
+        self.assertEqual(unchanged, 2)
+
+    def test_null_prices(self):
+        stored = stored_frame(self.records([10.0, np.nan, 12.0]))
+        incoming = self.records([np.nan, np.nan, 12.0])
+        new, restated, unchanged = split_changed_records(incoming, stored)
+        # NULL on both sides is unchanged, a price that disappeared is not
+        self.assertEqual(list(restated['date']), [date(2024, 1, 1)])
+        self.assertEqual(unchanged, 2)
+
+    def test_market_time_only_counts_on_the_latest_bar(self):
+        stored = stored_frame(self.records([10.0, 11.0, 12.0], time_utc=dt_time(14, 30)))
+        incoming = self.records([10.0, 11.0, 12.0], time_utc=dt_time(21, 0))
+        new, restated, unchanged = split_changed_records(incoming, stored)
+        self.assertEqual(list(restated['date']), [date(2024, 1, 3)])
+        self.assertEqual(unchanged, 2)
+
+
+class WriteChangedPricesTests(TestCase):
+
+    def write(self, closes):
+        return write_changed_prices(frame_to_records(provider_frame(closes), 'AAA', 'Test', 'equity', FETCHED))
+
+    def test_only_changed_bars_are_written(self):
+        self.assertEqual(self.write([10.0, 11.0, 12.0]), {'inserted': 3, 'updated': 0, 'unchanged': 0})
+        self.assertEqual(self.write([10.0, 11.0, 12.0]), {'inserted': 0, 'updated': 0, 'unchanged': 3})
+        self.assertEqual(self.write([10.0, 11.5, 12.0, 13.0]), {'inserted': 1, 'updated': 1, 'unchanged': 2})
+
+        stored = DailyPrice.objects.filter(instrument__ticker='AAA').order_by('date')
+        self.assertEqual([float(bar.adj_close) for bar in stored], [10.0, 11.5, 12.0, 13.0])
+
+    def test_duplicate_incoming_bars_keep_the_last_one(self):
+        records = frame_to_records(provider_frame([10.0, 11.0]), 'AAA', 'Test', 'equity', FETCHED)
+        records = pd.concat([records, records.tail(1).assign(adj_close=11.25)], ignore_index=True)
+        self.assertEqual(write_changed_prices(records), {'inserted': 2, 'updated': 0, 'unchanged': 0})
+        self.assertEqual(float(DailyPrice.objects.get(date=date(2024, 1, 2)).adj_close), 11.25)
+
+
+#################################
+# SET-BASED UPSERT
+
+class UpsertDailyPricesTests(TestCase):
+
+    def rows(self, closes, fetched=FETCHED, time_utc=None):
+        return frame_to_rows(provider_frame(closes), 'AAA', 'Test', 'equity', fetched, time_utc)
+
+    def stored(self, field='adj_close'):
+        return [getattr(bar, field) for bar in DailyPrice.objects.filter(instrument__ticker='AAA').order_by('date')]
+
+    def test_existing_bars_are_updated_in_place(self):
+        self.assertEqual(upsert_daily_prices(self.rows([10.0, 11.0])), 2)
+        ids = self.stored('id')
+        self.assertEqual(upsert_daily_prices(self.rows([10.5, 11.0, 12.0], FETCHED + timedelta(days=1))), 3)
+        self.assertEqual([float(value) for value in self.stored()], [10.5, 11.0, 12.0])
+        self.assertEqual(self.stored('id')[:2], ids)
+        self.assertEqual(self.stored('fetch_date')[0], FETCHED + timedelta(days=1))
+
+    def test_known_market_time_is_kept_by_a_write_without_one(self):
+        upsert_daily_prices(self.rows([10.0], time_utc=dt_time(20, 0)))
+        upsert_daily_prices(self.rows([10.1]))
+        self.assertEqual(self.stored('time_utc'), [dt_time(20, 0)])
+
+    def test_live_flag_is_only_overwritten_on_request(self):
+        flag = INSERT_COLUMNS.index('is_live')
+        live = [row[:flag] + (True,) + row[flag + 1:] for row in self.rows([10.0])]
+        upsert_daily_prices(live)
+        upsert_daily_prices(self.rows([10.2]))
+        self.assertEqual(self.stored('is_live'), [True])
+        upsert_daily_prices(self.rows([10.2]), update_live=True)
+        self.assertEqual(self.stored('is_live'), [False])
+
+    def test_same_bar_twice_in_one_call_keeps_the_last(self):
+        rows = self.rows([10.0]) + self.rows([10.7])
+        self.assertEqual(upsert_daily_prices(rows, chunk_size=1), 1)
+        self.assertEqual([float(value) for value in self.stored()], [10.7])
+
+
+#################################
+# COPY BACKFILL
+
+class CopyBackfillTests(TestCase):
+
+    def records(self, closes, ticker='AAA', fetched=FETCHED, start='2024-01-01'):
+        return frame_to_records(provider_frame(closes, start), ticker, 'Test', 'equity', fetched)
+
+    def stored(self, ticker='AAA'):
+        bars = DailyPrice.objects.filter(instrument__ticker=ticker).order_by('date')
+        return [(bar.date, float(bar.adj_close)) for bar in bars]
+
+    def test_staged_frames_are_merged_at_once(self):
+        with CopyBackfill() as backfill:
+            self.assertEqual(backfill.stage_frame(self.records([10.0, 11.0])), 2)
+            backfill.stage_frame(self.records([20.0], ticker='BBB'))
+            self.assertEqual(DailyPrice.objects.count(), 0)
+            self.assertEqual(backfill.merge(), 3)
+        self.assertEqual(self.stored(), [(date(2024, 1, 1), 10.0), (date(2024, 1, 2), 11.0)])
+        self.assertEqual(self.stored('BBB'), [(date(2024, 1, 1), 20.0)])
+
+    def test_merge_is_safe_to_rerun_and_keeps_the_latest_fetch(self):
+        with CopyBackfill() as backfill:
+            backfill.stage_frame(self.records([10.0, 11.0]))
+            backfill.merge()
+        with CopyBackfill() as backfill:
+            backfill.stage_frame(self.records([12.0, 11.5], fetched=FETCHED + timedelta(hours=1)))
+            backfill.stage_frame(self.records([10.5, 11.0]))  # Older fetch of the same bars
+            backfill.merge()
+        self.assertEqual(self.stored(), [(date(2024, 1, 1), 12.0), (date(2024, 1, 2), 11.5)])
+
+    def test_replace_deletes_bars_missing_from_the_new_history(self):
+        with CopyBackfill() as backfill:
+            backfill.stage_frame(self.records([10.0, 11.0, 12.0, 13.0]))
+            backfill.merge()
+        # The new history has no bar on 2024-01-02; the bar after its last date is left alone
+        new = self.records([9.0, 11.0, 12.0]).drop(index=1)
+        with CopyBackfill() as backfill:
+            backfill.stage_frame(new)
+            backfill.merge(replace=True)
+        self.assertEqual(backfill.deleted_rows, 1)
+        self.assertEqual(self.stored(), [(date(2024, 1, 1), 9.0), (date(2024, 1, 3), 12.0), (date(2024, 1, 4), 13.0)])
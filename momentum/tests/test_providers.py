@@ -0,0 +1,132 @@
+import shutil
+import tempfile
+from datetime import date, time
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from momentum.providers import (PRICE_COLUMNS, FixtureProvider, PriceDataMissing, PriceProvider, YFinanceProvider,
+                                record_fixture, split_batch_frame)
+
+
+def batch_frame(tickers, ticker_level=0):
+    """A yf.download frame for several tickers; the second ticker did not trade on the first day."""
+    index = pd.bdate_range('2024-01-01', periods=3)
+    columns = pd.MultiIndex.from_product([tickers, PRICE_COLUMNS])
+    if ticker_level == 1:
+        columns = columns.swaplevel()
+    data = pd.DataFrame(np.arange(3 * len(columns), dtype=float).reshape(3, -1), index=index, columns=columns)
+    data.loc[index[0], [column for column in columns if tickers[1] in column]] = np.nan
+    return data
+
+
+#################################
+# MULTI-SYMBOL DOWNLOADS
+
+class SplitBatchFrameTests(SimpleTestCase):
+
+    def test_either_ticker_level(self):
+        for level in (0, 1):
+            frames = split_batch_frame(batch_frame(['AAA', 'BBB'], level), ['AAA', 'BBB'])
+            self.assertEqual(sorted(frames), ['AAA', 'BBB'])
+            self.assertEqual(list(frames['AAA'].columns), PRICE_COLUMNS)
+            self.assertEqual(len(frames['AAA']), 3)
+            # Days on which only the other tickers traded are dropped
+            self.assertEqual(len(frames['BBB']), 2)
+
+    def test_tickers_missing_from_the_download_are_left_out(self):
+        frames = split_batch_frame(batch_frame(['AAA', 'BBB']), ['AAA', 'BBB', 'CCC'])
+        self.assertNotIn('CCC', frames)
+        self.assertEqual(split_batch_frame(pd.DataFrame(), ['AAA']), {})
+
+    def test_single_ticker_without_ticker_level(self):
+        data = batch_frame(['AAA', 'BBB']).xs('AAA', axis=1, level=0)
+        self.assertEqual(list(split_batch_frame(data, ['AAA'])), ['AAA'])
+
+
+class YFinanceBatchTests(SimpleTestCase):
+
+    def test_one_batch_at_a_time_with_concurrency_inside_the_download(self):
+        provider = YFinanceProvider()
+        self.assertEqual(provider.batch_concurrency(8), (1, 8))
+
+        with mock.patch.object(provider.yf, 'download', return_value=batch_frame(['AAA', 'BBB'])) as download:
+            frames = provider.history_batch(['AAA', 'BBB'], '2024-01-01', threads=8)
+        self.assertEqual(download.call_args.kwargs['threads'], 8)
+        self.assertEqual(sorted(frames), ['AAA', 'BBB'])
+
+    def test_last_trade_times_from_one_intraday_snapshot(self):
+        provider = YFinanceProvider()
+        intraday = batch_frame(['AAA', 'BBB'])
+        intraday.index = pd.date_range('2024-01-08 09:30', periods=3, freq='min', tz='America/New_York')
+        with mock.patch.object(provider.yf, 'download', return_value=intraday) as download:
+            times = provider.last_trade_times(['AAA', 'BBB'])
+        download.assert_called_once()
+        self.assertEqual(download.call_args.kwargs['interval'], '1m')
+        self.assertEqual(times, {'AAA': time(14, 32), 'BBB': time(14, 32)})
+
+
+class YFinanceHistoryTests(SimpleTestCase):
+
+    def test_missing_prices_are_reported_as_price_data_missing(self):
+        from yfinance.exceptions import YFPricesMissingError, YFTzMissingError
+
+        provider = YFinanceProvider()
+        for error in (YFPricesMissingError('AAA', '(1d 2024-01-01 -> 2024-01-05)'), YFTzMissingError('AAA')):
+            with mock.patch.object(provider.yf, 'Ticker') as ticker:
+                ticker.return_value.history.side_effect = error
+                with self.assertRaises(PriceDataMissing):
+                    provider.history('AAA', '2024-01-01', end_date='2024-01-05')
+
+    def test_empty_history_is_price_data_missing(self):
+        provider = YFinanceProvider()
+        with mock.patch.object(provider.yf, 'Ticker') as ticker:
+            ticker.return_value.history.return_value = pd.DataFrame()
+            with self.assertRaises(PriceDataMissing):
+                provider.history('AAA', '2024-01-01')
+
+
+#################################
+# PROVIDER INTERFACE
+
+class PriceProviderTests(SimpleTestCase):
+
+    def test_history_is_abstract(self):
+        with self.assertRaises(TypeError):
+            PriceProvider()
+
+    def test_only_missing_data_is_permanent(self):
+        self.assertEqual(FixtureProvider.permanent_errors, (PriceDataMissing,))
+        permanent = YFinanceProvider().permanent_errors
+        self.assertIn(PriceDataMissing, permanent)
+        self.assertFalse({KeyError, ValueError} & set(permanent))
+
+
+class FixtureProviderTests(SimpleTestCase):
+
+    def test_synthetic_histories_are_deterministic(self):
+        first = FixtureProvider().history('AAA', '2024-01-01', end_date='2024-01-31')
+        self.assertEqual(list(first.columns), PRICE_COLUMNS)
+        self.assertEqual(len(first), 23)
+        pd.testing.assert_frame_equal(first, FixtureProvider().history('AAA', '2024-01-01', end_date='2024-01-31'))
+        self.assertFalse(first.equals(FixtureProvider().history('BBB', '2024-01-01', end_date='2024-01-31')))
+
+    def test_empty_range_and_unrecorded_ticker_are_missing(self):
+        with self.assertRaises(PriceDataMissing):
+            FixtureProvider().history('AAA', '1990-01-01', end_date='1990-12-31')
+        with self.assertRaises(PriceDataMissing):
+            FixtureProvider(synthetic=False).history('AAA', '2024-01-01')
+
+    def test_recorded_frames_are_replayed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        recorded = FixtureProvider().synthetic_history('AAA', date(2024, 1, 31)).tail(5)
+        record_fixture(directory, 'AAA', recorded)
+
+        provider = FixtureProvider(directory, synthetic=False)
+        replayed = provider.history('AAA', '2024-01-01')
+        self.assertEqual(list(replayed.index), list(recorded.index))
+        np.testing.assert_allclose(replayed['Adj Close'], recorded['Adj Close'])
+        self.assertEqual(sorted(provider.history_batch(['AAA', 'BBB'], '2024-01-01')), ['AAA'])
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+from datetime import date, time
+from io import StringIO
+
+import pandas as pd
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+
+from momentum.management.commands.import_reference_data import Command as ImportReferenceDataCommand
+from momentum.models import Exchange, Exchange_Holiday
+
+EXCHANGES_CSV = ("country,exchange,timezone,market_open_local,market_close_local\n"
+                 "United States,NYSE,America/New_York,9:30:00 AM,4:00:00 PM\n"
+                 "Japan,JPX,Asia/Tokyo,9:00:00 AM,3:00:00 PM\n")
+HOLIDAYS_CSV = ("date,country,exchange_name,holiday_name\n"
+                "1/1/2024,United States,NYSE,New Year's Day\n"
+                "1/1/2024,Japan,JPX,New Year's Day\n")
+
+
+class ReferenceDataValidationTests(SimpleTestCase):
+
+    def parse(self, name, csv_text):
+        return getattr(ImportReferenceDataCommand(), f'parse_{name}')(pd.read_csv(StringIO(csv_text)))
+
+    def test_valid_exchanges(self):
+        records, errors = self.parse('exchanges', EXCHANGES_CSV)
+        self.assertEqual(errors, [])
+        self.assertEqual(records[0]['market_open_local'], time(9, 30))
+        self.assertEqual(records[0]['market_close_local'], time(16, 0))
+
+    def test_every_error_is_reported_with_its_line(self):
+        _, errors = self.parse('exchanges', "country,exchange,timezone,market_open_local,market_close_local\n"
+                                            "United States,NYSE,America/Gotham,9:30:00 AM,4:00:00 PM\n"
+                                            "Japan,JPX,Asia/Tokyo,3:00:00 PM,9:00:00 AM\n"
+                                            "United Kingdom,LSE,Europe/London,8:00:00 AM,soon\n")
+        self.assertEqual(errors, [
+            "line 4: unreadable opening hours",
+            "line 3: market_open_local is not before market_close_local",
+            "line 2: unknown timezone 'America/Gotham'",
+        ])
+
+    def test_empty_required_cells(self):
+        _, errors = self.parse('exchanges', EXCHANGES_CSV + ",LSE,Europe/London,8:00:00 AM,\n")
+        self.assertEqual(errors, ["line 4: empty country", "line 4: empty market_close_local"])
+
+    def test_holiday_key_includes_the_exchange(self):
+        records, errors = self.parse('holidays', HOLIDAYS_CSV + "1/1/2024,Japan,JPX,Shogatsu\n13/1/2024,Japan,JPX,?\n")
+        self.assertEqual(errors, [
+            "line 5: unreadable date '13/1/2024'",
+            "{'country': 'Japan', 'exchange_name': 'JPX', 'date': datetime.date(2024, 1, 1)} appears twice with different values",
+        ])
+        self.assertEqual(records[0]['date'], date(2024, 1, 1))
+
+
+class ImportReferenceDataTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def import_data(self, exchanges=EXCHANGES_CSV, holidays=HOLIDAYS_CSV):
+        paths = {}
+        for name, csv_text in (('exchanges', exchanges), ('holidays', holidays)):
+            paths[name] = os.path.join(self.directory, f'{name}.csv')
+            with open(paths[name], 'w', encoding='ISO-8859-1') as f:
+                f.write(csv_text)
+        out = StringIO()
+        call_command('import_reference_data', only=['exchanges', 'holidays'], stdout=out, **paths)
+        return out.getvalue()
+
+    def test_upserts_and_deletes_in_one_step(self):
+        self.import_data()
+        out = self.import_data(holidays=HOLIDAYS_CSV.replace("Japan,JPX,New Year's Day", "Japan,JPX,Ganjitsu"))
+        self.assertIn("Exchange: 0 inserted, 0 updated, 0 deleted, 2 unchanged", out)
+        self.assertIn("Exchange_Holiday: 0 inserted, 1 updated, 0 deleted, 1 unchanged", out)
+        self.assertIn("Market calendars changed", out)
+
+        out = self.import_data(exchanges=EXCHANGES_CSV.replace("Japan,JPX,Asia/Tokyo,9:00:00 AM,3:00:00 PM\n", ""))
+        self.assertIn("Exchange: 0 inserted, 0 updated, 1 deleted, 1 unchanged", out)
+
+    def test_an_invalid_file_imports_nothing(self):
+        with self.assertRaisesMessage(CommandError, "holidays: line 3: empty holiday_name"):
+            self.import_data(holidays=HOLIDAYS_CSV.replace("JPX,New Year's Day", "JPX,"))
+        self.assertFalse(Exchange.objects.exists())
+        self.assertFalse(Exchange_Holiday.objects.exists())
@@ -0,0 +1,67 @@
+from datetime import date
+
+import pandas as pd
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase
+
+from momentum.ingestion import FetchPool, WorkItem
+from momentum.models import DailyPrice
+from momentum.price_writer import frame_to_records, write_changed_prices
+from momentum.providers import FixtureProvider
+from momentum.restatements import compare_anchors, find_restated_tickers
+from momentum.tests.helpers import FETCHED
+
+
+#################################
+# RESTATEMENTS
+
+class CompareAnchorsTests(SimpleTestCase):
+
+    def frame(self, column, rows):
+        return pd.DataFrame(rows, columns=['ticker', 'asset_class', 'date', column])
+
+    def test_only_the_latest_common_date_of_a_window_counts(self):
+        provided = self.frame('provided', [
+            ('AAA', 'equity', date(2024, 1, 2), 50.0),
+            ('AAA', 'equity', date(2024, 1, 3), 100.0),
+            ('AAA', 'equity', date(2024, 1, 4), 80.0),  # Not stored: not an anchor
+        ]).assign(window=0)
+        stored = self.frame('stored', [
+            ('AAA', 'equity', date(2024, 1, 2), 100.0),
+            ('AAA', 'equity', date(2024, 1, 3), 100.0),
+        ])
+        self.assertEqual(compare_anchors(provided, stored), {})
+
+    def test_restated_close_beyond_the_tolerance(self):
+        provided = self.frame('provided', [
+            ('AAA', 'equity', date(2024, 1, 3), 100.04),  # 0.04%: a rounding difference
+            ('BBB', 'equity', date(2024, 1, 3), 99.0),   # 1%: a dividend adjustment
+        ]).assign(window=0)
+        stored = self.frame('stored', [
+            ('AAA', 'equity', date(2024, 1, 3), 100.0),
+            ('BBB', 'equity', date(2024, 1, 3), 100.0),
+        ])
+        self.assertEqual(compare_anchors(provided, stored),
+                         {('BBB', 'equity'): (date(2024, 1, 3), 100.0, 99.0)})
+
+    def test_no_common_dates(self):
+        provided = self.frame('provided', [('AAA', 'equity', date(2024, 1, 3), 99.0)]).assign(window=0)
+        stored = self.frame('stored', [('AAA', 'equity', date(2024, 1, 2), 100.0)])
+        self.assertEqual(compare_anchors(provided, stored), {})
+
+
+class FindRestatedTickersTests(TestCase):
+
+    def test_tickers_restated_by_the_provider_are_found(self):
+        provider = FixtureProvider()
+        for ticker in ('AAA', 'BBB'):
+            write_changed_prices(frame_to_records(provider.history(ticker, '2015-01-01', end_date='2024-06-03'),
+                                                  ticker, ticker, 'equity', FETCHED))
+        # A dividend adjustment the stored history of BBB missed
+        DailyPrice.objects.filter(instrument__ticker='BBB').update(adj_close=F('adj_close') * 0.99)
+
+        items = [WorkItem('AAA', 'AAA', 'equity', None), WorkItem('BBB', 'BBB', 'equity', None),
+                 WorkItem('TST-USD', 'Test coin', 'cryptocurrency', None)]
+        restated, calls = find_restated_tickers(provider, FetchPool(workers=1, rate=0), items, today=date(2024, 6, 3))
+        self.assertEqual(list(restated), [('BBB', 'equity')])
+        self.assertEqual(calls, 3)  # One batch per anchor window; crypto is not adjusted
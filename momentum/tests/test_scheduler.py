@@ -0,0 +1,98 @@
+from datetime import date, datetime, time, timezone as dt_timezone
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from momentum.ingestion import FetchPool, WorkItem
+from momentum.management.commands.frequent_update_dailyprice_db import Command as FrequentUpdateCommand
+from momentum.models import Equity_Tickers, Exchange, Exchange_Holiday
+from momentum.scheduler import is_due, select_due_work_items, session_close_times
+
+NEW_YORK = SimpleNamespace(timezone='America/New_York', market_open_local=time(9, 30), market_close_local=time(16, 0))
+FRIDAY_CLOSE = datetime(2024, 1, 5, 21, tzinfo=dt_timezone.utc)
+SATURDAY = datetime(2024, 1, 6, 12, tzinfo=dt_timezone.utc)
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+#################################
+# SCHEDULER
+
+class IsDueTests(SimpleTestCase):
+
+    def item(self, asset_class='equity', last_date=date(2024, 1, 5), last_fetch=utc(2024, 1, 5, 22)):
+        return WorkItem('AAA', 'A', asset_class, None, last_date, last_fetch)
+
+    def test_weekend_run_skips_a_ticker_fetched_after_the_friday_close(self):
+        self.assertEqual(is_due(self.item(), (NEW_YORK, set()), SATURDAY), (False, "no session since last fetch"))
+
+    def test_fetch_before_the_close_is_due_again(self):
+        item = self.item(last_fetch=FRIDAY_CLOSE.replace(hour=20))
+        self.assertEqual(is_due(item, (NEW_YORK, set()), SATURDAY), (True, "new completed session"))
+
+    def test_holiday_is_not_a_session(self):
+        monday_holiday = utc(2024, 1, 15, 23)
+        item = self.item(last_date=date(2024, 1, 12), last_fetch=utc(2024, 1, 12, 22))
+        self.assertFalse(is_due(item, (NEW_YORK, {date(2024, 1, 15)}), monday_holiday)[0])
+        self.assertTrue(is_due(item, (NEW_YORK, set()), monday_holiday)[0])
+
+    def test_open_market_crypto_and_unknown_tickers_are_due(self):
+        self.assertEqual(is_due(self.item(), (NEW_YORK, set()), utc(2024, 1, 8, 15)), (True, "market open"))
+        self.assertEqual(is_due(self.item('cryptocurrency'), None, SATURDAY), (True, "trades around the clock"))
+        self.assertEqual(is_due(self.item(), None, SATURDAY), (True, "no exchange calendar"))
+        self.assertEqual(is_due(self.item(last_date=None), (NEW_YORK, set()), SATURDAY), (True, "no stored data"))
+
+    def test_forex_follows_the_weekday_utc_session(self):
+        item = self.item('forex', last_fetch=utc(2024, 1, 6, 0, 30))
+        self.assertFalse(is_due(item, None, SATURDAY)[0])
+        self.assertTrue(is_due(item, None, utc(2024, 1, 8, 12))[0])
+
+
+class SelectDueWorkItemsTests(TestCase):
+
+    def setUp(self):
+        Exchange.objects.create(country='United States', exchange_short_name='NYSE', timezone='America/New_York',
+                                market_open_local=time(9, 30), market_close_local=time(16, 0))
+        Exchange_Holiday.objects.create(date=date(2024, 1, 15), country='United States', holiday_name='MLK Day')
+        Equity_Tickers.objects.create(asset_class='equity', ticker='SPY', name='S&P 500', country='United States')
+
+    def test_calendars_come_from_the_exchange_tables(self):
+        items = [WorkItem('SPY', 'S&P 500', 'equity', None, date(2024, 1, 12), utc(2024, 1, 12, 22)),
+                 WorkItem('BTC-USD', 'Bitcoin', 'cryptocurrency', None, date(2024, 1, 15), utc(2024, 1, 15, 22))]
+        due, skipped = select_due_work_items(items, utc(2024, 1, 15, 23))
+        self.assertEqual([item.ticker for item in due], ['BTC-USD'])
+        self.assertEqual([(item.ticker, reason) for item, reason in skipped], [('SPY', "no session since last fetch")])
+
+
+#################################
+# LAST TRADE TIMES
+
+class SessionCloseTimesTests(TestCase):
+
+    def setUp(self):
+        Exchange.objects.create(country='United States', exchange_short_name='NYSE', timezone='America/New_York',
+                                market_open_local=time(9, 30), market_close_local=time(16, 0))
+        Equity_Tickers.objects.create(asset_class='equity', ticker='SPY', name='S&P 500', country='United States')
+        self.items = [WorkItem('SPY', 'S&P 500', 'equity', None), WorkItem('BTC-USD', 'Bitcoin', 'cryptocurrency', None)]
+
+    def test_closed_markets_take_the_session_close(self):
+        self.assertEqual(session_close_times(self.items, SATURDAY), {'SPY': time(21, 0)})
+        self.assertEqual(session_close_times(self.items, utc(2024, 1, 8, 15)), {})
+
+    def test_one_snapshot_call_per_batch_of_live_tickers(self):
+        command = FrequentUpdateCommand(stdout=StringIO())
+        command.provider = mock.Mock()
+        command.provider.batch_concurrency.return_value = (1, 1)
+        command.provider.last_trade_times.side_effect = lambda chunk, **kwargs: {ticker: time(15, 0) for ticker in chunk}
+        items = self.items + [WorkItem(f'C{i}-USD', '', 'cryptocurrency', None) for i in range(3)]
+
+        with mock.patch('momentum.scheduler.timezone.now', return_value=SATURDAY):
+            times = command.resolve_last_times(FetchPool(workers=1, rate=0), items, batch_size=2)
+        self.assertEqual(times['SPY'], time(21, 0))
+        self.assertEqual(times['BTC-USD'], time(15, 0))
+        self.assertEqual(command.provider.last_trade_times.call_count, 2)
+        self.assertIn("3 provider calls saved", command.stdout.getvalue())
@@ -0,0 +1,21 @@
+from django.db import connection
+from django.test import TestCase
+
+from momentum.models import DailyPrice
+
+
+class DailyPriceIndexTests(TestCase):
+
+    def index_definitions(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexdef FROM pg_indexes WHERE tablename = %s", [table])
+            return {definition.split(' USING ', 1)[1] for (definition,) in cursor.fetchall()}
+
+    def test_date_has_a_btree_next_to_brin(self):
+        # Bars are written instrument by instrument: BRIN alone would scan most of the table for a week of dates
+        table = DailyPrice._meta.db_table
+        for relation in (table, f'{table}_y2024'):
+            definitions = self.index_definitions(relation)
+            self.assertIn('btree (date)', definitions)
+            self.assertIn('brin (date)', definitions)
+            self.assertIn('btree (instrument_id, date DESC)', definitions)
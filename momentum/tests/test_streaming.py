@@ -0,0 +1,77 @@
+import json
+from datetime import date, datetime, time, timezone as dt_timezone
+
+from django.test import SimpleTestCase
+
+from momentum.price_writer import INSERT_COLUMNS
+from momentum.streaming import DailyBarAggregator, bars_to_rows, feed_symbol, parse_trades
+
+SYMBOLS = {'BTCUSDT': ('BTC-USD', 'Bitcoin'), 'ETHUSDT': ('ETH-USD', 'Ethereum')}
+
+
+def trade_ms(day, hour, minute=0):
+    return int(datetime(2024, 1, day, hour, minute, tzinfo=dt_timezone.utc).timestamp() * 1000)
+
+
+class DailyBarAggregatorTests(SimpleTestCase):
+
+    def setUp(self):
+        self.aggregator = DailyBarAggregator(SYMBOLS)
+
+    def test_trades_fold_into_the_daily_bar(self):
+        for price, minute in ((100.0, 0), (105.0, 2), (98.0, 3), (101.0, 1)):
+            self.aggregator.add('BTCUSDT', price, 2.0, trade_ms(5, 12, minute))
+        self.assertFalse(self.aggregator.add('XRPUSDT', 1.0, 1.0, trade_ms(5, 12)))
+
+        [bar] = self.aggregator.drain()
+        self.assertEqual((bar['open'], bar['high'], bar['low'], bar['close']), (100.0, 105.0, 98.0, 98.0))
+        self.assertEqual(bar['volume'], 808.0)  # Quote-currency volume
+        self.assertTrue(bar['is_live'])
+        self.assertEqual(self.aggregator.drain(), [])  # Nothing moved since
+        self.assertEqual((self.aggregator.trades, self.aggregator.ignored), (4, 1))
+
+    def test_a_trade_of_the_next_day_closes_the_bar(self):
+        self.aggregator.add('BTCUSDT', 100.0, 1.0, trade_ms(5, 23))
+        self.aggregator.add('BTCUSDT', 110.0, 1.0, trade_ms(6, 0, 1))
+        final, live = self.aggregator.drain()
+        self.assertEqual((final['date'], final['is_live'], final['close']), (date(2024, 1, 5), False, 100.0))
+        self.assertEqual((live['date'], live['is_live'], live['open']), (date(2024, 1, 6), True, 110.0))
+
+    def test_day_rollover_closes_bars_without_a_new_trade(self):
+        self.aggregator.add('BTCUSDT', 100.0, 1.0, trade_ms(5, 23))
+        self.aggregator.add('ETHUSDT', 10.0, 1.0, trade_ms(6, 0, 1))
+        self.aggregator.drain()
+
+        self.assertEqual(self.aggregator.close_bars(before=date(2024, 1, 6)), 1)
+        [bar] = self.aggregator.drain()
+        self.assertEqual((bar['ticker'], bar['is_live']), ('BTC-USD', False))
+        # A late trade cannot reopen the final bar
+        self.assertFalse(self.aggregator.add('BTCUSDT', 90.0, 1.0, trade_ms(5, 23, 59)))
+        self.assertTrue(self.aggregator.add('BTCUSDT', 101.0, 1.0, trade_ms(6, 0, 5)))
+        [bar] = self.aggregator.drain()
+        self.assertEqual((bar['date'], bar['is_live']), (date(2024, 1, 6), True))
+
+    def test_shutdown_closes_every_open_bar(self):
+        self.aggregator.add('BTCUSDT', 100.0, 1.0, trade_ms(6, 10))
+        self.aggregator.add('ETHUSDT', 10.0, 1.0, trade_ms(6, 10))
+        self.aggregator.close_bars()
+        bars = self.aggregator.drain()
+        self.assertEqual(sorted(bar['ticker'] for bar in bars), ['BTC-USD', 'ETH-USD'])
+        self.assertFalse(any(bar['is_live'] for bar in bars))
+        self.assertEqual(self.aggregator.close_bars(), 0)
+
+    def test_rows_for_the_upsert(self):
+        self.aggregator.add('BTCUSDT', 100.0, 1.5, trade_ms(6, 10, 30))
+        [row] = bars_to_rows(self.aggregator.drain(), datetime(2024, 1, 6, 10, 31, tzinfo=dt_timezone.utc))
+        row = dict(zip(INSERT_COLUMNS, row))
+        self.assertEqual((row['ticker'], row['asset_class'], row['adj_close'], row['volume'], row['time_utc']),
+                         ('BTC-USD', 'cryptocurrency', 100.0, 150, time(10, 30)))
+
+
+class FeedTests(SimpleTestCase):
+
+    def test_symbols_and_messages(self):
+        self.assertEqual(feed_symbol('btc-usd'), 'BTCUSDT')
+        message = json.dumps([{'stream': 'btcusdt@trade', 'data': {'e': 'trade', 's': 'BTCUSDT', 'p': '100.5', 'q': '0.1', 'T': 1}},
+                              {'result': None, 'id': 1}])
+        self.assertEqual(parse_trades(message), [('BTCUSDT', 100.5, 0.1, 1)])
@@ -115,3 +115,38 @@ def get_market_info(country):
 def get_all_market_info():
     """Return info for all main countries."""
     return [get_market_info(c) for c in MAIN_COUNTRIES]
+
+
+def is_trading_day(day, holidays):
+    """Weekday that is not in the exchange's holiday dates."""
+    return day.weekday() < 5 and day not in holidays
+
+
+def get_session_state(ex, holidays, now_utc=None):
+    """
+    Open/closed state of an exchange and its last completed session, computed with the
+    same rules as get_market_info (weekends, holidays, local open/close times).
+    `holidays` is a set of local dates, so no query is made here.
+    """
+    now_utc = now_utc or timezone.now()
+    local_tz = pytz.timezone(ex.timezone)
+    local_time = now_utc.astimezone(local_tz)
+    local_date = local_time.date()
+
+    trading_today = is_trading_day(local_date, holidays)
+    is_open = trading_today and ex.market_open_local <= local_time.time() <= ex.market_close_local
+
+    # Today's session is complete once the market has closed; otherwise look back
+    if trading_today and local_time.time() > ex.market_close_local:
+        session_date = local_date
+    else:
+        session_date = local_date - timedelta(days=1)
+        while not is_trading_day(session_date, holidays):
+            session_date -= timedelta(days=1)
+
+    session_close = local_tz.localize(datetime.combine(session_date, ex.market_close_local))
+    return {
+        "is_open": is_open,
+        "last_session_date": session_date,
+        "last_session_close_utc": session_close.astimezone(pytz.utc),
+    }